@@ -9,10 +9,13 @@ from typing import List, Optional, Dict, Callable, Any
 from decimal import Decimal
 from fastmcp import Client as McpClient
 import dashscope
-from web.utils.analysis_runner import run_stock_analysis
+from web.utils.job_queue import COMPLETED, FINISHED_STATUSES, JOB_WAIT_TIMEOUT, get_job_queue
+from web.utils.async_progress_tracker import ProgressFollower
+from web.components.async_progress_display import render_live_progress
 import streamlit as st
 import akshare as ak
 import time
+import uuid
 from volcenginesdkarkruntime import Ark
 
 # 导入指定模型
@@ -381,6 +384,31 @@ class ToolExecutor:
 
         return f"执行工具 '{tool_name}' 失败，原错误：{original_error}，所有备用服务器均尝试失败。"
 
+    @staticmethod
+    def _wait_for_analysis_job(job_queue, code: str, job_id: str, deadline: float):
+        """
+        等待个股分析任务结束，期间阻塞读取进度事件并实时显示
+
+        Returns:
+            已结束的任务记录；超过截止时间返回 None
+        """
+        follower = ProgressFollower(job_id)
+        placeholder = st.empty()
+        try:
+            while True:
+                job = job_queue.get_job(job_id)
+                if job is None or job['status'] in FINISHED_STATUSES:
+                    return job
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                # 没有新事件时最多等待2秒，再检查一次任务状态
+                progress_data = follower.poll(block_seconds=min(remaining, 2.0))
+                render_live_progress(placeholder, progress_data, title=f"个股分析: {code}",
+                                     partial_reports=follower.partial_reports)
+        finally:
+            placeholder.empty()
+
     def execute_stock_analysis_tool(self, stock_symbols: List[str], ):
         """
         个股分析工具，支持批量分析个股。
@@ -394,10 +422,13 @@ class ToolExecutor:
         llm_provider = st.session_state.llm_config.get('llm_provider', 'dashscope')
         llm_model = st.session_state.llm_config.get('llm_model', 'qwen-plus')
 
-        all_analysis = []
+        # 分析在后台 worker 进程中执行（python -m web.utils.job_queue），Web 进程只提交任务并读取结果
+        job_queue = get_job_queue()
+        job_ids = {}
         for code in stock_symbols:
             try:
-                analysis_result = run_stock_analysis(
+                job_ids[code] = job_queue.submit_stock_analysis(
+                    analysis_id=f"analysis_{uuid.uuid4().hex[:8]}_{code}",
                     stock_symbol=code,
                     analysis_date=str(datetime.date.today()),
                     analysts=['fundamentals'],
@@ -407,8 +438,26 @@ class ToolExecutor:
                     market_type='A股',
                 )
             except Exception as e:
-                all_analysis.append(f"### 个股分析: {code}\n分析失败：{str(e)}")
+                job_ids[code] = None
+                print(f"提交个股分析任务失败：{code}，错误：{str(e)}")
+
+        all_analysis = []
+        # 所有任务共用一个截止时间，避免逐个等待时总耗时成倍增长
+        deadline = time.time() + JOB_WAIT_TIMEOUT
+        for code in stock_symbols:
+            if job_ids[code] is None:
+                all_analysis.append(f"### 个股分析: {code}\n分析失败：任务提交失败")
+                continue
+
+            job = self._wait_for_analysis_job(job_queue, code, job_ids[code], deadline)
+            if job is None:
+                job_queue.cancel(job_ids[code])
+                all_analysis.append(f"### 个股分析: {code}\n分析失败：等待分析结果超时，请确认任务worker已启动")
+                continue
+            if job['status'] != COMPLETED:
+                all_analysis.append(f"### 个股分析: {code}\n分析失败：{job.get('error') or job['status']}")
                 continue
+            analysis_result = job.get('result') or {}
 
             raw_reports = []
             if 'state' in analysis_result:
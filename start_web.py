@@ -67,6 +67,18 @@ def main():
         "--server.runOnSave", "false"
     ]
     
+    # 启动后台分析任务worker池，个股分析在worker进程中执行（JOB_WORKERS=0 时不启动，可单独运行 python -m web.utils.job_queue）
+    worker_pool = None
+    job_workers = int(os.getenv("JOB_WORKERS", "2"))
+    if job_workers > 0:
+        print(f"👷 启动分析任务worker池 ({job_workers} 个进程)...")
+        if job_workers > 1 and os.getenv("MEMORY_PERSISTENT", "false").lower() == "true" and not os.getenv("CHROMA_SERVER_URL"):
+            print("⚠️  本地持久化记忆不支持多进程共享，多个worker时请设置 CHROMA_SERVER_URL 使用Chroma服务器")
+        worker_pool = subprocess.Popen(
+            [sys.executable, "-m", "web.utils.job_queue", "--workers", str(job_workers)],
+            cwd=project_root, env=env,
+        )
+
     print("🌐 启动Web应用...")
     print("📱 浏览器将自动打开 http://localhost:8501")
     print("⏹️  按 Ctrl+C 停止应用")
@@ -83,6 +95,14 @@ def main():
         print("   1. 激活虚拟环境")
         print("   2. 运行: pip install -e .")
         print("   3. 再次启动Web应用")
+    finally:
+        if worker_pool is not None:
+            worker_pool.terminate()
+            try:
+                worker_pool.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                worker_pool.kill()
+            print("⏹️ 分析任务worker池已停止")
 
 if __name__ == "__main__":
     main()
@@ -141,9 +141,7 @@ def create_fundamentals_analyst(llm, toolkit):
                     toolkit.get_fundamentals_openai,  # 使用现有的OpenAI基本面数据工具
                     toolkit.get_finnhub_company_insider_sentiment,
                     toolkit.get_finnhub_company_insider_transactions,
-                    toolkit.get_simfin_balance_sheet,
-                    toolkit.get_simfin_cashflow,
-                    toolkit.get_simfin_income_stmt,
+                    toolkit.get_simfin_financial_statements,
                 ]
 
         # 统一的系统提示，适用于所有股票类型
@@ -1,6 +1,8 @@
 import time
 import json
 
+from tradingagents.agents.utils.report_digest import debate_history_for_prompt
+
 # 导入统一日志系统
 from tradingagents.utils.logging_init import get_logger
 logger = get_logger("default")
@@ -11,8 +13,9 @@ def create_risk_manager(llm, memory):
 
         company_name = state["company_of_interest"]
 
-        history = state["risk_debate_state"]["history"]
         risk_debate_state = state["risk_debate_state"]
+        # 提示词中使用压缩后的辩论历史
+        history = debate_history_for_prompt(risk_debate_state)
         market_research_report = state["market_report"]
         news_report = state["news_report"]
         fundamentals_report = state["news_report"]
@@ -2,6 +2,8 @@ from langchain_core.messages import AIMessage
 import time
 import json
 
+from tradingagents.agents.utils.report_digest import compact_debate_history, get_prompt_reports
+
 # 导入统一日志系统
 from tradingagents.utils.logging_init import get_logger
 logger = get_logger("default")
@@ -43,6 +45,10 @@ def create_bear_researcher(llm, memory):
         for i, rec in enumerate(past_memories, 1):
             past_memory_str += rec["recommendation"] + "\n\n"
 
+        # 记忆检索使用完整报告，提示词中使用报告摘要和压缩后的辩论历史
+        market_research_report, sentiment_report, news_report, fundamentals_report = get_prompt_reports(state)
+        prompt_history, history_updates = compact_debate_history(llm, investment_debate_state, keep_turns=2)
+
         prompt = f"""你是一位看跌分析师，负责论证不投资股票 {company_name} 的理由。
 
 ⚠️ 重要提醒：当前分析的是 {market_info['market_name']}，所有价格和估值请使用 {currency}（{currency_symbol}）作为单位。
@@ -63,7 +69,7 @@ def create_bear_researcher(llm, memory):
 社交媒体情绪报告：{sentiment_report}
 最新世界事务新闻：{news_report}
 公司基本面报告：{fundamentals_report}
-辩论对话历史：{history}
+辩论对话历史：{prompt_history}
 最后的看涨论点：{current_response}
 类似情况的反思和经验教训：{past_memory_str}
 
@@ -82,6 +88,7 @@ def create_bear_researcher(llm, memory):
             "bull_history": investment_debate_state.get("bull_history", ""),
             "current_response": argument,
             "count": investment_debate_state["count"] + 1,
+            **history_updates,
         }
 
         return {"investment_debate_state": new_investment_debate_state}
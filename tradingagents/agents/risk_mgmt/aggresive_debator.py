@@ -1,6 +1,10 @@
 import time
 import json
 
+from tradingagents.agents.utils.report_digest import (
+    RISK_DEBATE_KEEP_TURNS, compact_debate_history, get_prompt_reports
+)
+
 # 导入统一日志系统
 from tradingagents.utils.logging_init import get_logger
 logger = get_logger("default")
@@ -15,10 +19,9 @@ def create_risky_debator(llm):
         current_safe_response = risk_debate_state.get("current_safe_response", "")
         current_neutral_response = risk_debate_state.get("current_neutral_response", "")
 
-        market_research_report = state["market_report"]
-        sentiment_report = state["sentiment_report"]
-        news_report = state["news_report"]
-        fundamentals_report = state["fundamentals_report"]
+        # 提示词中使用报告摘要和压缩后的辩论历史
+        market_research_report, sentiment_report, news_report, fundamentals_report = get_prompt_reports(state)
+        prompt_history, history_updates = compact_debate_history(llm, risk_debate_state, keep_turns=RISK_DEBATE_KEEP_TURNS)
 
         trader_decision = state["trader_investment_plan"]
 
@@ -32,7 +35,7 @@ def create_risky_debator(llm):
 社交媒体情绪报告：{sentiment_report}
 最新世界事务报告：{news_report}
 公司基本面报告：{fundamentals_report}
-以下是当前对话历史：{history} 以下是保守分析师的最后论点：{current_safe_response} 以下是中性分析师的最后论点：{current_neutral_response}。如果其他观点没有回应，请不要虚构，只需提出您的观点。
+以下是当前对话历史：{prompt_history} 以下是保守分析师的最后论点：{current_safe_response} 以下是中性分析师的最后论点：{current_neutral_response}。如果其他观点没有回应，请不要虚构，只需提出您的观点。
 
 积极参与，解决提出的任何具体担忧，反驳他们逻辑中的弱点，并断言承担风险的好处以超越市场常规。专注于辩论和说服，而不仅仅是呈现数据。挑战每个反驳点，强调为什么高风险方法是最优的。请用中文以对话方式输出，就像您在说话一样，不使用任何特殊格式。"""
 
@@ -52,6 +55,7 @@ def create_risky_debator(llm):
                 "current_neutral_response", ""
             ),
             "count": risk_debate_state["count"] + 1,
+            **history_updates,
         }
 
         return {"risk_debate_state": new_risk_debate_state}
@@ -23,6 +23,8 @@ class InvestDebateState(TypedDict):
     current_response: Annotated[str, "Latest response"]  # Last response
     judge_decision: Annotated[str, "Final judge decision"]  # Last response
     count: Annotated[int, "Length of the current conversation"]  # Conversation length
+    history_summary: Annotated[str, "Rolling summary of the older turns"]
+    summarized_length: Annotated[int, "Characters of history already folded into the summary"]
 
 
 # Risk management team state
@@ -49,6 +51,8 @@ class RiskDebateState(TypedDict):
     ]  # Last response
     judge_decision: Annotated[str, "Judge's decision"]
     count: Annotated[int, "Length of the current conversation"]  # Conversation length
+    history_summary: Annotated[str, "Rolling summary of the older turns"]
+    summarized_length: Annotated[int, "Characters of history already folded into the summary"]
 
 
 class AgentState(MessagesState):
@@ -64,6 +68,7 @@ class AgentState(MessagesState):
         str, "Report from the News Researcher of current world affairs"
     ]
     fundamentals_report: Annotated[str, "Report from the Fundamentals Researcher"]
+    report_digests: Annotated[dict, "Size-capped digests of the analyst reports"]
 
     # researcher team discussion step
     investment_debate_state: Annotated[
@@ -462,6 +462,32 @@ class Toolkit:
 
         return data_income_stmt
 
+    @staticmethod
+    @tool
+    def get_simfin_financial_statements(
+        ticker: Annotated[str, "ticker symbol"],
+        freq: Annotated[
+            str,
+            "reporting frequency of the company's financial history: annual/quarterly",
+        ],
+        curr_date: Annotated[str, "current date you are trading at, yyyy-mm-dd"],
+    ):
+        """
+        Retrieve the most recent balance sheet, cash flow statement and income statement of a company in one call
+        Args:
+            ticker (str): ticker symbol of the company
+            freq (str): reporting frequency of the company's financial history: annual / quarterly
+            curr_date (str): current date you are trading at, yyyy-mm-dd
+        Returns:
+                str: a report of the company's most recent balance sheet, cash flow statement and income statement
+        """
+
+        data_statements = interface.get_simfin_financial_statements(
+            ticker, freq, curr_date
+        )
+
+        return data_statements
+
     @staticmethod
     @tool
     def get_google_news(
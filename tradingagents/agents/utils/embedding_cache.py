@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+嵌入向量缓存
+以 (嵌入服务, 模型, 文本) 的内容哈希为键，内存 LRU + 本地 SQLite 持久化 + 可选 Redis 共享，
+所有 FinancialSituationMemory 实例共用，同一段情景文本在一次分析内只调用一次嵌入接口，并可跨运行复用。
+"""
+
+import os
+import array
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+# 导入日志模块
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('agents')
+
+
+REDIS_KEY_PREFIX = "embedding:"
+
+
+def embedding_key(namespace: str, model: str, text: str) -> str:
+    """计算缓存键：嵌入服务 + 模型 + 文本的 sha256"""
+    digest = hashlib.sha256()
+    for part in (namespace, model, text):
+        digest.update(part.encode('utf-8'))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array.array('f', vector).tobytes()
+
+
+def _unpack(data: bytes) -> List[float]:
+    values = array.array('f')
+    values.frombytes(data)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """
+    三级嵌入向量缓存
+
+    - 内存：OrderedDict 实现的 LRU，最多 max_entries 条
+    - 磁盘：SQLite 单文件（float32 存储），跨进程、跨运行复用
+    - Redis：可用时作为多实例共享层
+    同一个键的并发请求只会触发一次实际嵌入调用。
+    """
+
+    def __init__(self, cache_dir: str = None, max_entries: int = 2048,
+                 use_redis: bool = True, redis_ttl: int = 30 * 24 * 3600):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: SQLite 缓存文件所在目录，为 None 时不做磁盘持久化
+            max_entries: 内存 LRU 最大条数
+            use_redis: Redis 可用时是否使用
+            redis_ttl: Redis 中缓存的有效期（秒）
+        """
+        self.max_entries = max_entries
+        self.redis_ttl = redis_ttl
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._stats = {"hits": 0, "misses": 0}
+
+        self._db_path = None
+        self._db_lock = threading.Lock()
+        if cache_dir:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                self._db_path = os.path.join(cache_dir, "embeddings.sqlite3")
+                with self._connect() as conn:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS embeddings ("
+                        "key TEXT PRIMARY KEY, model TEXT, vector BLOB, created_at REAL)"
+                    )
+            except Exception as e:
+                logger.warning(f"⚠️ 嵌入缓存磁盘存储初始化失败，仅使用内存缓存: {e}")
+                self._db_path = None
+
+        self._redis = None
+        if use_redis:
+            try:
+                from tradingagents.config.database_manager import get_database_manager
+                self._redis = get_database_manager().get_redis_client()
+            except Exception as e:
+                logger.debug(f"Redis不可用，嵌入缓存不使用Redis: {e}")
+
+    def _connect(self) -> sqlite3.Connection:
+        # 每次操作使用独立连接，SQLite 自身负责跨进程加锁
+        return sqlite3.connect(self._db_path, timeout=10)
+
+    def _remember(self, key: str, vector: List[float]):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                return vector
+
+        if self._redis is not None:
+            try:
+                data = self._redis.get(REDIS_KEY_PREFIX + key)
+                if data:
+                    vector = _unpack(data)
+                    self._remember(key, vector)
+                    return vector
+            except Exception as e:
+                logger.debug(f"Redis读取嵌入缓存失败: {e}")
+
+        if self._db_path:
+            try:
+                with self._db_lock, self._connect() as conn:
+                    row = conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row:
+                    vector = _unpack(row[0])
+                    self._remember(key, vector)
+                    return vector
+            except Exception as e:
+                logger.debug(f"读取嵌入缓存文件失败: {e}")
+
+        return None
+
+    def _store(self, key: str, model: str, vector: List[float]):
+        self._remember(key, vector)
+        data = _pack(vector)
+
+        if self._redis is not None:
+            try:
+                self._redis.setex(REDIS_KEY_PREFIX + key, self.redis_ttl, data)
+            except Exception as e:
+                logger.debug(f"Redis写入嵌入缓存失败: {e}")
+
+        if self._db_path:
+            try:
+                with self._db_lock, self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO embeddings (key, model, vector, created_at) VALUES (?, ?, ?, ?)",
+                        (key, model, data, time.time()),
+                    )
+            except Exception as e:
+                logger.debug(f"写入嵌入缓存文件失败: {e}")
+
+    def get(self, namespace: str, model: str, text: str) -> Optional[List[float]]:
+        return self._lookup(embedding_key(namespace, model, text))
+
+    def put(self, namespace: str, model: str, text: str, vector: List[float]):
+        self._store(embedding_key(namespace, model, text), model, vector)
+
+    def get_or_compute(self, namespace: str, model: str, text: str,
+                       compute: Callable[[str], Optional[List[float]]]) -> Optional[List[float]]:
+        """
+        获取嵌入向量，缓存未命中时调用 compute 计算
+
+        compute 返回 None 或全零向量（降级结果）时不写入缓存。
+        """
+        key = embedding_key(namespace, model, text)
+
+        while True:
+            vector = self._lookup(key)
+            if vector is not None:
+                with self._lock:
+                    self._stats["hits"] += 1
+                return vector
+
+            with self._lock:
+                event = self._inflight.get(key)
+                if event is None:
+                    event = threading.Event()
+                    self._inflight[key] = event
+                    owner = True
+                else:
+                    owner = False
+
+            if owner:
+                break
+            # 其他线程正在计算同一文本，等待其结果
+            event.wait()
+            if self._lookup(key) is None:
+                # 对方计算失败（降级结果不缓存），不再等待，直接自行计算
+                return compute(text)
+
+        try:
+            with self._lock:
+                self._stats["misses"] += 1
+            vector = compute(text)
+            if vector and any(vector):
+                self._store(key, model, vector)
+            return vector
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, memory_entries=len(self._memory))
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+
+# 全局嵌入缓存实例
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache(cache_dir: str = None) -> EmbeddingCache:
+    """
+    获取全局嵌入缓存实例
+
+    目录和容量可通过环境变量 EMBEDDING_CACHE_DIR、EMBEDDING_CACHE_SIZE 调整，
+    EMBEDDING_CACHE_REDIS=false 可关闭 Redis 共享层。
+    """
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            default_dir = os.path.join(
+                os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                "dataflows", "data_cache", "embeddings"
+            )
+            _embedding_cache = EmbeddingCache(
+                cache_dir=os.getenv('EMBEDDING_CACHE_DIR') or cache_dir or default_dir,
+                max_entries=int(os.getenv('EMBEDDING_CACHE_SIZE', '2048')),
+                use_redis=os.getenv('EMBEDDING_CACHE_REDIS', 'true').lower() == 'true',
+            )
+        return _embedding_cache
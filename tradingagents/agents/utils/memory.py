@@ -4,23 +4,75 @@ from openai import OpenAI
 import dashscope
 from dashscope import TextEmbedding
 import os
+import re
+import json
 import threading
 from typing import Dict, Optional
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows
+    fcntl = None
+    FCNTL_AVAILABLE = False
+
+from tradingagents.agents.utils.embedding_cache import get_embedding_cache
 
 # 导入统一日志系统
 from tradingagents.utils.logging_init import get_logger
 logger = get_logger("agents.analysis.memory")
 
 
+# 各嵌入模型单次请求的最大文本条数
+EMBEDDING_BATCH_LIMITS = {
+    "text-embedding-v1": 25,
+    "text-embedding-v2": 25,
+    "text-embedding-v3": 10,
+}
+DEFAULT_EMBEDDING_BATCH_LIMIT = 256
+
+# 各嵌入模型单条文本的最大 token 数
+EMBEDDING_TOKEN_LIMITS = {
+    "text-embedding-v1": 2048,
+    "text-embedding-v2": 2048,
+    "text-embedding-v3": 8192,
+    "nomic-embed-text": 2048,
+}
+DEFAULT_EMBEDDING_TOKEN_LIMIT = 8191
+
+
+def truncate_for_embedding(text: str, max_tokens: int) -> str:
+    """
+    按估算的 token 数截断文本（中日韩字符按 1 个 token，其他字符按 0.3 个 token 估算），
+    并预留 10% 余量，避免超出嵌入模型的单条长度限制
+    """
+    budget = max_tokens * 0.9
+    tokens = 0.0
+    for i, ch in enumerate(text):
+        tokens += 1.0 if ord(ch) >= 0x2E80 else 0.3
+        if tokens > budget:
+            return text[:i]
+    return text
+
+
 class ChromaDBManager:
-    """单例ChromaDB管理器，避免并发创建集合的冲突"""
+    """
+    单例ChromaDB管理器，避免并发创建集合的冲突
+
+    - 指定 server_url 时连接独立的 Chroma 服务器，多个进程（如任务 worker 池）通过服务器共享记忆；
+    - 只指定 persist_dir 时使用本地持久化客户端，记忆在进程重启后保留，但只适合单进程使用：
+      每个进程各自缓存 HNSW 索引，看不到其他进程的写入，同时写入还可能损坏索引。
+      目录下的文件锁只能串行化写入，不能解决上述问题；
+    - 都不指定时使用内存模式。
+    """
 
     _instance = None
     _lock = threading.Lock()
     _collections: Dict[str, any] = {}
     _client = None
 
-    def __new__(cls):
+    def __new__(cls, persist_dir: Optional[str] = None, server_url: Optional[str] = None):
         if cls._instance is None:
             with cls._lock:
                 if cls._instance is None:
@@ -28,8 +80,39 @@ class ChromaDBManager:
                     cls._instance._initialized = False
         return cls._instance
 
-    def __init__(self):
+    def __init__(self, persist_dir: Optional[str] = None, server_url: Optional[str] = None):
         if not self._initialized:
+            self.persist_dir = None
+            if server_url:
+                try:
+                    url = urlparse(server_url)
+                    self._client = chromadb.HttpClient(
+                        host=url.hostname or "localhost",
+                        port=url.port or (443 if url.scheme == "https" else 8000),
+                        ssl=url.scheme == "https",
+                        settings=Settings(anonymized_telemetry=False)
+                    )
+                    self._client.heartbeat()
+                    self._initialized = True
+                    logger.info(f"📚 [ChromaDB] 已连接Chroma服务器: {server_url}")
+                    return
+                except Exception as e:
+                    logger.error(f"❌ [ChromaDB] Chroma服务器连接失败，改用本地存储: {e}")
+
+            if persist_dir:
+                try:
+                    os.makedirs(persist_dir, exist_ok=True)
+                    self._client = chromadb.PersistentClient(
+                        path=persist_dir,
+                        settings=Settings(allow_reset=True, anonymized_telemetry=False)
+                    )
+                    self.persist_dir = persist_dir
+                    self._initialized = True
+                    logger.info(f"📚 [ChromaDB] 持久化管理器初始化完成: {persist_dir}")
+                    return
+                except Exception as e:
+                    logger.error(f"❌ [ChromaDB] 持久化存储初始化失败，改用内存模式: {e}")
+
             try:
                 # 使用更兼容的ChromaDB配置
                 settings = Settings(
@@ -46,6 +129,24 @@ class ChromaDBManager:
                 self._client = chromadb.Client()
                 self._initialized = True
                 logger.info(f"📚 [ChromaDB] 使用备用配置初始化完成")
+        elif persist_dir and persist_dir != self.persist_dir:
+            logger.warning(f"⚠️ [ChromaDB] 管理器已初始化，忽略新的存储路径: {persist_dir}")
+
+    @staticmethod
+    def hnsw_metadata() -> Dict[str, any]:
+        """新建集合的 HNSW 索引参数，可通过环境变量调整"""
+        return {
+            "hnsw:space": os.getenv("CHROMA_HNSW_SPACE", "cosine"),
+            "hnsw:M": int(os.getenv("CHROMA_HNSW_M", "16")),
+            "hnsw:construction_ef": int(os.getenv("CHROMA_HNSW_CONSTRUCTION_EF", "200")),
+            "hnsw:search_ef": int(os.getenv("CHROMA_HNSW_SEARCH_EF", "100")),
+        }
+
+    def write_lock(self):
+        """跨进程写锁（内存模式或不支持 fcntl 的平台上只做进程内加锁）"""
+        return _ChromaWriteLock(
+            os.path.join(self.persist_dir, ".write.lock") if self.persist_dir else None
+        )
 
     def get_or_create_collection(self, name: str):
         """线程安全地获取或创建集合"""
@@ -61,7 +162,8 @@ class ChromaDBManager:
             except Exception:
                 try:
                     # 创建新集合
-                    collection = self._client.create_collection(name=name)
+                    with self.write_lock():
+                        collection = self._client.create_collection(name=name, metadata=self.hnsw_metadata())
                     logger.info(f"📚 [ChromaDB] 创建新集合: {name}")
                 except Exception as e:
                     # 可能是并发创建，再次尝试获取
@@ -76,6 +178,54 @@ class ChromaDBManager:
             self._collections[name] = collection
             return collection
 
+    def max_batch_size(self) -> int:
+        """单次 add 允许的最大条数（旧版本 ChromaDB 没有该接口时使用保守值）"""
+        try:
+            return int(self._client.get_max_batch_size())
+        except Exception:
+            return 5000
+
+
+class _ChromaWriteLock:
+    """进程内锁 + 基于 fcntl.flock 的跨进程文件锁"""
+
+    _thread_lock = threading.RLock()
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self.path and FCNTL_AVAILABLE:
+            try:
+                self._fd = open(self.path, 'a')
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except Exception:
+                self._thread_lock.release()
+                raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+                self._fd.close()
+                self._fd = None
+        finally:
+            self._thread_lock.release()
+        return False
+
+
+def _collection_name(name: str, embedding_model: str) -> str:
+    """
+    集合名附带嵌入模型，切换嵌入服务后不会向已持久化的集合写入维度不同的向量
+    （ChromaDB 集合名只允许 3-63 个字母、数字、._- 字符）
+    """
+    suffix = re.sub(r'[^a-zA-Z0-9._-]', '-', embedding_model).strip('._-')
+    full_name = f"{name}__{suffix}" if suffix else name
+    return full_name[:63].rstrip('._-')
+
 
 class FinancialSituationMemory:
     def __init__(self, name, config):
@@ -207,10 +357,124 @@ class FinancialSituationMemory:
             self.client = OpenAI(base_url=config["backend_url"])
 
         # 使用单例ChromaDB管理器
-        self.chroma_manager = ChromaDBManager()
-        self.situation_collection = self.chroma_manager.get_or_create_collection(name)
+        self.name = name
+        self.chroma_manager = ChromaDBManager(config.get("memory_persist_dir"), config.get("memory_server_url"))
+        self.situation_collection = self.chroma_manager.get_or_create_collection(
+            _collection_name(name, getattr(self, "embedding", "disabled"))
+        )
+
+        # 所有记忆实例共享的嵌入缓存
+        cache_dir = config.get("data_cache_dir")
+        self.embedding_cache = get_embedding_cache(
+            os.path.join(cache_dir, "embeddings") if cache_dir else None
+        )
+
+    def _embedding_namespace(self):
+        """嵌入服务标识：DashScope 或 OpenAI 兼容接口的 base_url"""
+        if self.client is None:
+            return "dashscope"
+        return str(getattr(self.client, "base_url", "openai"))
+
+    def _uses_dashscope(self):
+        return (self.llm_provider == "dashscope" or
+                self.llm_provider == "alibaba" or
+                (self.llm_provider == "google" and self.client is None) or
+                (self.llm_provider == "deepseek" and self.client is None))
+
+    def _batch_limit(self):
+        limit = EMBEDDING_BATCH_LIMITS.get(self.embedding, DEFAULT_EMBEDDING_BATCH_LIMIT)
+        return max(1, int(os.getenv('MEMORY_EMBEDDING_BATCH_SIZE', limit)))
+
+    def _prepare_text(self, text):
+        """截断超出模型长度限制的文本"""
+        max_tokens = EMBEDDING_TOKEN_LIMITS.get(self.embedding, DEFAULT_EMBEDDING_TOKEN_LIMIT)
+        truncated = truncate_for_embedding(text, max_tokens)
+        if len(truncated) < len(text):
+            logger.debug(f"✂️ 嵌入文本超出长度限制，已截断: {len(text)} -> {len(truncated)}字符")
+        return truncated
 
     def get_embedding(self, text):
+        """Get embedding for a text, reusing cached vectors across memories and runs"""
+        if self.client == "DISABLED":
+            logger.debug(f"⚠️ 记忆功能已禁用，返回空向量")
+            return [0.0] * 1024
+
+        return self.embedding_cache.get_or_compute(
+            self._embedding_namespace(), self.embedding, self._prepare_text(text), self._request_embedding
+        )
+
+    def get_embeddings(self, texts):
+        """
+        批量获取嵌入向量
+
+        先查缓存，未命中的文本去重后按模型的批量上限分批请求；
+        失败的文本返回零向量，与 get_embedding 的降级行为一致。
+        """
+        if self.client == "DISABLED":
+            logger.debug(f"⚠️ 记忆功能已禁用，返回空向量")
+            return [[0.0] * 1024 for _ in texts]
+
+        namespace = self._embedding_namespace()
+        prepared = [self._prepare_text(text) for text in texts]
+        results = [None] * len(prepared)
+
+        # 未命中文本 -> 在结果中的位置
+        missing: Dict[str, list] = {}
+        for i, text in enumerate(prepared):
+            vector = self.embedding_cache.get(namespace, self.embedding, text)
+            if vector is not None:
+                results[i] = vector
+            else:
+                missing.setdefault(text, []).append(i)
+
+        pending = list(missing)
+        batch_limit = self._batch_limit()
+        for start in range(0, len(pending), batch_limit):
+            batch = pending[start:start + batch_limit]
+            vectors = self._request_embeddings(batch)
+            for text, vector in zip(batch, vectors):
+                if vector and any(vector):
+                    self.embedding_cache.put(namespace, self.embedding, text, vector)
+                else:
+                    vector = [0.0] * 1024
+                for i in missing[text]:
+                    results[i] = vector
+
+        if pending:
+            logger.debug(f"✅ 批量embedding完成: {len(texts)}条文本, {len(pending)}条未命中缓存, "
+                         f"{(len(pending) + batch_limit - 1) // batch_limit}次请求")
+        return results
+
+    def _request_embeddings(self, texts):
+        """一次请求获取多条文本的嵌入向量，批量接口失败时逐条降级请求"""
+        if len(texts) == 1:
+            return [self._request_embedding(texts[0])]
+
+        try:
+            if self._uses_dashscope():
+                response = TextEmbedding.call(model=self.embedding, input=texts)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{response.code} - {response.message}")
+                vectors = [None] * len(texts)
+                for item in response.output['embeddings']:
+                    vectors[item['text_index']] = item['embedding']
+                return vectors
+
+            if self.client is None:
+                logger.warning(f"⚠️ 嵌入客户端未初始化，返回空向量")
+                return [None] * len(texts)
+
+            response = self.client.embeddings.create(model=self.embedding, input=texts)
+            vectors = [None] * len(texts)
+            for item in response.data:
+                vectors[item.index] = item.embedding
+            return vectors
+
+        except Exception as e:
+            logger.warning(f"⚠️ 批量embedding失败，改为逐条请求: {e}")
+            return [self._request_embedding(text) for text in texts]
+
+    def _request_embedding(self, text):
         """Get embedding for a text using the configured provider"""
 
         # 检查记忆功能是否被禁用
@@ -219,10 +483,7 @@ class FinancialSituationMemory:
             logger.debug(f"⚠️ 记忆功能已禁用，返回空向量")
             return [0.0] * 1024  # 返回1024维的零向量
 
-        if (self.llm_provider == "dashscope" or
-            self.llm_provider == "alibaba" or
-            (self.llm_provider == "google" and self.client is None) or
-            (self.llm_provider == "deepseek" and self.client is None)):
+        if self._uses_dashscope():
             # 使用阿里百炼的嵌入模型
             try:
                 # 检查DashScope API密钥是否可用
@@ -341,26 +602,129 @@ class FinancialSituationMemory:
     def add_situations(self, situations_and_advice):
         """Add financial situations and their corresponding advice. Parameter is a list of tuples (situation, rec)"""
 
-        situations = []
-        advice = []
-        ids = []
-        embeddings = []
+        if not situations_and_advice:
+            return
 
-        offset = self.situation_collection.count()
+        if self.client == "DISABLED":
+            logger.debug(f"⚠️ 记忆功能已禁用，不写入记忆")
+            return
 
-        for i, (situation, recommendation) in enumerate(situations_and_advice):
-            situations.append(situation)
-            advice.append(recommendation)
-            ids.append(str(offset + i))
-            embeddings.append(self.get_embedding(situation))
+        situations = [situation for situation, _ in situations_and_advice]
+        advice = [recommendation for _, recommendation in situations_and_advice]
+        embeddings = self.get_embeddings(situations)
 
-        self.situation_collection.add(
+        self._add_records(
             documents=situations,
             metadatas=[{"recommendation": rec} for rec in advice],
             embeddings=embeddings,
-            ids=ids,
         )
 
+    def _add_records(self, documents, metadatas, embeddings):
+        """
+        在写锁内分配 ID 并按 ChromaDB 单次写入上限分批写入
+
+        嵌入失败的零向量（余弦距离无定义）不写入持久化集合。
+
+        Returns:
+            实际写入的条数
+        """
+        valid = [i for i, vector in enumerate(embeddings) if vector is not None and any(vector)]
+        if len(valid) < len(documents):
+            logger.warning(f"⚠️ [记忆] {self.name} 跳过 {len(documents) - len(valid)} 条嵌入失败的记忆")
+            documents = [documents[i] for i in valid]
+            metadatas = [metadatas[i] for i in valid]
+            embeddings = [embeddings[i] for i in valid]
+        if not documents:
+            return 0
+
+        batch_size = self.chroma_manager.max_batch_size()
+        with self.chroma_manager.write_lock():
+            # 持有跨进程锁时读取条数，多个进程不会分配到相同的 ID
+            offset = self.situation_collection.count()
+            ids = [str(offset + i) for i in range(len(documents))]
+            for start in range(0, len(documents), batch_size):
+                end = start + batch_size
+                self.situation_collection.add(
+                    documents=documents[start:end],
+                    metadatas=metadatas[start:end],
+                    embeddings=embeddings[start:end],
+                    ids=ids[start:end],
+                )
+        return len(documents)
+
+    def export_memories(self, file_path, include_embeddings=True, page_size=1000):
+        """
+        将全部记忆导出为 JSONL 文件（每行一条: document, recommendation, embedding）
+
+        Returns:
+            导出的条数
+        """
+        include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+        exported = 0
+        with open(file_path, 'w', encoding='utf-8') as f:
+            total = self.situation_collection.count()
+            for offset in range(0, total, page_size):
+                page = self.situation_collection.get(limit=page_size, offset=offset, include=include)
+                embeddings = page.get("embeddings") if include_embeddings else None
+                for i, document in enumerate(page["documents"]):
+                    record = {
+                        "document": document,
+                        "recommendation": (page["metadatas"][i] or {}).get("recommendation", ""),
+                    }
+                    if embeddings is not None:
+                        record["embedding_model"] = getattr(self, "embedding", None)
+                        record["embedding"] = [float(x) for x in embeddings[i]]
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    exported += 1
+
+        logger.info(f"📤 [记忆] {self.name} 导出 {exported} 条记忆到 {file_path}")
+        return exported
+
+    def import_memories(self, file_path, batch_size=1000):
+        """
+        从 export_memories 生成的 JSONL 文件批量导入记忆
+
+        由同一嵌入模型生成的向量直接复用，其余文本重新批量嵌入。
+
+        Returns:
+            导入的条数
+        """
+        imported = 0
+        batch = []
+
+        def flush():
+            nonlocal imported
+            if not batch:
+                return
+            documents = [record["document"] for record in batch]
+            embeddings = [
+                record.get("embedding") if record.get("embedding_model") == getattr(self, "embedding", None) else None
+                for record in batch
+            ]
+            missing = [i for i, vector in enumerate(embeddings) if not vector]
+            if missing:
+                for i, vector in zip(missing, self.get_embeddings([documents[i] for i in missing])):
+                    embeddings[i] = vector
+            imported += self._add_records(
+                documents=documents,
+                metadatas=[{"recommendation": record.get("recommendation", "")} for record in batch],
+                embeddings=embeddings,
+            )
+            batch.clear()
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    flush()
+        flush()
+
+        logger.info(f"📥 [记忆] {self.name} 从 {file_path} 导入 {imported} 条记忆")
+        return imported
+
     def get_memories(self, current_situation, n_matches=1):
         """Find matching recommendations using embeddings"""
         query_embedding = self.get_embedding(current_situation)
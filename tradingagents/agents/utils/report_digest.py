@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+辩论阶段的提示词体积控制
+- 分析师完成后生成一次各报告的结构化摘要（有长度上限），研究员、经理和风险辩论者的提示词使用摘要
+- 辩论历史超过 token 阈值时，把较早的发言滚动压缩为摘要，只保留最近几轮原文
+完整报告和完整辩论历史仍保存在状态中，供展示、记忆检索和反思使用。
+"""
+
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Tuple
+
+from tradingagents.dataflows.config import get_config
+from tradingagents.utils.tracing import set_span_attributes
+
+# 导入统一日志系统
+from tradingagents.utils.logging_init import get_logger
+logger = get_logger("default")
+
+
+# 报告字段 -> 名称
+REPORT_FIELDS = {
+    "market_report": "市场研究报告",
+    "sentiment_report": "社交媒体情绪报告",
+    "news_report": "新闻报告",
+    "fundamentals_report": "基本面报告",
+}
+
+# 风险辩论压缩历史时保留原文的最近发言数（一轮三位分析师）
+RISK_DEBATE_KEEP_TURNS = 3
+
+# 每段发言以 "\n<角色> Analyst:" 开头
+_TURN_PATTERN = re.compile(r"\n(?=(?:Bull|Bear|Risky|Safe|Neutral) Analyst:)")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数（2字符/token，与 LLM 适配器的估算一致）"""
+    return len(text or "") // 2
+
+
+def _digest_report(llm, label: str, report: str, max_chars: int) -> str:
+    if len(report) <= max_chars:
+        return report
+
+    prompt = f"""请将下面的{label}压缩为结构化摘要，供后续投资辩论和决策使用，总长度不超过{max_chars}字。
+按以下结构输出：
+【核心结论】
+【关键数据】保留具体数值、价格、日期和指标
+【主要风险】
+【信号倾向】看涨/看跌/中性及理由
+不要添加原文没有的信息，请用中文回答。
+
+{label}：
+{report}"""
+    try:
+        digest = llm.invoke(prompt).content.strip()
+    except Exception as e:
+        logger.warning(f"⚠️ [报告摘要] {label}摘要生成失败，使用截断原文: {e}")
+        digest = ""
+
+    if not digest:
+        digest = report[:max_chars]
+    if len(digest) > max_chars:
+        digest = digest[:max_chars] + "…（已截断）"
+    return digest
+
+
+def create_report_digest_node(llm, max_chars: int = 1500):
+    """
+    创建报告摘要节点：分析师全部完成后运行一次，并发生成各报告摘要，写入 state["report_digests"]
+
+    Args:
+        llm: 用于生成摘要的模型
+        max_chars: 每份摘要的最大字数，不超过该长度的报告原样保留
+    """
+    def report_digest_node(state) -> dict:
+        reports = {field: state.get(field) or "" for field in REPORT_FIELDS}
+        with ThreadPoolExecutor(max_workers=len(reports)) as executor:
+            futures = {
+                field: executor.submit(contextvars.copy_context().run, _digest_report,
+                                       llm, REPORT_FIELDS[field], text, max_chars)
+                for field, text in reports.items() if text
+            }
+            digests = {field: future.result() for field, future in futures.items()}
+
+        original_tokens = sum(estimate_tokens(text) for text in reports.values())
+        digest_tokens = sum(estimate_tokens(text) for text in digests.values())
+        saved = 1 - digest_tokens / original_tokens if original_tokens else 0.0
+        logger.info(f"📉 [报告摘要] 报告约 {original_tokens} tokens -> 摘要约 {digest_tokens} tokens "
+                    f"(每个下游提示词减少 {saved:.0%})")
+        set_span_attributes(**{"digest.original_tokens": original_tokens, "digest.digest_tokens": digest_tokens})
+
+        return {"report_digests": digests}
+
+    return report_digest_node
+
+
+def get_prompt_reports(state) -> Tuple[str, str, str, str]:
+    """
+    提示词中使用的 (市场, 情绪, 新闻, 基本面) 报告：有摘要时用摘要，否则用原文
+    """
+    digests = state.get("report_digests") or {}
+    return tuple(digests.get(field) or state.get(field) or "" for field in REPORT_FIELDS)
+
+
+def _join_history(summary: str, recent: str) -> str:
+    if not summary:
+        return recent
+    return f"【早期辩论摘要】\n{summary}\n\n【最近发言】{recent}"
+
+
+def debate_history_for_prompt(debate_state: Dict[str, Any]) -> str:
+    """提示词中使用的辩论历史：已有的滚动摘要 + 尚未压缩的发言原文（不调用模型）"""
+    history = debate_state.get("history", "")
+    return _join_history(debate_state.get("history_summary", ""), history[debate_state.get("summarized_length", 0):])
+
+
+def compact_debate_history(llm, debate_state: Dict[str, Any], keep_turns: int = 2) -> Tuple[str, Dict[str, Any]]:
+    """
+    滚动压缩辩论历史
+
+    摘要加未压缩发言超过 debate_history_max_tokens 时，把最近 keep_turns 段之前的发言并入摘要。
+
+    Returns:
+        (提示词中使用的辩论历史, 需要写回辩论状态的 history_summary / summarized_length)
+    """
+    history = debate_state.get("history", "")
+    summary = debate_state.get("history_summary", "")
+    offset = debate_state.get("summarized_length", 0)
+    recent = history[offset:]
+    updates = {"history_summary": summary, "summarized_length": offset}
+
+    max_tokens = get_config().get("debate_history_max_tokens", 0)
+    if not max_tokens or estimate_tokens(summary) + estimate_tokens(recent) <= max_tokens:
+        return _join_history(summary, recent), updates
+
+    turn_starts = [match.start() for match in _TURN_PATTERN.finditer(recent)]
+    if len(turn_starts) <= keep_turns:
+        return _join_history(summary, recent), updates
+
+    split = turn_starts[-keep_turns]
+    # 摘要本身占用不超过一半预算（约 max_tokens 个字符）
+    prompt = f"""请把下面的投资辩论内容压缩为摘要，不超过{max_tokens}字。
+保留每位发言者的核心立场、关键论据和数据，以及尚未解决的分歧，请用中文回答。
+
+已有摘要：
+{summary or '（无）'}
+
+新增发言：
+{recent[:split]}"""
+    try:
+        new_summary = llm.invoke(prompt).content.strip()[:max_tokens]
+    except Exception as e:
+        logger.warning(f"⚠️ [辩论摘要] 历史压缩失败，继续使用原文: {e}")
+        return _join_history(summary, recent), updates
+
+    logger.info(f"📉 [辩论摘要] 辩论历史约 {estimate_tokens(summary) + estimate_tokens(recent)} tokens -> "
+                f"约 {estimate_tokens(new_summary) + estimate_tokens(recent[split:])} tokens")
+    updates = {"history_summary": new_summary, "summarized_length": offset + split}
+    return _join_history(new_summary, recent[split:]), updates
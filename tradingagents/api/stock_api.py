@@ -135,6 +135,15 @@ def search_stocks(keyword: str) -> List[Dict[str, Any]]:
         >>> for stock in results:
         logger.info(f"{stock["code']}: {stock['name']}")
     """
+    # 优先使用内存中的证券搜索索引
+    try:
+        from ..dataflows.symbol_index import get_symbol_index, MARKET_A
+        matches = get_symbol_index().search(keyword, limit=50, market=MARKET_A)
+        if matches:
+            return matches
+    except Exception as e:
+        logger.warning(f"⚠️ 证券搜索索引不可用，改为逐条匹配: {e}")
+
     all_stocks = get_all_stocks()
     
     if not all_stocks or (len(all_stocks) == 1 and 'error' in all_stocks[0]):
@@ -6,9 +6,11 @@
 
 import json
 import os
+import threading
+import time
 from datetime import datetime
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -19,6 +21,13 @@ from tradingagents.utils.logging_init import get_logger
 from tradingagents.utils.logging_manager import get_logger
 logger = get_logger('agents')
 
+from tradingagents.utils.tracing import record_llm_usage
+
+from .usage_ledger import UsageLedger
+from .usage_aggregates import (
+    MONGODB_FALLBACK_FIELD, UsageAggregates, merge_daily_series, merge_statistics
+)
+
 try:
     from .mongodb_storage import MongoDBStorage
     MONGODB_AVAILABLE = True
@@ -62,6 +71,45 @@ class UsageRecord:
     analysis_type: str  # 分析类型
 
 
+class JsonFileSnapshot:
+    """
+    JSON配置文件快照
+    解析结果常驻内存，按文件修改时间热加载；两次检查之间至少间隔 check_interval 秒
+    """
+
+    def __init__(self, path: Path, check_interval: float = 1.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self.version = 0  # 每次重新加载后递增，用于派生索引的失效判断
+        self._data = None
+        self._signature = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """获取当前解析结果（文件不存在或解析失败时抛出异常）"""
+        now = time.monotonic()
+        if self._data is not None and now - self._last_check < self.check_interval:
+            return self._data
+
+        with self._lock:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature != self._signature or self._data is None:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._data = json.load(f)
+                self._signature = signature
+                self.version += 1
+            self._last_check = now
+            return self._data
+
+    def invalidate(self):
+        """文件被本进程改写后强制下次重新检查"""
+        with self._lock:
+            self._signature = None
+            self._last_check = 0.0
+
+
 class ConfigManager:
     """配置管理器"""
     
@@ -71,9 +119,17 @@ class ConfigManager:
 
         self.models_file = self.config_dir / "models.json"
         self.pricing_file = self.config_dir / "pricing.json"
-        self.usage_file = self.config_dir / "usage.json"
+        self.usage_file = self.config_dir / "usage.json"  # 旧版格式，仅用于迁移
+        self.usage_ledger_file = self.config_dir / "usage.jsonl"
         self.settings_file = self.config_dir / "settings.json"
 
+        # 配置文件快照，所有适配器共享同一份解析结果
+        self._models_snapshot = JsonFileSnapshot(self.models_file)
+        self._pricing_snapshot = JsonFileSnapshot(self.pricing_file)
+        self._settings_snapshot = JsonFileSnapshot(self.settings_file)
+        self._pricing_index: Dict[tuple, PricingConfig] = {}
+        self._pricing_index_version = -1
+
         # 加载.env文件（保持向后兼容）
         self._load_env_file()
 
@@ -83,6 +139,20 @@ class ConfigManager:
 
         self._init_default_configs()
 
+        # 追加写入的使用记录账本（MongoDB不可用时使用）
+        self.usage_ledger = UsageLedger(
+            self.usage_ledger_file,
+            max_records=self.load_settings().get("max_usage_records", 10000),
+            legacy_file=self.usage_file
+        )
+
+        # 本地账本的增量汇总表，每次读取前按字节偏移追上账本（包括其他进程写入的记录）
+        self.usage_aggregates = UsageAggregates()
+        # MongoDB 已连接时写入失败、落到本地账本的记录，读取 MongoDB 汇总时需要加上
+        self.mongodb_fallback_aggregates = UsageAggregates()
+        self._ledger_position = None
+        self._aggregates_lock = threading.Lock()
+
     def _load_env_file(self):
         """加载.env文件（保持向后兼容）"""
         # 尝试从项目根目录加载.env文件
@@ -130,7 +200,7 @@ class ConfigManager:
                 logger.info("✅ MongoDB存储已启用")
             else:
                 self.mongodb_storage = None
-                logger.warning("⚠️ MongoDB连接失败，将使用JSON文件存储")
+                logger.warning("⚠️ MongoDB连接失败，将使用本地账本存储")
 
         except Exception as e:
             logger.error(f"❌ MongoDB初始化失败: {e}", exc_info=True)
@@ -237,20 +307,19 @@ class ConfigManager:
     def load_models(self) -> List[ModelConfig]:
         """加载模型配置，优先使用.env中的API密钥"""
         try:
-            with open(self.models_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                models = [ModelConfig(**item) for item in data]
-
-                # 合并.env中的API密钥（优先级更高）
-                for model in models:
-                    env_api_key = self._get_env_api_key(model.provider)
-                    if env_api_key:
-                        model.api_key = env_api_key
-                        # 如果.env中有API密钥，自动启用该模型
-                        if not model.enabled:
-                            model.enabled = True
-
-                return models
+            data = self._models_snapshot.get()
+            models = [ModelConfig(**item) for item in data]
+
+            # 合并.env中的API密钥（优先级更高）
+            for model in models:
+                env_api_key = self._get_env_api_key(model.provider)
+                if env_api_key:
+                    model.api_key = env_api_key
+                    # 如果.env中有API密钥，自动启用该模型
+                    if not model.enabled:
+                        model.enabled = True
+
+            return models
         except Exception as e:
             logger.error(f"加载模型配置失败: {e}")
             return []
@@ -263,12 +332,13 @@ class ConfigManager:
                 json.dump(data, f, ensure_ascii=False, indent=2)
         except Exception as e:
             logger.error(f"保存模型配置失败: {e}")
+        finally:
+            self._models_snapshot.invalidate()
     
     def load_pricing(self) -> List[PricingConfig]:
         """加载定价配置"""
         try:
-            with open(self.pricing_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = self._pricing_snapshot.get()
             return [PricingConfig(**item) for item in data]
         except Exception as e:
             logger.error(f"加载定价配置失败: {e}")
@@ -282,27 +352,80 @@ class ConfigManager:
                 json.dump(data, f, ensure_ascii=False, indent=2)
         except Exception as e:
             logger.error(f"保存定价配置失败: {e}")
+        finally:
+            self._pricing_snapshot.invalidate()
+
+    def get_pricing(self, provider: str, model_name: str) -> Optional[PricingConfig]:
+        """按 (provider, model_name) 查找定价，pricing.json 变化时重建索引"""
+        try:
+            data = self._pricing_snapshot.get()
+        except Exception as e:
+            logger.error(f"加载定价配置失败: {e}")
+            return None
+
+        if self._pricing_index_version != self._pricing_snapshot.version:
+            index = {}
+            for item in data:
+                pricing = PricingConfig(**item)
+                # 与原先线性查找保持一致：重复配置以第一条为准
+                index.setdefault((pricing.provider, pricing.model_name), pricing)
+            self._pricing_index = index
+            self._pricing_index_version = self._pricing_snapshot.version
+
+        return self._pricing_index.get((provider, model_name))
     
     def load_usage_records(self) -> List[UsageRecord]:
         """加载使用记录"""
         try:
-            if not self.usage_file.exists():
-                return []
-            with open(self.usage_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return [UsageRecord(**item) for item in data]
+            names = {field.name for field in fields(UsageRecord)}
+            return [UsageRecord(**{k: v for k, v in item.items() if k in names})
+                    for item in self.usage_ledger.load_records()]
         except Exception as e:
             logger.error(f"加载使用记录失败: {e}")
             return []
     
     def save_usage_records(self, records: List[UsageRecord]):
-        """保存使用记录"""
+        """保存使用记录（整体替换）"""
         try:
             data = [asdict(record) for record in records]
-            with open(self.usage_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with self._aggregates_lock:
+                self.usage_ledger.replace_records(data)
+                # 下次读取时从头重建汇总表
+                self._ledger_position = None
         except Exception as e:
             logger.error(f"保存使用记录失败: {e}")
+
+    def _ensure_usage_aggregates(self) -> UsageAggregates:
+        """读取前追上本地账本：只累加新追加的记录，账本被压缩或替换时全量重建"""
+        with self._aggregates_lock:
+            records, self._ledger_position, reread = self.usage_ledger.read_since(self._ledger_position)
+            if reread:
+                self.usage_aggregates.rebuild(records)
+                self.mongodb_fallback_aggregates.rebuild(r for r in records if r.get(MONGODB_FALLBACK_FIELD))
+            else:
+                for record in records:
+                    self.usage_aggregates.add(record)
+                    if record.get(MONGODB_FALLBACK_FIELD):
+                        self.mongodb_fallback_aggregates.add(record)
+        return self.usage_aggregates
+
+    def _ensure_fallback_aggregates(self) -> UsageAggregates:
+        self._ensure_usage_aggregates()
+        return self.mongodb_fallback_aggregates
+
+    def _session_counter(self, aggregates: UsageAggregates, session_id: str, fallback_only: bool = False):
+        """读取会话计数器；计数器已被淘汰时从本地账本恢复"""
+        counter = aggregates.get_session(session_id)
+        if counter is None:
+            logger.debug(f"📊 会话计数器不在汇总表中，从本地账本恢复: {session_id}")
+            with self._aggregates_lock:
+                records = [r for r in self.usage_ledger.load_records()
+                           if not fallback_only or r.get(MONGODB_FALLBACK_FIELD)]
+                counter = aggregates.restore_session(session_id, records)
+        return counter
+
+    def _use_mongodb(self) -> bool:
+        return bool(self.mongodb_storage and self.mongodb_storage.is_connected())
     
     def add_usage_record(self, provider: str, model_name: str, input_tokens: int,
                         output_tokens: int, session_id: str, analysis_type: str = "stock_analysis"):
@@ -322,50 +445,46 @@ class ConfigManager:
         )
         
         # 优先使用MongoDB存储
+        mongodb_fallback = False
         if self.mongodb_storage and self.mongodb_storage.is_connected():
             success = self.mongodb_storage.save_usage_record(record)
             if success:
                 return record
             else:
-                logger.error(f"⚠️ MongoDB保存失败，回退到JSON文件存储")
-        
-        # 回退到JSON文件存储
-        records = self.load_usage_records()
-        records.append(record)
-        
-        # 限制记录数量
-        settings = self.load_settings()
-        max_records = settings.get("max_usage_records", 10000)
-        if len(records) > max_records:
-            records = records[-max_records:]
+                logger.error(f"⚠️ MongoDB保存失败，回退到本地账本存储")
+                mongodb_fallback = True
         
-        self.save_usage_records(records)
+        # 回退到本地账本：追加到缓冲区，由后台线程批量写入；汇总表在读取时从账本追上
+        record_dict = asdict(record)
+        if mongodb_fallback:
+            # 读取 MongoDB 汇总时会加上这些记录
+            record_dict[MONGODB_FALLBACK_FIELD] = True
+        self.usage_ledger.add(record_dict)
         return record
     
     def calculate_cost(self, provider: str, model_name: str, input_tokens: int, output_tokens: int) -> float:
         """计算使用成本"""
-        pricing_configs = self.load_pricing()
+        pricing = self.get_pricing(provider, model_name)
 
-        for pricing in pricing_configs:
-            if pricing.provider == provider and pricing.model_name == model_name:
-                input_cost = (input_tokens / 1000) * pricing.input_price_per_1k
-                output_cost = (output_tokens / 1000) * pricing.output_price_per_1k
-                total_cost = input_cost + output_cost
-                return round(total_cost, 6)
+        if pricing is not None:
+            input_cost = (input_tokens / 1000) * pricing.input_price_per_1k
+            output_cost = (output_tokens / 1000) * pricing.output_price_per_1k
+            total_cost = input_cost + output_cost
+            return round(total_cost, 6)
 
         # 只在找不到配置时输出调试信息
         logger.warning(f"⚠️ [calculate_cost] 未找到匹配的定价配置: {provider}/{model_name}")
         logger.debug(f"⚠️ [calculate_cost] 可用的配置:")
-        for pricing in pricing_configs:
-            logger.debug(f"⚠️ [calculate_cost]   - {pricing.provider}/{pricing.model_name}")
+        for provider_name, pricing_model in self._pricing_index:
+            logger.debug(f"⚠️ [calculate_cost]   - {provider_name}/{pricing_model}")
 
         return 0.0
     
     def load_settings(self) -> Dict[str, Any]:
         """加载设置，合并.env中的配置"""
         try:
-            with open(self.settings_file, 'r', encoding='utf-8') as f:
-                settings = json.load(f)
+            # 返回副本，调用方可以自由修改
+            settings = dict(self._settings_snapshot.get())
         except Exception as e:
             logger.error(f"加载设置失败: {e}")
             settings = {}
@@ -414,6 +533,13 @@ class ConfigManager:
                 json.dump(settings, f, ensure_ascii=False, indent=2)
         except Exception as e:
             logger.error(f"保存设置失败: {e}")
+        finally:
+            self._settings_snapshot.invalidate()
+
+        # 同步账本的记录上限（初始化默认配置时账本尚未创建）
+        usage_ledger = getattr(self, "usage_ledger", None)
+        if usage_ledger is not None:
+            usage_ledger.max_records = settings.get("max_usage_records", usage_ledger.max_records)
     
     def get_enabled_models(self) -> List[ModelConfig]:
         """获取启用的模型"""
@@ -429,68 +555,41 @@ class ConfigManager:
         return None
     
     def get_usage_statistics(self, days: int = 30) -> Dict[str, Any]:
-        """获取使用统计"""
-        # 优先使用MongoDB获取统计
-        if self.mongodb_storage and self.mongodb_storage.is_connected():
+        """获取最近 days 个自然日（含今天）的使用统计，直接读取增量汇总结果"""
+        # 优先使用MongoDB汇总表（加上写入失败回退到本地账本的记录）
+        if self._use_mongodb():
             try:
-                # 从MongoDB获取基础统计
-                stats = self.mongodb_storage.get_usage_statistics(days)
-                # 获取供应商统计
-                provider_stats = self.mongodb_storage.get_provider_statistics(days)
-                
+                stats = self.mongodb_storage.get_rollup_statistics(days)
                 if stats:
-                    stats["provider_stats"] = provider_stats
-                    stats["records_count"] = stats.get("total_requests", 0)
-                    return stats
+                    return merge_statistics(days, stats, self._ensure_fallback_aggregates().get_statistics(days))
             except Exception as e:
-                logger.error(f"⚠️ MongoDB统计获取失败，回退到JSON文件: {e}")
+                logger.error(f"⚠️ MongoDB统计获取失败，回退到本地账本: {e}")
         
-        # 回退到JSON文件统计
-        records = self.load_usage_records()
-        
-        # 过滤最近N天的记录
-        from datetime import datetime, timedelta
+        # 回退到本地账本汇总表
+        return self._ensure_usage_aggregates().get_statistics(days)
+
+    def get_daily_usage(self, days: int = 30) -> List[Dict[str, Any]]:
+        """获取最近 days 天的每日汇总（按日期升序）"""
+        if self._use_mongodb():
+            series = self.mongodb_storage.get_rollup_daily_series(days)
+            if series:
+                return merge_daily_series(series, self._ensure_fallback_aggregates().get_daily_series(days))
+        return self._ensure_usage_aggregates().get_daily_series(days)
+
+    def get_today_cost(self) -> float:
+        """获取今日总成本"""
+        today = datetime.now().date().isoformat()
+        if self._use_mongodb():
+            return (self.mongodb_storage.get_rollup(f"day:{today}")["cost"]
+                    + self._ensure_fallback_aggregates().get_day(today)["cost"])
+        return self._ensure_usage_aggregates().get_day(today)["cost"]
 
-        cutoff_date = datetime.now() - timedelta(days=days)
-        
-        recent_records = []
-        for record in records:
-            try:
-                record_date = datetime.fromisoformat(record.timestamp)
-                if record_date >= cutoff_date:
-                    recent_records.append(record)
-            except:
-                continue
-        
-        # 统计数据
-        total_cost = sum(record.cost for record in recent_records)
-        total_input_tokens = sum(record.input_tokens for record in recent_records)
-        total_output_tokens = sum(record.output_tokens for record in recent_records)
-        
-        # 按供应商统计
-        provider_stats = {}
-        for record in recent_records:
-            if record.provider not in provider_stats:
-                provider_stats[record.provider] = {
-                    "cost": 0,
-                    "input_tokens": 0,
-                    "output_tokens": 0,
-                    "requests": 0
-                }
-            provider_stats[record.provider]["cost"] += record.cost
-            provider_stats[record.provider]["input_tokens"] += record.input_tokens
-            provider_stats[record.provider]["output_tokens"] += record.output_tokens
-            provider_stats[record.provider]["requests"] += 1
-        
-        return {
-            "period_days": days,
-            "total_cost": round(total_cost, 4),
-            "total_input_tokens": total_input_tokens,
-            "total_output_tokens": total_output_tokens,
-            "total_requests": len(recent_records),
-            "provider_stats": provider_stats,
-            "records_count": len(recent_records)
-        }
+    def get_session_cost(self, session_id: str) -> float:
+        """获取会话总成本"""
+        if self._use_mongodb():
+            fallback = self._session_counter(self._ensure_fallback_aggregates(), session_id, fallback_only=True)
+            return self.mongodb_storage.get_rollup(f"session:{session_id}")["cost"] + fallback["cost"]
+        return self._session_counter(self._ensure_usage_aggregates(), session_id)["cost"]
     
     def get_data_dir(self) -> str:
         """获取数据目录路径"""
@@ -545,6 +644,9 @@ class TokenTracker:
     def track_usage(self, provider: str, model_name: str, input_tokens: int,
                    output_tokens: int, session_id: str = None, analysis_type: str = "stock_analysis"):
         """跟踪Token使用"""
+        # 记入当前分析链路的 span（没有进行中的 trace 时不记录）
+        record_llm_usage(input_tokens, output_tokens)
+
         if session_id is None:
             session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
@@ -576,9 +678,8 @@ class TokenTracker:
         settings = self.config_manager.load_settings()
         threshold = settings.get("cost_alert_threshold", 100.0)
 
-        # 获取今日总成本
-        today_stats = self.config_manager.get_usage_statistics(1)
-        total_today = today_stats["total_cost"]
+        # 获取今日总成本（读取增量汇总，不再扫描全部记录）
+        total_today = self.config_manager.get_today_cost()
 
         if total_today >= threshold:
             logger.warning(f"⚠️ 成本警告: 今日成本已达到 ¥{total_today:.4f}，超过阈值 ¥{threshold}",
@@ -586,9 +687,7 @@ class TokenTracker:
 
     def get_session_cost(self, session_id: str) -> float:
         """获取会话成本"""
-        records = self.config_manager.load_usage_records()
-        session_cost = sum(record.cost for record in records if record.session_id == session_id)
-        return session_cost
+        return self.config_manager.get_session_cost(session_id)
 
     def estimate_cost(self, provider: str, model_name: str, estimated_input_tokens: int,
                      estimated_output_tokens: int) -> float:
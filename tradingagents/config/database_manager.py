@@ -24,6 +24,7 @@ class DatabaseManager:
         self.redis_available = False
         self.mongodb_client = None
         self.redis_client = None
+        self.redis_pool = None
 
         # 检测数据库可用性
         self._detect_databases()
@@ -65,7 +66,8 @@ class DatabaseManager:
             "port": int(os.getenv("REDIS_PORT", "6379")),
             "password": os.getenv("REDIS_PASSWORD"),
             "db": int(os.getenv("REDIS_DB", "0")),
-            "timeout": 2
+            "timeout": 2,
+            "max_connections": int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
         }
 
         self.logger.info(f"MongoDB启用: {self.mongodb_enabled}")
@@ -232,7 +234,10 @@ class DatabaseManager:
                 if self.redis_config["password"]:
                     connect_kwargs["password"] = self.redis_config["password"]
 
-                self.redis_client = redis.Redis(**connect_kwargs)
+                # 所有模块共用同一个连接池，避免每次调用都新建连接
+                connect_kwargs["max_connections"] = self.redis_config["max_connections"]
+                self.redis_pool = redis.ConnectionPool(**connect_kwargs)
+                self.redis_client = redis.Redis(connection_pool=self.redis_pool)
                 self.logger.info("Redis客户端初始化成功")
             except Exception as e:
                 self.logger.error(f"Redis客户端初始化失败: {e}")
@@ -314,15 +319,20 @@ class DatabaseManager:
 
         return stats
 
-    def cache_clear_pattern(self, pattern: str) -> int:
-        """清理匹配模式的缓存"""
+    def cache_clear_pattern(self, pattern: str, batch_size: int = 500) -> int:
+        """清理匹配模式的缓存（SCAN 增量遍历，不使用阻塞的 KEYS）"""
         cleared_count = 0
 
         if self.redis_available and self.redis_client:
             try:
-                keys = self.redis_client.keys(pattern)
-                if keys:
-                    cleared_count += self.redis_client.delete(*keys)
+                batch = []
+                for key in self.redis_client.scan_iter(match=pattern, count=batch_size):
+                    batch.append(key)
+                    if len(batch) >= batch_size:
+                        cleared_count += self.redis_client.delete(*batch)
+                        batch = []
+                if batch:
+                    cleared_count += self.redis_client.delete(*batch)
             except Exception as e:
                 self.logger.error(f"Redis缓存清理失败: {e}")
 
@@ -9,6 +9,7 @@ from datetime import datetime
 from typing import Dict, List, Optional, Any
 from dataclasses import asdict
 from .config_manager import UsageRecord
+from .usage_aggregates import COUNTER_FIELDS, empty_counter, build_statistics, record_date, window_dates
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
@@ -42,10 +43,12 @@ class MongoDBStorage:
         
         self.database_name = database_name
         self.collection_name = "token_usage"
+        self.rollup_collection_name = "token_usage_rollups"
         
         self.client = None
         self.db = None
         self.collection = None
+        self.rollup_collection = None
         self._connected = False
         
         # 尝试连接
@@ -63,11 +66,17 @@ class MongoDBStorage:
             
             self.db = self.client[self.database_name]
             self.collection = self.db[self.collection_name]
+            self.rollup_collection = self.db[self.rollup_collection_name]
             
             # 创建索引以提高查询性能
             self._create_indexes()
             
             self._connected = True
+
+            # 首次启用汇总表时根据已有记录回填
+            if self.rollup_collection.estimated_document_count() == 0 and \
+                    self.collection.estimated_document_count() > 0:
+                self.rebuild_rollups()
             logger.info(f"✅ MongoDB连接成功: {self.database_name}.{self.collection_name}")
             
         except (ConnectionFailure, ServerSelectionTimeoutError) as e:
@@ -93,6 +102,9 @@ class MongoDBStorage:
             
             # 创建分析类型索引
             self.collection.create_index("analysis_type")
+
+            # 汇总表按类型和日期查询
+            self.rollup_collection.create_index([("type", 1), ("date", 1)])
             
         except Exception as e:
             logger.error(f"创建MongoDB索引失败: {e}")
@@ -117,6 +129,7 @@ class MongoDBStorage:
             result = self.collection.insert_one(record_dict)
             
             if result.inserted_id:
+                self._increment_rollups(record_dict)
                 return True
             else:
                 logger.error(f"MongoDB插入失败：未返回插入ID")
@@ -126,6 +139,109 @@ class MongoDBStorage:
             logger.error(f"保存记录到MongoDB失败: {e}")
             return False
     
+    def _rollup_updates(self, record: Dict[str, Any]) -> List[tuple]:
+        """一条记录对应的汇总文档 (_id, 固定字段)"""
+        day = record_date(record)
+        provider = record.get('provider', '')
+        model_name = record.get('model_name', '')
+        updates = [
+            (f"day:{day}", {'type': 'day', 'date': day}),
+            (f"model:{day}:{provider}:{model_name}",
+             {'type': 'model', 'date': day, 'provider': provider, 'model_name': model_name}),
+        ]
+        if record.get('session_id'):
+            updates.append((f"session:{record['session_id']}",
+                            {'type': 'session', 'session_id': record['session_id']}))
+        return updates
+
+    def _increment_rollups(self, record: Dict[str, Any]):
+        """使用 $inc upsert 累加按日、按模型、按会话的计数器"""
+        increments = {
+            'cost': record.get('cost', 0) or 0,
+            'input_tokens': record.get('input_tokens', 0) or 0,
+            'output_tokens': record.get('output_tokens', 0) or 0,
+            'requests': 1
+        }
+        try:
+            for rollup_id, fields in self._rollup_updates(record):
+                self.rollup_collection.update_one(
+                    {'_id': rollup_id},
+                    {'$inc': increments, '$setOnInsert': fields},
+                    upsert=True
+                )
+        except Exception as e:
+            logger.error(f"更新MongoDB汇总表失败: {e}")
+
+    def rebuild_rollups(self):
+        """根据明细记录重建汇总表"""
+        if not self._connected:
+            return
+        try:
+            self.rollup_collection.delete_many({})
+            totals: Dict[str, Dict[str, Any]] = {}
+            projection = {'_id': 0, 'timestamp': 1, 'provider': 1, 'model_name': 1,
+                          'session_id': 1, 'cost': 1, 'input_tokens': 1, 'output_tokens': 1}
+            for record in self.collection.find({}, projection):
+                for rollup_id, fields in self._rollup_updates(record):
+                    doc = totals.setdefault(rollup_id, dict(fields, _id=rollup_id, **empty_counter()))
+                    doc['cost'] += record.get('cost', 0) or 0
+                    doc['input_tokens'] += record.get('input_tokens', 0) or 0
+                    doc['output_tokens'] += record.get('output_tokens', 0) or 0
+                    doc['requests'] += 1
+            if totals:
+                self.rollup_collection.insert_many(list(totals.values()))
+            logger.info(f"✅ MongoDB汇总表已重建: {len(totals)}个计数器")
+        except Exception as e:
+            logger.error(f"重建MongoDB汇总表失败: {e}")
+
+    def get_rollup_statistics(self, days: int = 30) -> Dict[str, Any]:
+        """从汇总表获取最近 days 个自然日的统计"""
+        if not self._connected:
+            return {}
+        try:
+            dates = window_dates(days)
+            total = empty_counter()
+            provider_stats: Dict[str, Dict[str, Any]] = {}
+            for doc in self.rollup_collection.find({'type': 'model', 'date': {'$gte': dates[-1]}}):
+                stats = provider_stats.setdefault(doc.get('provider', ''), empty_counter())
+                for field in COUNTER_FIELDS:
+                    stats[field] += doc.get(field, 0)
+                    total[field] += doc.get(field, 0)
+            for stats in provider_stats.values():
+                stats['cost'] = round(stats['cost'], 4)
+            return build_statistics(days, total, provider_stats)
+        except Exception as e:
+            logger.error(f"获取MongoDB汇总统计失败: {e}")
+            return {}
+
+    def get_rollup(self, rollup_id: str) -> Dict[str, Any]:
+        """读取单个汇总计数器（如 day:2025-01-01、session:xxx）"""
+        if not self._connected:
+            return empty_counter()
+        try:
+            doc = self.rollup_collection.find_one({'_id': rollup_id}) or {}
+            return {field: doc.get(field, 0) for field in COUNTER_FIELDS}
+        except Exception as e:
+            logger.error(f"读取MongoDB汇总计数器失败: {e}")
+            return empty_counter()
+
+    def get_rollup_daily_series(self, days: int = 30) -> List[Dict[str, Any]]:
+        """最近 days 天每日汇总（按日期升序）"""
+        if not self._connected:
+            return []
+        try:
+            dates = window_dates(days)
+            cursor = self.rollup_collection.find(
+                {'type': 'day', 'date': {'$gte': dates[-1]}}
+            ).sort('date', 1)
+            return [
+                dict({field: doc.get(field, 0) for field in COUNTER_FIELDS}, date=doc['date'])
+                for doc in cursor
+            ]
+        except Exception as e:
+            logger.error(f"读取MongoDB每日汇总失败: {e}")
+            return []
+    
     def load_usage_records(self, limit: int = 10000, days: int = None) -> List[UsageRecord]:
         """从MongoDB加载使用记录"""
         if not self._connected:
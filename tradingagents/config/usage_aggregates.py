@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Token使用增量聚合
+在记录写入时维护按日、按供应商/模型、按会话的计数器，成本警告和统计页面直接读取汇总结果
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 导入日志模块
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('agents')
+
+
+COUNTER_FIELDS = ("cost", "input_tokens", "output_tokens", "requests")
+
+# MongoDB 已连接但写入失败、回退到本地账本的记录带有该标记
+MONGODB_FALLBACK_FIELD = "mongodb_fallback"
+
+
+def empty_counter() -> Dict[str, float]:
+    return {"cost": 0.0, "input_tokens": 0, "output_tokens": 0, "requests": 0}
+
+
+def _accumulate(counter: Dict[str, float], record: Dict[str, Any]):
+    counter["cost"] += record.get("cost", 0) or 0
+    counter["input_tokens"] += record.get("input_tokens", 0) or 0
+    counter["output_tokens"] += record.get("output_tokens", 0) or 0
+    counter["requests"] += 1
+
+
+def record_date(record: Dict[str, Any]) -> str:
+    """记录所属日期（YYYY-MM-DD），取自 ISO 时间戳"""
+    return str(record.get("timestamp", ""))[:10]
+
+
+def window_dates(days: int, today: datetime = None) -> List[str]:
+    """最近 days 个自然日（含今天）的日期列表"""
+    today = (today or datetime.now()).date()
+    return [(today - timedelta(days=offset)).isoformat() for offset in range(max(days, 1))]
+
+
+class UsageAggregates:
+    """进程内的使用记录汇总表"""
+
+    def __init__(self, max_sessions: int = 5000):
+        """
+        Args:
+            max_sessions: 保留会话计数器的最大数量（按最近使用淘汰）
+        """
+        self.max_sessions = max_sessions
+        self._daily: Dict[str, Dict[str, float]] = {}
+        self._daily_models: Dict[str, Dict[Tuple[str, str], Dict[str, float]]] = {}
+        self._sessions: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        self._sessions_evicted = False
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]):
+        """累加一条记录"""
+        day = record_date(record)
+        with self._lock:
+            _accumulate(self._daily.setdefault(day, empty_counter()), record)
+
+            model_key = (record.get("provider", ""), record.get("model_name", ""))
+            models = self._daily_models.setdefault(day, {})
+            _accumulate(models.setdefault(model_key, empty_counter()), record)
+
+            session_id = record.get("session_id")
+            if session_id:
+                counter = self._sessions.pop(session_id, None) or empty_counter()
+                _accumulate(counter, record)
+                self._sessions[session_id] = counter
+                self._evict_sessions()
+
+    def _evict_sessions(self):
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self._sessions_evicted = True
+
+    def rebuild(self, records: Iterable[Dict[str, Any]]):
+        """根据全部记录重建汇总表"""
+        with self._lock:
+            self._daily.clear()
+            self._daily_models.clear()
+            self._sessions.clear()
+            self._sessions_evicted = False
+        count = 0
+        for record in records:
+            self.add(record)
+            count += 1
+        logger.debug(f"📊 使用记录汇总表已重建: {count}条记录")
+
+    def get_day(self, day: str) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._daily.get(day, empty_counter()))
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, float]]:
+        """会话计数器；会话不在表中且曾淘汰过计数器时返回 None（需由调用方从记录中恢复）"""
+        with self._lock:
+            counter = self._sessions.get(session_id)
+            if counter is None and self._sessions_evicted:
+                return None
+            return dict(counter or empty_counter())
+
+    def restore_session(self, session_id: str, records: Iterable[Dict[str, Any]]) -> Dict[str, float]:
+        """根据会话的全部记录恢复被淘汰的计数器"""
+        counter = empty_counter()
+        for record in records:
+            if record.get("session_id") == session_id:
+                _accumulate(counter, record)
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._sessions[session_id] = counter
+            self._evict_sessions()
+        return dict(counter)
+
+    def get_daily_series(self, days: int) -> List[Dict[str, Any]]:
+        """最近 days 天每日汇总（按日期升序，仅包含有记录的日期）"""
+        series = []
+        with self._lock:
+            for day in reversed(window_dates(days)):
+                counter = self._daily.get(day)
+                if counter:
+                    series.append(dict(counter, date=day))
+        return series
+
+    def get_statistics(self, days: int) -> Dict[str, Any]:
+        """最近 days 天的统计，结构与 ConfigManager.get_usage_statistics 一致"""
+        total = empty_counter()
+        provider_stats: Dict[str, Dict[str, float]] = {}
+
+        with self._lock:
+            for day in window_dates(days):
+                counter = self._daily.get(day)
+                if counter:
+                    for field in COUNTER_FIELDS:
+                        total[field] += counter[field]
+                for (provider, _), model_counter in self._daily_models.get(day, {}).items():
+                    stats = provider_stats.setdefault(provider, empty_counter())
+                    for field in COUNTER_FIELDS:
+                        stats[field] += model_counter[field]
+
+        return build_statistics(days, total, provider_stats)
+
+
+def merge_statistics(days: int, *statistics: Dict[str, Any]) -> Dict[str, Any]:
+    """合并多份 build_statistics 结果（如 MongoDB 汇总和回退到本地账本的记录）"""
+    total = empty_counter()
+    provider_stats: Dict[str, Dict[str, float]] = {}
+    for stats in statistics:
+        total["cost"] += stats.get("total_cost", 0)
+        total["input_tokens"] += stats.get("total_input_tokens", 0)
+        total["output_tokens"] += stats.get("total_output_tokens", 0)
+        total["requests"] += stats.get("total_requests", 0)
+        for provider, counter in stats.get("provider_stats", {}).items():
+            merged = provider_stats.setdefault(provider, empty_counter())
+            for field in COUNTER_FIELDS:
+                merged[field] += counter.get(field, 0)
+    return build_statistics(days, total, provider_stats)
+
+
+def merge_daily_series(*series: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """按日期合并多份每日汇总（按日期升序）"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for items in series:
+        for item in items:
+            day = merged.setdefault(item["date"], dict(empty_counter(), date=item["date"]))
+            for field in COUNTER_FIELDS:
+                day[field] += item.get(field, 0)
+    return [merged[day] for day in sorted(merged)]
+
+
+def build_statistics(days: int, total: Dict[str, float],
+                     provider_stats: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
+    """组装统计结果"""
+    return {
+        "period_days": days,
+        "total_cost": round(total["cost"], 4),
+        "total_input_tokens": total["input_tokens"],
+        "total_output_tokens": total["output_tokens"],
+        "total_requests": total["requests"],
+        "provider_stats": provider_stats,
+        "records_count": total["requests"]
+    }
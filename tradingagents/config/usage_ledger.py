@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Token使用记录账本
+追加写入的 JSONL 文件 + 后台批量写线程，替代每次调用都全量重写 usage.json
+"""
+
+import atexit
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# 导入日志模块
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('agents')
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows
+    fcntl = None
+    FCNTL_AVAILABLE = False
+
+
+class UsageLedger:
+    """
+    追加写入的使用记录账本
+
+    - add() 只把记录放入内存缓冲区，由后台线程按批次追加到 JSONL 文件
+    - 行数超过 max_records * compact_ratio 时压缩为最近 max_records 条
+    - 进程退出时（atexit）同步刷新缓冲区
+    """
+
+    def __init__(self, ledger_file: Path, max_records: int = 10000, legacy_file: Path = None,
+                 flush_interval: float = 1.0, batch_size: int = 200, compact_ratio: float = 1.2):
+        """
+        初始化账本
+
+        Args:
+            ledger_file: JSONL 账本文件路径
+            max_records: 保留的最大记录数
+            legacy_file: 旧版 usage.json 路径，账本不存在时一次性迁移
+            flush_interval: 后台刷新间隔（秒）
+            batch_size: 缓冲区达到该条数时立即刷新
+            compact_ratio: 触发压缩的行数倍率
+        """
+        self.ledger_file = Path(ledger_file)
+        self.lock_file = self.ledger_file.with_suffix(self.ledger_file.suffix + ".lock")
+        self.max_records = max_records
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.compact_ratio = compact_ratio
+
+        self._pending: List[Dict[str, Any]] = []
+        self._condition = threading.Condition()
+        self._io_lock = threading.RLock()
+        self._line_count: Optional[int] = None
+        self._closed = False
+
+        if legacy_file is not None:
+            self._migrate_legacy(Path(legacy_file))
+
+        self._writer = threading.Thread(target=self._writer_loop, name="usage-ledger-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _file_lock(self):
+        """跨进程文件锁（仅在支持 fcntl 的平台上生效）"""
+        return _InterProcessLock(self.lock_file)
+
+    def _migrate_legacy(self, legacy_file: Path):
+        """将旧版 usage.json 中的记录迁移到 JSONL 账本"""
+        if self.ledger_file.exists() or not legacy_file.exists():
+            return
+        try:
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            if records:
+                self._rewrite(records[-self.max_records:])
+                logger.info(f"✅ 已将 {len(records)} 条使用记录从 {legacy_file.name} 迁移到 {self.ledger_file.name}")
+        except Exception as e:
+            logger.error(f"迁移旧版使用记录失败: {e}")
+
+    def add(self, record: Dict[str, Any]):
+        """追加一条记录（非阻塞）"""
+        with self._condition:
+            self._pending.append(record)
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+
+    def _writer_loop(self):
+        while True:
+            with self._condition:
+                if not self._pending and not self._closed:
+                    self._condition.wait(self.flush_interval)
+                if self._closed and not self._pending:
+                    return
+            self.flush()
+
+    def _take_pending(self) -> List[Dict[str, Any]]:
+        with self._condition:
+            batch, self._pending = self._pending, []
+        return batch
+
+    def flush(self):
+        """将缓冲区中的记录同步写入账本"""
+        with self._io_lock:
+            batch = self._take_pending()
+            if not batch:
+                return
+            try:
+                data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch)
+                with self._file_lock():
+                    # 一次 write 追加整个批次，避免多进程交错写入半行
+                    with open(self.ledger_file, 'a', encoding='utf-8') as f:
+                        f.write(data)
+                        f.flush()
+                        os.fsync(f.fileno())
+            except Exception as e:
+                logger.error(f"写入使用记录失败: {e}")
+                # 写入失败时放回缓冲区，下次重试
+                with self._condition:
+                    self._pending = batch + self._pending
+                return
+
+            if self._line_count is not None:
+                self._line_count += len(batch)
+            try:
+                self._maybe_compact()
+            except Exception as e:
+                logger.error(f"压缩使用记录失败: {e}")
+
+    def _count_lines(self) -> int:
+        if not self.ledger_file.exists():
+            return 0
+        with open(self.ledger_file, 'rb') as f:
+            return sum(1 for _ in f)
+
+    def _maybe_compact(self):
+        if self._line_count is None:
+            self._line_count = self._count_lines()
+        if self._line_count > self.max_records * self.compact_ratio:
+            self.compact()
+
+    def compact(self):
+        """压缩账本，只保留最近 max_records 条"""
+        with self._io_lock:
+            with self._file_lock():
+                records = self._read_file()
+                self._rewrite_unlocked(records[-self.max_records:])
+            logger.debug(f"📒 使用记录账本已压缩: {len(records)} -> {min(len(records), self.max_records)}")
+
+    def _read_file(self) -> List[Dict[str, Any]]:
+        if not self.ledger_file.exists():
+            return []
+        records = []
+        with open(self.ledger_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 崩溃时可能残留半行，跳过
+                    continue
+        return records
+
+    def _rewrite_unlocked(self, records: List[Dict[str, Any]]):
+        tmp_file = self.ledger_file.with_suffix(self.ledger_file.suffix + f".tmp-{os.getpid()}")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.ledger_file)
+        self._line_count = len(records)
+
+    def _rewrite(self, records: List[Dict[str, Any]]):
+        with self._io_lock:
+            with self._file_lock():
+                self._rewrite_unlocked(records)
+
+    def load_records(self) -> List[Dict[str, Any]]:
+        """读取全部记录（先刷新缓冲区，保证读到自己写入的记录）"""
+        self.flush()
+        with self._io_lock:
+            records = self._read_file()
+        return records[-self.max_records:]
+
+    def read_since(self, position: Optional[Tuple[int, int]] = None
+                   ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int]], bool]:
+        """
+        增量读取 position 之后追加的记录（包括其他进程写入的记录）
+
+        Args:
+            position: 上次读取返回的 (inode, 字节偏移)，None 表示从头读取
+
+        Returns:
+            (记录列表, 新的读取位置, 是否从头读取)；账本被压缩或替换（inode 变化、文件变小）时从头读取，
+            调用方应据此全量重建而不是累加
+        """
+        self.flush()
+        with self._io_lock:
+            try:
+                f = open(self.ledger_file, 'rb')
+            except FileNotFoundError:
+                return [], None, position is not None
+            with f:
+                stat = os.fstat(f.fileno())
+                inode, offset = position or (None, 0)
+                reread = inode != stat.st_ino or stat.st_size < offset
+                if reread:
+                    offset = 0
+                records = []
+                if stat.st_size > offset:
+                    f.seek(offset)
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break  # 写入中的半行留到下次读取
+                        offset += len(line)
+                        if not line.strip():
+                            continue
+                        try:
+                            records.append(json.loads(line.decode('utf-8')))
+                        except (json.JSONDecodeError, UnicodeDecodeError):
+                            # 崩溃时可能残留半行，跳过
+                            continue
+        if reread:
+            records = records[-self.max_records:]
+        return records, (stat.st_ino, offset), reread
+
+    def replace_records(self, records: List[Dict[str, Any]]):
+        """整体替换账本内容（例如清空记录）"""
+        with self._io_lock:
+            self._take_pending()
+            self._rewrite(records[-self.max_records:])
+
+    def close(self):
+        """停止后台线程并刷新剩余记录"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._writer.join(timeout=5)
+        self.flush()
+
+
+class _InterProcessLock:
+    """基于 fcntl.flock 的文件锁，不支持的平台上退化为空操作"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        if FCNTL_AVAILABLE:
+            self._fd = open(self.path, 'a')
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            self._fd.close()
+            self._fd = None
+        return False
@@ -37,6 +37,7 @@ from .interface import (
     get_simfin_balance_sheet,
     get_simfin_cashflow,
     get_simfin_income_statements,
+    get_simfin_financial_statements,
     # Technical analysis functions
     get_stock_stats_indicators_window,
     get_stockstats_indicator,
@@ -71,6 +72,7 @@ __all__ = [
     "get_simfin_balance_sheet",
     "get_simfin_cashflow",
     "get_simfin_income_statements",
+    "get_simfin_financial_statements",
     # Technical analysis functions
     "get_stock_stats_indicators_window",
     "get_stockstats_indicator",
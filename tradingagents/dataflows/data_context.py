@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+单次分析的数据上下文
+分析开始时打开一个上下文，期间对数据接口的调用按 (函数, 参数) 记忆结果：
+股票验证阶段预获取的数据会被分析师工具直接复用，同一份数据在一次分析中最多从上游获取一次；
+分析师重复发起的相同 (工具, 参数) 调用也直接返回已有结果。
+历史行情接口按股票记忆覆盖的日期区间：请求区间落在已获取区间内时直接复用，
+超出时按并集区间重新获取一次，后续更短的窗口都能命中。
+没有打开上下文时，被装饰的函数行为不变。
+"""
+
+import copy
+import functools
+import inspect
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+# 导入日志模块
+from tradingagents.utils.logging_manager import get_logger
+from tradingagents.utils.tracing import ATTR_CACHE, SPAN_CLIENT, get_current_trace, set_span_attributes, trace_span
+logger = get_logger('agents')
+
+
+class AnalysisDataContext:
+    """一次分析内的数据记忆表，同一个键的并发请求只会触发一次实际获取"""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self._memo: Dict[Tuple, Any] = {}
+        self._inflight: Dict[Tuple, threading.Event] = {}
+        # 每个键首次获取的耗时，命中时累计为节省的时间
+        self._fetch_seconds: Dict[Tuple, float] = {}
+        # 区间记忆：键（不含日期参数）-> 已获取的最大 (开始日期, 结束日期)
+        self._windows: Dict[Tuple, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "saved_seconds": 0.0}
+
+    def get_or_fetch(self, key: Tuple, fetch: Callable[[], Any],
+                     cacheable: Callable[[Any], bool]) -> Any:
+        while True:
+            with self._lock:
+                if key in self._memo:
+                    self._stats["hits"] += 1
+                    self._stats["saved_seconds"] += self._fetch_seconds.get(key, 0.0)
+                    return _copy_result(self._memo[key])
+                event = self._inflight.get(key)
+                if event is None:
+                    event = threading.Event()
+                    self._inflight[key] = event
+                    self._stats["misses"] += 1
+                    break
+            # 其他线程正在获取同一份数据，等待后重新检查（对方失败时由本线程自行获取）
+            event.wait()
+            with self._lock:
+                if key not in self._memo:
+                    return fetch()
+
+        try:
+            start = time.time()
+            value = fetch()
+            if cacheable(value):
+                with self._lock:
+                    self._memo[key] = value
+                    self._fetch_seconds[key] = time.time() - start
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def get_or_fetch_range(self, key: Tuple, start_date: str, end_date: str,
+                           fetch: Callable[[str, str], Any], cacheable: Callable[[Any], bool]) -> Any:
+        """按覆盖区间记忆：已获取区间包含请求区间时复用，否则获取两者的并集区间"""
+        with self._lock:
+            window = self._windows.get(key)
+        if window is not None:
+            start_date, end_date = min(start_date, window[0]), max(end_date, window[1])
+
+        range_key = key + (("__range__", start_date, end_date),)
+        value = self.get_or_fetch(range_key, lambda: fetch(start_date, end_date), cacheable)
+        with self._lock:
+            current = self._windows.get(key)
+            if range_key in self._memo and (current is None or
+                                            (start_date <= current[0] and end_date >= current[1])):
+                self._windows[key] = (start_date, end_date)
+        return value
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, entries=len(self._memo))
+
+
+def _copy_result(value: Any) -> Any:
+    # 字典/列表结果返回副本，避免调用方修改影响其他使用者
+    return copy.copy(value) if isinstance(value, (dict, list)) else value
+
+
+def _default_cacheable(value: Any) -> bool:
+    """None 和以 ❌ 开头的错误信息不记忆，后续调用仍会重试"""
+    if value is None:
+        return False
+    if isinstance(value, str):
+        return bool(value.strip()) and not value.lstrip().startswith("❌")
+    return True
+
+
+_current_context: ContextVar[Optional[AnalysisDataContext]] = ContextVar("analysis_data_context", default=None)
+
+
+def get_data_context() -> Optional[AnalysisDataContext]:
+    """当前生效的数据上下文，没有时返回 None"""
+    return _current_context.get()
+
+
+@contextmanager
+def analysis_data_context(label: str = "") -> Iterator[AnalysisDataContext]:
+    """
+    打开数据上下文；已有上下文时直接复用（例如 Web 分析流程内再调用 propagate）
+
+    LangGraph 在线程池中执行节点时会复制 contextvars，图中的工具调用也能看到该上下文。
+    """
+    current = _current_context.get()
+    if current is not None:
+        yield current
+        return
+
+    context = AnalysisDataContext(label)
+    token = _current_context.set(context)
+    try:
+        yield context
+    finally:
+        _current_context.reset(token)
+        stats = context.get_stats()
+        set_span_attributes(**{"cache.hits": stats['hits'], "cache.saved_seconds": round(stats['saved_seconds'], 3)})
+        logger.info(f"📦 [数据上下文] {label} 结束: 命中 {stats['hits']} 次, 获取 {stats['misses']} 次, "
+                    f"节省约 {stats['saved_seconds']:.1f}s")
+
+
+_DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def memoize_in_context(func: Callable = None, *, cacheable: Callable[[Any], bool] = _default_cacheable,
+                       date_range: Optional[Tuple[str, str]] = None):
+    """
+    装饰数据接口函数：在数据上下文中按 (函数, 参数) 记忆返回值
+
+    Args:
+        cacheable: 判断返回值是否可以记忆
+        date_range: 开始/结束日期的参数名；指定后这两个参数不进入键，按覆盖区间记忆
+            （返回值可能覆盖比请求更长的区间，只适用于返回整段行情的接口）
+    """
+    def decorator(f: Callable) -> Callable:
+        name = f"{f.__module__}.{f.__qualname__}"
+        signature = inspect.signature(f)
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if get_current_trace() is None:
+                return _call(args, kwargs, None)
+            with trace_span(f"data {f.__name__}", SPAN_CLIENT) as span:
+                return _call(args, kwargs, span)
+
+        def _call(args, kwargs, span):
+            context = _current_context.get()
+            if context is None:
+                return f(*args, **kwargs)
+            try:
+                # 按签名绑定参数，位置参数和关键字参数、显式传入默认值都对应同一个键
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                arguments = dict(bound.arguments)
+                dates = None
+                if date_range is not None:
+                    dates = tuple(arguments.pop(param) for param in date_range)
+                    if not all(isinstance(d, str) and _DATE_PATTERN.match(d) for d in dates):
+                        # 日期缺省或格式不规范时按原参数精确记忆
+                        arguments, dates = dict(bound.arguments), None
+                key = (name, tuple(arguments.items()))
+                hash(key)
+            except TypeError:
+                # 参数不可哈希，不做记忆
+                return f(*args, **kwargs)
+
+            # 记录本次调用是否命中上下文记忆
+            fetched = []
+
+            def fetch(*range_dates):
+                fetched.append(True)
+                if not range_dates:
+                    return f(*args, **kwargs)
+                bound.arguments.update(zip(date_range, range_dates))
+                return f(*bound.args, **bound.kwargs)
+
+            if dates is None:
+                result = context.get_or_fetch(key, fetch, cacheable)
+            else:
+                result = context.get_or_fetch_range(key, dates[0], dates[1], fetch, cacheable)
+            if span is None:
+                return result
+            span.set_attribute(ATTR_CACHE, "miss" if fetched else "hit")
+            return result
+
+        return wrapper
+
+    return decorator(func) if func is not None else decorator
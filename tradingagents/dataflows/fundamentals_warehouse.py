@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+A股基本面数据仓库
+定时批量拉取全市场财报（Tushare 按报告期的 *_vip 接口，每张报表每期一次调用），
+以 (ts_code, end_date) 为键存为列式文件，并用向量化 pandas 预先计算财务比率和行业分位数。
+分析时 get_metrics() 只做本地查找，不再逐只股票请求网络。
+
+定时任务示例（cron）：python -m tradingagents.dataflows.fundamentals_warehouse --periods 8
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# 导入日志模块
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('agents')
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    try:
+        import fastparquet  # noqa: F401
+        PARQUET_AVAILABLE = True
+    except ImportError:
+        PARQUET_AVAILABLE = False
+
+
+KEY_COLUMNS = ["ts_code", "end_date"]
+
+# 报表 -> (Tushare 接口, 字段)
+STATEMENT_APIS = {
+    "income": ("income_vip", [
+        "total_revenue", "revenue", "oper_cost", "operate_profit", "n_income", "n_income_attr_p",
+    ]),
+    "balancesheet": ("balancesheet_vip", [
+        "total_assets", "total_liab", "total_hldr_eqy_exc_min_int", "total_cur_assets",
+        "total_cur_liab", "inventories", "money_cap",
+    ]),
+    "cashflow": ("cashflow_vip", [
+        "n_cashflow_act",
+    ]),
+}
+
+VALUATION_FIELDS = ["close", "pe_ttm", "pb", "ps_ttm", "dv_ttm", "total_mv"]
+
+# 计算行业分位数的指标
+PERCENTILE_COLUMNS = [
+    "pe_ttm", "pb", "ps_ttm", "dv_ttm", "roe", "roa", "gross_margin", "net_margin",
+    "debt_ratio", "current_ratio", "revenue_yoy", "profit_yoy",
+]
+
+
+def recent_report_periods(count: int, today: datetime = None) -> List[str]:
+    """最近 count 个已结束的报告期（季度末，YYYYMMDD），最新的在前"""
+    today = today or datetime.now()
+    quarter_ends = [(3, 31), (6, 30), (9, 30), (12, 31)]
+    periods = []
+    year = today.year
+    while len(periods) < count:
+        for month, day in reversed(quarter_ends):
+            end = datetime(year, month, day)
+            if end < today and len(periods) < count:
+                periods.append(end.strftime("%Y%m%d"))
+        year -= 1
+    return periods
+
+
+def _latest_statement_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """同一 (ts_code, end_date) 可能有多条（合并/母公司报表、更正公告），保留最新的合并报表"""
+    if df.empty:
+        return df
+    if "report_type" in df.columns:
+        df = df[df["report_type"].astype(str) == "1"]
+    sort_columns = [c for c in ("ann_date", "update_flag") if c in df.columns]
+    if sort_columns:
+        df = df.sort_values(sort_columns, kind="mergesort")
+    return df.drop_duplicates(KEY_COLUMNS, keep="last")
+
+
+def compute_metrics(statements: pd.DataFrame, valuation: pd.DataFrame,
+                    stock_basic: pd.DataFrame) -> pd.DataFrame:
+    """
+    由财报、估值快照和股票列表计算每只股票的最新指标（全部为向量化运算）
+
+    流量类数据为年初至今累计值，ROE/ROA 按报告期月份年化。
+    """
+    statements = statements.copy()
+
+    # 同比：与上一年同一报告期对比
+    previous = statements[KEY_COLUMNS + ["total_revenue", "n_income_attr_p"]].copy()
+    previous["end_date"] = (pd.to_datetime(previous["end_date"], format="%Y%m%d")
+                            + pd.DateOffset(years=1)).dt.strftime("%Y%m%d")
+    previous = previous.rename(columns={"total_revenue": "prev_revenue", "n_income_attr_p": "prev_profit"})
+    statements = statements.merge(previous, on=KEY_COLUMNS, how="left")
+
+    # 每只股票取最新一期
+    statements = statements.sort_values(KEY_COLUMNS).drop_duplicates("ts_code", keep="last")
+    end_dates = pd.to_datetime(statements["end_date"], format="%Y%m%d")
+    annualize = 12.0 / end_dates.dt.month
+
+    revenue = statements["revenue"].fillna(statements["total_revenue"])
+    metrics = pd.DataFrame({
+        "ts_code": statements["ts_code"].values,
+        "end_date": statements["end_date"].values,
+        "roe": (statements["n_income_attr_p"] * annualize / statements["total_hldr_eqy_exc_min_int"]).values,
+        "roa": (statements["n_income"] * annualize / statements["total_assets"]).values,
+        "gross_margin": ((revenue - statements["oper_cost"]) / revenue).values,
+        "net_margin": (statements["n_income"] / revenue).values,
+        "debt_ratio": (statements["total_liab"] / statements["total_assets"]).values,
+        "current_ratio": (statements["total_cur_assets"] / statements["total_cur_liab"]).values,
+        "quick_ratio": ((statements["total_cur_assets"] - statements["inventories"].fillna(0))
+                        / statements["total_cur_liab"]).values,
+        "cash_ratio": (statements["money_cap"] / statements["total_cur_liab"]).values,
+        "ocf_to_profit": (statements["n_cashflow_act"] / statements["n_income"]).values,
+        "revenue_yoy": (statements["total_revenue"] / statements["prev_revenue"] - 1).values,
+        "profit_yoy": ((statements["n_income_attr_p"] - statements["prev_profit"])
+                       / statements["prev_profit"].abs()).values,
+    })
+
+    if not valuation.empty:
+        metrics = metrics.merge(valuation[["ts_code", "trade_date"] + VALUATION_FIELDS], on="ts_code", how="outer")
+    if not stock_basic.empty:
+        metrics = metrics.merge(stock_basic[["ts_code", "name", "industry"]], on="ts_code", how="left")
+
+    numeric = metrics.select_dtypes(include=[np.number]).columns
+    metrics[numeric] = metrics[numeric].replace([np.inf, -np.inf], np.nan)
+
+    # 行业分位数（行业内升序排名百分比）；无行业信息的按全市场计算
+    group_key = metrics["industry"].fillna("全市场") if "industry" in metrics.columns else pd.Series("全市场", index=metrics.index)
+    for column in PERCENTILE_COLUMNS:
+        if column in metrics.columns:
+            metrics[f"{column}_pct"] = metrics.groupby(group_key)[column].rank(pct=True)
+
+    return metrics.set_index("ts_code").sort_index()
+
+
+class FundamentalsWarehouse:
+    """基本面数据仓库：statements（按报告期的原始财报）+ metrics（每只股票的最新指标）"""
+
+    def __init__(self, warehouse_dir: str):
+        self.warehouse_dir = warehouse_dir
+        self._metrics: Optional[pd.DataFrame] = None
+        self._metrics_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    # ---------- 存储 ----------
+
+    def _path(self, name: str) -> str:
+        extension = "parquet" if PARQUET_AVAILABLE else "pkl"
+        return os.path.join(self.warehouse_dir, f"{name}.{extension}")
+
+    def _read(self, name: str) -> pd.DataFrame:
+        path = self._path(name)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        return pd.read_parquet(path) if PARQUET_AVAILABLE else pd.read_pickle(path)
+
+    def _write(self, name: str, df: pd.DataFrame):
+        """先写临时文件再原子替换，读取方不会读到写了一半的文件"""
+        os.makedirs(self.warehouse_dir, exist_ok=True)
+        path = self._path(name)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        if PARQUET_AVAILABLE:
+            df.to_parquet(tmp_path)
+        else:
+            df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+
+    def _meta_path(self) -> str:
+        return os.path.join(self.warehouse_dir, "meta.json")
+
+    def get_meta(self) -> Dict[str, Any]:
+        try:
+            with open(self._meta_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    # ---------- 批量导入 ----------
+
+    def _fetch_statement(self, api, statement: str, period: str) -> pd.DataFrame:
+        method, fields = STATEMENT_APIS[statement]
+        df = getattr(api, method)(
+            period=period,
+            fields=",".join(KEY_COLUMNS + ["ann_date", "report_type", "update_flag"] + fields),
+        )
+        if df is None or df.empty:
+            return pd.DataFrame(columns=KEY_COLUMNS + fields)
+        return _latest_statement_rows(df)[KEY_COLUMNS + fields]
+
+    def _fetch_valuation(self, api, trade_date: str = None) -> pd.DataFrame:
+        """全市场估值快照（daily_basic），未指定日期时向前查找最近的交易日"""
+        day = datetime.strptime(trade_date, "%Y%m%d") if trade_date else datetime.now()
+        for _ in range(15):
+            df = api.daily_basic(trade_date=day.strftime("%Y%m%d"),
+                                 fields=",".join(["ts_code", "trade_date"] + VALUATION_FIELDS))
+            if df is not None and not df.empty:
+                return df
+            if trade_date:
+                break
+            day -= timedelta(days=1)
+        return pd.DataFrame()
+
+    def ingest(self, periods: List[str] = None, trade_date: str = None) -> Dict[str, Any]:
+        """
+        拉取全市场财报和估值快照，合并进仓库并重算指标
+
+        Args:
+            periods: 报告期列表（YYYYMMDD），默认最近 8 期
+            trade_date: 估值快照日期（YYYYMMDD），默认最近交易日
+
+        Returns:
+            导入摘要
+        """
+        from .tushare_utils import get_tushare_provider
+
+        provider = get_tushare_provider()
+        if not provider.connected:
+            raise RuntimeError("Tushare未连接，无法导入基本面数据（请设置TUSHARE_TOKEN）")
+        api = provider.api
+        periods = periods or recent_report_periods(8)
+
+        start = time.time()
+        frames = []
+        for period in periods:
+            merged = None
+            for statement in STATEMENT_APIS:
+                try:
+                    df = self._fetch_statement(api, statement, period)
+                except Exception as e:
+                    logger.error(f"❌ [基本面仓库] 获取{statement} {period}失败: {e}")
+                    df = pd.DataFrame(columns=KEY_COLUMNS + STATEMENT_APIS[statement][1])
+                merged = df if merged is None else merged.merge(df, on=KEY_COLUMNS, how="outer")
+            if not merged.empty:
+                frames.append(merged)
+            logger.info(f"📥 [基本面仓库] 报告期 {period}: {len(merged)} 只股票")
+
+        statements = self._read("statements")
+        if frames:
+            statements = pd.concat([statements] + frames, ignore_index=True)
+            statements = statements.drop_duplicates(KEY_COLUMNS, keep="last").reset_index(drop=True)
+        if statements.empty:
+            raise RuntimeError("未获取到任何财报数据（*_vip 接口需要相应的Tushare积分）")
+
+        valuation = self._fetch_valuation(api, trade_date)
+        stock_basic = provider.get_stock_list()
+        if not isinstance(stock_basic, pd.DataFrame):
+            stock_basic = pd.DataFrame()
+
+        metrics = compute_metrics(statements, valuation, stock_basic)
+
+        self._write("statements", statements)
+        self._write("metrics", metrics)
+        meta = {
+            "ingested_at": datetime.now().isoformat(),
+            "periods": sorted(set(statements["end_date"].astype(str))),
+            "valuation_date": str(valuation["trade_date"].iloc[0]) if not valuation.empty else None,
+            "statement_rows": int(len(statements)),
+            "symbols": int(len(metrics)),
+            "duration_seconds": round(time.time() - start, 1),
+        }
+        with open(self._meta_path(), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        with self._lock:
+            self._metrics = None
+        logger.info(f"✅ [基本面仓库] 导入完成: {meta['symbols']}只股票, {meta['statement_rows']}条财报, 用时{meta['duration_seconds']}秒")
+        return meta
+
+    # ---------- 查询 ----------
+
+    def _load_metrics(self) -> Optional[pd.DataFrame]:
+        path = self._path("metrics")
+        if not os.path.exists(path):
+            return None
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            if self._metrics is None or self._metrics_mtime != mtime:
+                self._metrics = self._read("metrics")
+                self._metrics_mtime = mtime
+            return self._metrics
+
+    def get_metrics(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        查询某只股票的最新指标（本地查找）
+
+        Args:
+            symbol: 股票代码（000001 或 000001.SZ）
+
+        Returns:
+            指标字典（缺失值为 None），仓库中没有该股票时返回 None
+        """
+        try:
+            metrics = self._load_metrics()
+        except Exception as e:
+            logger.warning(f"⚠️ [基本面仓库] 读取指标失败: {e}")
+            return None
+        if metrics is None or metrics.empty:
+            return None
+
+        code = str(symbol).upper()
+        if "." not in code:
+            candidates = [f"{code}.{suffix}" for suffix in ("SH", "SZ", "BJ")]
+        else:
+            candidates = [code]
+        for ts_code in candidates:
+            if ts_code in metrics.index:
+                result = {
+                    key: None if pd.isna(value) else (value.item() if isinstance(value, np.generic) else value)
+                    for key, value in metrics.loc[ts_code].items()
+                }
+                result["ts_code"] = ts_code
+                return result
+        return None
+
+
+# 全局仓库实例
+_fundamentals_warehouse = None
+_fundamentals_warehouse_lock = threading.Lock()
+
+def get_fundamentals_warehouse() -> FundamentalsWarehouse:
+    """获取全局基本面仓库，目录可通过 FUNDAMENTALS_WAREHOUSE_DIR 指定"""
+    global _fundamentals_warehouse
+    with _fundamentals_warehouse_lock:
+        if _fundamentals_warehouse is None:
+            default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_cache", "fundamentals_warehouse")
+            _fundamentals_warehouse = FundamentalsWarehouse(os.getenv("FUNDAMENTALS_WAREHOUSE_DIR") or default_dir)
+        return _fundamentals_warehouse
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量导入A股基本面数据到本地仓库")
+    parser.add_argument("--periods", type=int, default=8, help="导入最近几个报告期")
+    parser.add_argument("--trade-date", default=None, help="估值快照日期（YYYYMMDD），默认最近交易日")
+    parser.add_argument("--loop-hours", type=float, default=0, help="大于0时按该间隔循环导入")
+    cli_args = parser.parse_args()
+
+    while True:
+        try:
+            get_fundamentals_warehouse().ingest(recent_report_periods(cli_args.periods), cli_args.trade_date)
+        except Exception as e:
+            logger.error(f"❌ [基本面仓库] 导入失败: {e}")
+        if cli_args.loop_hours <= 0:
+            break
+        time.sleep(cli_args.loop_hours * 3600)
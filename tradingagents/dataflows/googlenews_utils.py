@@ -1,7 +1,14 @@
 import json
+import os
+import re
+import hashlib
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 import time
 import random
 from tenacity import (
@@ -17,6 +24,33 @@ from tradingagents.utils.logging_manager import get_logger
 logger = get_logger('agents')
 
 
+RESULTS_PER_PAGE = 10
+
+# 抓取预算和缓存配置
+GOOGLE_NEWS_MAX_PAGES = int(os.getenv("GOOGLE_NEWS_MAX_PAGES", "5"))
+GOOGLE_NEWS_MAX_RESULTS = int(os.getenv("GOOGLE_NEWS_MAX_RESULTS", "50"))
+GOOGLE_NEWS_CACHE_TTL_HOURS = float(os.getenv("GOOGLE_NEWS_CACHE_TTL_HOURS", "6"))
+GOOGLE_NEWS_CACHE_MAX_FILES = int(os.getenv("GOOGLE_NEWS_CACHE_MAX_FILES", "500"))
+GOOGLE_NEWS_CONCURRENCY = int(os.getenv("GOOGLE_NEWS_CONCURRENCY", "3"))
+GOOGLE_NEWS_CACHE_DIR = Path(__file__).parent / "data_cache" / "google_news"
+
+# 共享的连接池会话
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """获取共享的 requests 会话（连接池复用）"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(GOOGLE_NEWS_CONCURRENCY, 4))
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
 def is_rate_limited(response):
     """Check if the response indicates rate limiting (status code 429)"""
     return response.status_code == 429
@@ -31,16 +65,158 @@ def make_request(url, headers):
     """Make a request with retry logic for rate limiting"""
     # Random delay before each request to avoid detection
     time.sleep(random.uniform(2, 6))
-    response = requests.get(url, headers=headers)
+    response = get_session().get(url, headers=headers, timeout=30)
     return response
 
 
-def getNewsData(query, start_date, end_date):
+def _cache_path(query, start_date, end_date):
+    key = hashlib.md5(f"{query}|{start_date}|{end_date}".encode("utf-8")).hexdigest()
+    return GOOGLE_NEWS_CACHE_DIR / f"{key}.json"
+
+
+def _load_cached_news(query, start_date, end_date, max_results):
+    """读取未过期且满足数量要求的缓存结果"""
+    cache_file = _cache_path(query, start_date, end_date)
+    if not cache_file.exists():
+        return None
+
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except Exception as e:
+        logger.warning(f"⚠️ Google新闻缓存读取失败: {e}")
+        return None
+
+    age_hours = (time.time() - cached.get("cached_at", 0)) / 3600
+    if age_hours > GOOGLE_NEWS_CACHE_TTL_HOURS:
+        try:
+            cache_file.unlink()
+        except OSError:
+            pass
+        return None
+
+    results = cached.get("results", [])
+    # 缓存已包含全部结果，或数量足以满足本次预算
+    if not cached.get("complete") and len(results) < max_results:
+        return None
+
+    logger.info(f"⚡ 使用Google新闻缓存: {query} ({start_date} ~ {end_date}), {len(results)}条")
+    return results[:max_results]
+
+
+def _save_cached_news(query, start_date, end_date, results, complete):
+    try:
+        GOOGLE_NEWS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        cache_file = _cache_path(query, start_date, end_date)
+        tmp_file = cache_file.with_suffix(f".tmp-{os.getpid()}-{threading.get_ident()}")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "query": query,
+                    "start_date": start_date,
+                    "end_date": end_date,
+                    "cached_at": time.time(),
+                    "complete": complete,
+                    "results": results,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        logger.warning(f"⚠️ Google新闻缓存写入失败: {e}")
+        return
+    _prune_cached_news()
+
+
+def _prune_cached_news():
+    """删除超过TTL的缓存文件，并只保留最近 GOOGLE_NEWS_CACHE_MAX_FILES 个"""
+    def mtime(path):
+        try:
+            return path.stat().st_mtime
+        except OSError:
+            return 0.0
+
+    try:
+        files = sorted(GOOGLE_NEWS_CACHE_DIR.glob("*.json"), key=mtime, reverse=True)
+    except OSError:
+        return
+
+    cutoff = time.time() - GOOGLE_NEWS_CACHE_TTL_HOURS * 3600
+    expired = [path for index, path in enumerate(files)
+               if (GOOGLE_NEWS_CACHE_MAX_FILES and index >= GOOGLE_NEWS_CACHE_MAX_FILES) or mtime(path) < cutoff]
+    for path in expired:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+    if expired:
+        logger.debug(f"🧹 清理了 {len(expired)} 个过期的Google新闻缓存文件")
+
+
+def _build_url(query, start_date, end_date, page):
+    offset = page * RESULTS_PER_PAGE
+    return (
+        f"https://www.google.com/search?q={query}"
+        f"&tbs=cdr:1,cd_min:{start_date},cd_max:{end_date}"
+        f"&tbm=nws&start={offset}"
+    )
+
+
+def _parse_results(soup):
+    """解析单页搜索结果"""
+    page_results = []
+    for el in soup.select("div.SoaBEf"):
+        try:
+            link = el.find("a")["href"]
+            title = el.select_one("div.MBeuO").get_text()
+            snippet = el.select_one(".GI74Re").get_text()
+            date = el.select_one(".LfVVr").get_text()
+            source = el.select_one(".NUnG9d span").get_text()
+            page_results.append(
+                {
+                    "link": link,
+                    "title": title,
+                    "snippet": snippet,
+                    "date": date,
+                    "source": source,
+                }
+            )
+        except Exception as e:
+            logger.error(f"Error processing result: {e}")
+            # If one of the fields is not found, skip this result
+            continue
+    return page_results
+
+
+def _last_listed_page(soup):
+    """从分页导航中解析可见的最后一页页码（从0开始），无法解析时返回 None"""
+    offsets = []
+    for a in soup.select("a[href*='start=']"):
+        match = re.search(r"[?&]start=(\d+)", a.get("href", ""))
+        if match:
+            offsets.append(int(match.group(1)))
+    if not offsets:
+        return None
+    return max(offsets) // RESULTS_PER_PAGE
+
+
+def _fetch_page(query, start_date, end_date, page, headers):
+    """抓取单页，返回 (结果列表, soup)"""
+    response = make_request(_build_url(query, start_date, end_date, page), headers)
+    soup = BeautifulSoup(response.content, "html.parser")
+    return _parse_results(soup), soup
+
+
+def getNewsData(query, start_date, end_date, max_pages=None, max_results=None, use_cache=True):
     """
     Scrape Google News search results for a given query and date range.
     query: str - search query
     start_date: str - start date in the format yyyy-mm-dd or mm/dd/yyyy
     end_date: str - end date in the format yyyy-mm-dd or mm/dd/yyyy
+    max_pages: int - maximum number of result pages to scrape (default GOOGLE_NEWS_MAX_PAGES)
+    max_results: int - maximum number of results to return (default GOOGLE_NEWS_MAX_RESULTS)
+    use_cache: bool - whether to read/write the persistent TTL cache
     """
     if "-" in start_date:
         start_date = datetime.strptime(start_date, "%Y-%m-%d")
@@ -49,6 +225,14 @@ def getNewsData(query, start_date, end_date):
         end_date = datetime.strptime(end_date, "%Y-%m-%d")
         end_date = end_date.strftime("%m/%d/%Y")
 
+    max_pages = max_pages or GOOGLE_NEWS_MAX_PAGES
+    max_results = max_results or GOOGLE_NEWS_MAX_RESULTS
+
+    if use_cache:
+        cached = _load_cached_news(query, start_date, end_date, max_results)
+        if cached is not None:
+            return cached
+
     headers = {
         "User-Agent": (
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -58,55 +242,57 @@ def getNewsData(query, start_date, end_date):
     }
 
     news_results = []
-    page = 0
-    while True:
-        offset = page * 10
-        url = (
-            f"https://www.google.com/search?q={query}"
-            f"&tbs=cdr:1,cd_min:{start_date},cd_max:{end_date}"
-            f"&tbm=nws&start={offset}"
-        )
+    complete = False
+    try:
+        # 第一页：同时确定分页范围
+        page_results, soup = _fetch_page(query, start_date, end_date, 0, headers)
+        news_results.extend(page_results)
 
-        try:
-            response = make_request(url, headers)
-            soup = BeautifulSoup(response.content, "html.parser")
-            results_on_page = soup.select("div.SoaBEf")
-
-            if not results_on_page:
-                break  # No more results found
-
-            for el in results_on_page:
-                try:
-                    link = el.find("a")["href"]
-                    title = el.select_one("div.MBeuO").get_text()
-                    snippet = el.select_one(".GI74Re").get_text()
-                    date = el.select_one(".LfVVr").get_text()
-                    source = el.select_one(".NUnG9d span").get_text()
-                    news_results.append(
-                        {
-                            "link": link,
-                            "title": title,
-                            "snippet": snippet,
-                            "date": date,
-                            "source": source,
-                        }
-                    )
-                except Exception as e:
-                    logger.error(f"Error processing result: {e}")
-                    # If one of the fields is not found, skip this result
-                    continue
-
-            # Update the progress bar with the current count of results scraped
-
-            # Check for the "Next" link (pagination)
-            next_link = soup.find("a", id="pnnext")
-            if not next_link:
-                break
-
-            page += 1
+        if not page_results or not soup.find("a", id="pnnext"):
+            complete = True
+        else:
+            last_page = _last_listed_page(soup)
+            if last_page is not None:
+                # 已知页数：在预算内并发抓取剩余页
+                pages = list(range(1, min(last_page + 1, max_pages)))
+                with ThreadPoolExecutor(max_workers=GOOGLE_NEWS_CONCURRENCY) as executor:
+                    futures = [
+                        executor.submit(_fetch_page, query, start_date, end_date, page, headers)
+                        for page in pages
+                    ]
+                    failed = False
+                    for future in futures:
+                        try:
+                            page_results, soup = future.result()
+                            news_results.extend(page_results)
+                        except Exception as e:
+                            failed = True
+                            logger.error(f"Failed after multiple retries: {e}")
+                # 抓取到最后一页且其后没有"下一页"时才视为完整结果
+                complete = (
+                    not failed
+                    and last_page + 1 <= max_pages
+                    and not soup.find("a", id="pnnext")
+                )
+            else:
+                # 无法解析页数时逐页抓取，直到无结果或达到预算
+                page = 1
+                while page < max_pages and len(news_results) < max_results:
+                    page_results, soup = _fetch_page(query, start_date, end_date, page, headers)
+                    news_results.extend(page_results)
+                    if not page_results or not soup.find("a", id="pnnext"):
+                        complete = True
+                        break
+                    page += 1
 
-        except Exception as e:
-            logger.error(f"Failed after multiple retries: {e}")
-            break
+    except Exception as e:
+        logger.error(f"Failed after multiple retries: {e}")
+
+    if len(news_results) > max_results:
+        news_results = news_results[:max_results]
+        complete = False
+
+    if use_cache and news_results:
+        _save_cached_news(query, start_date, end_date, news_results, complete)
 
     return news_results
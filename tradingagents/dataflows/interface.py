@@ -62,6 +62,8 @@ except ImportError as e:
     yf = None
     YF_AVAILABLE = False
 from .config import get_config, set_config, DATA_DIR
+from .data_context import memoize_in_context
+from .simfin_store import get_simfin_store
 
 
 def get_finnhub_news(
@@ -196,6 +198,19 @@ def get_finnhub_company_insider_transactions(
     )
 
 
+SIMFIN_BALANCE_SHEET_NOTE = "\n\nThis includes metadata like reporting dates and currency, share details, and a breakdown of assets, liabilities, and equity. Assets are grouped as current (liquid items like cash and receivables) and noncurrent (long-term investments and property). Liabilities are split between short-term obligations and long-term debts, while equity reflects shareholder funds such as paid-in capital and retained earnings. Together, these components ensure that total assets equal the sum of liabilities and equity."
+SIMFIN_CASHFLOW_NOTE = "\n\nThis includes metadata like reporting dates and currency, share details, and a breakdown of cash movements. Operating activities show cash generated from core business operations, including net income adjustments for non-cash items and working capital changes. Investing activities cover asset acquisitions/disposals and investments. Financing activities include debt transactions, equity issuances/repurchases, and dividend payments. The net change in cash represents the overall increase or decrease in the company's cash position during the reporting period."
+SIMFIN_INCOME_STATEMENT_NOTE = "\n\nThis includes metadata like reporting dates and currency, share details, and a comprehensive breakdown of the company's financial performance. Starting with Revenue, it shows Cost of Revenue and resulting Gross Profit. Operating Expenses are detailed, including SG&A, R&D, and Depreciation. The statement then shows Operating Income, followed by non-operating items and Interest Expense, leading to Pretax Income. After accounting for Income Tax and any Extraordinary items, it concludes with Net Income, representing the company's bottom-line profit or loss for the period."
+
+
+def _format_simfin_statement(statement_name, freq, ticker, latest_statement, note):
+    return (
+        f"## {freq} {statement_name} for {ticker} released on {str(latest_statement['Publish Date'])[0:10]}: \n"
+        + str(latest_statement)
+        + note
+    )
+
+
 def get_simfin_balance_sheet(
     ticker: Annotated[str, "ticker symbol"],
     freq: Annotated[
@@ -204,42 +219,18 @@ def get_simfin_balance_sheet(
     ],
     curr_date: Annotated[str, "current date you are trading at, yyyy-mm-dd"],
 ):
-    data_path = os.path.join(
-        DATA_DIR,
-        "fundamental_data",
-        "simfin_data_all",
-        "balance_sheet",
-        "companies",
-        "us",
-        f"us-balance-{freq}.csv",
+    # 通过列式存储二分查找发布日期不晚于当前日期的最新一期资产负债表
+    latest_balance_sheet = get_simfin_store(DATA_DIR).get_latest_statement(
+        "balance_sheet", ticker, freq, curr_date
     )
-    df = pd.read_csv(data_path, sep=";")
-
-    # Convert date strings to datetime objects and remove any time components
-    df["Report Date"] = pd.to_datetime(df["Report Date"], utc=True).dt.normalize()
-    df["Publish Date"] = pd.to_datetime(df["Publish Date"], utc=True).dt.normalize()
-
-    # Convert the current date to datetime and normalize
-    curr_date_dt = pd.to_datetime(curr_date, utc=True).normalize()
-
-    # Filter the DataFrame for the given ticker and for reports that were published on or before the current date
-    filtered_df = df[(df["Ticker"] == ticker) & (df["Publish Date"] <= curr_date_dt)]
 
     # Check if there are any available reports; if not, return a notification
-    if filtered_df.empty:
+    if latest_balance_sheet is None:
         logger.info(f"No balance sheet available before the given current date.")
         return ""
 
-    # Get the most recent balance sheet by selecting the row with the latest Publish Date
-    latest_balance_sheet = filtered_df.loc[filtered_df["Publish Date"].idxmax()]
-
-    # drop the SimFinID column
-    latest_balance_sheet = latest_balance_sheet.drop("SimFinId")
-
-    return (
-        f"## {freq} balance sheet for {ticker} released on {str(latest_balance_sheet['Publish Date'])[0:10]}: \n"
-        + str(latest_balance_sheet)
-        + "\n\nThis includes metadata like reporting dates and currency, share details, and a breakdown of assets, liabilities, and equity. Assets are grouped as current (liquid items like cash and receivables) and noncurrent (long-term investments and property). Liabilities are split between short-term obligations and long-term debts, while equity reflects shareholder funds such as paid-in capital and retained earnings. Together, these components ensure that total assets equal the sum of liabilities and equity."
+    return _format_simfin_statement(
+        "balance sheet", freq, ticker, latest_balance_sheet, SIMFIN_BALANCE_SHEET_NOTE
     )
 
 
@@ -251,42 +242,18 @@ def get_simfin_cashflow(
     ],
     curr_date: Annotated[str, "current date you are trading at, yyyy-mm-dd"],
 ):
-    data_path = os.path.join(
-        DATA_DIR,
-        "fundamental_data",
-        "simfin_data_all",
-        "cash_flow",
-        "companies",
-        "us",
-        f"us-cashflow-{freq}.csv",
+    # 通过列式存储二分查找发布日期不晚于当前日期的最新一期现金流量表
+    latest_cash_flow = get_simfin_store(DATA_DIR).get_latest_statement(
+        "cashflow", ticker, freq, curr_date
     )
-    df = pd.read_csv(data_path, sep=";")
-
-    # Convert date strings to datetime objects and remove any time components
-    df["Report Date"] = pd.to_datetime(df["Report Date"], utc=True).dt.normalize()
-    df["Publish Date"] = pd.to_datetime(df["Publish Date"], utc=True).dt.normalize()
-
-    # Convert the current date to datetime and normalize
-    curr_date_dt = pd.to_datetime(curr_date, utc=True).normalize()
-
-    # Filter the DataFrame for the given ticker and for reports that were published on or before the current date
-    filtered_df = df[(df["Ticker"] == ticker) & (df["Publish Date"] <= curr_date_dt)]
 
     # Check if there are any available reports; if not, return a notification
-    if filtered_df.empty:
+    if latest_cash_flow is None:
         logger.info(f"No cash flow statement available before the given current date.")
         return ""
 
-    # Get the most recent cash flow statement by selecting the row with the latest Publish Date
-    latest_cash_flow = filtered_df.loc[filtered_df["Publish Date"].idxmax()]
-
-    # drop the SimFinID column
-    latest_cash_flow = latest_cash_flow.drop("SimFinId")
-
-    return (
-        f"## {freq} cash flow statement for {ticker} released on {str(latest_cash_flow['Publish Date'])[0:10]}: \n"
-        + str(latest_cash_flow)
-        + "\n\nThis includes metadata like reporting dates and currency, share details, and a breakdown of cash movements. Operating activities show cash generated from core business operations, including net income adjustments for non-cash items and working capital changes. Investing activities cover asset acquisitions/disposals and investments. Financing activities include debt transactions, equity issuances/repurchases, and dividend payments. The net change in cash represents the overall increase or decrease in the company's cash position during the reporting period."
+    return _format_simfin_statement(
+        "cash flow statement", freq, ticker, latest_cash_flow, SIMFIN_CASHFLOW_NOTE
     )
 
 
@@ -298,43 +265,47 @@ def get_simfin_income_statements(
     ],
     curr_date: Annotated[str, "current date you are trading at, yyyy-mm-dd"],
 ):
-    data_path = os.path.join(
-        DATA_DIR,
-        "fundamental_data",
-        "simfin_data_all",
-        "income_statements",
-        "companies",
-        "us",
-        f"us-income-{freq}.csv",
+    # 通过列式存储二分查找发布日期不晚于当前日期的最新一期利润表
+    latest_income = get_simfin_store(DATA_DIR).get_latest_statement(
+        "income_statement", ticker, freq, curr_date
     )
-    df = pd.read_csv(data_path, sep=";")
-
-    # Convert date strings to datetime objects and remove any time components
-    df["Report Date"] = pd.to_datetime(df["Report Date"], utc=True).dt.normalize()
-    df["Publish Date"] = pd.to_datetime(df["Publish Date"], utc=True).dt.normalize()
-
-    # Convert the current date to datetime and normalize
-    curr_date_dt = pd.to_datetime(curr_date, utc=True).normalize()
-
-    # Filter the DataFrame for the given ticker and for reports that were published on or before the current date
-    filtered_df = df[(df["Ticker"] == ticker) & (df["Publish Date"] <= curr_date_dt)]
 
     # Check if there are any available reports; if not, return a notification
-    if filtered_df.empty:
+    if latest_income is None:
         logger.info(f"No income statement available before the given current date.")
         return ""
 
-    # Get the most recent income statement by selecting the row with the latest Publish Date
-    latest_income = filtered_df.loc[filtered_df["Publish Date"].idxmax()]
+    return _format_simfin_statement(
+        "income statement", freq, ticker, latest_income, SIMFIN_INCOME_STATEMENT_NOTE
+    )
 
-    # drop the SimFinID column
-    latest_income = latest_income.drop("SimFinId")
 
-    return (
-        f"## {freq} income statement for {ticker} released on {str(latest_income['Publish Date'])[0:10]}: \n"
-        + str(latest_income)
-        + "\n\nThis includes metadata like reporting dates and currency, share details, and a comprehensive breakdown of the company's financial performance. Starting with Revenue, it shows Cost of Revenue and resulting Gross Profit. Operating Expenses are detailed, including SG&A, R&D, and Depreciation. The statement then shows Operating Income, followed by non-operating items and Interest Expense, leading to Pretax Income. After accounting for Income Tax and any Extraordinary items, it concludes with Net Income, representing the company's bottom-line profit or loss for the period."
-    )
+def get_simfin_financial_statements(
+    ticker: Annotated[str, "ticker symbol"],
+    freq: Annotated[
+        str,
+        "reporting frequency of the company's financial history: annual / quarterly",
+    ],
+    curr_date: Annotated[str, "current date you are trading at, yyyy-mm-dd"],
+):
+    """一次性获取最新的资产负债表、现金流量表和利润表"""
+    statements = get_simfin_store(DATA_DIR).get_latest_statements(ticker, freq, curr_date)
+
+    sections = []
+    for key, statement_name, note in (
+        ("balance_sheet", "balance sheet", SIMFIN_BALANCE_SHEET_NOTE),
+        ("cashflow", "cash flow statement", SIMFIN_CASHFLOW_NOTE),
+        ("income_statement", "income statement", SIMFIN_INCOME_STATEMENT_NOTE),
+    ):
+        latest_statement = statements.get(key)
+        if latest_statement is None:
+            logger.info(f"No {statement_name} available before the given current date.")
+            continue
+        sections.append(
+            _format_simfin_statement(statement_name, freq, ticker, latest_statement, note)
+        )
+
+    return "\n\n".join(sections)
 
 
 def get_google_news(
@@ -680,6 +651,7 @@ def get_YFin_data_window(
     )
 
 
+@memoize_in_context
 def get_YFin_data_online(
     symbol: Annotated[str, "ticker symbol of the company"],
     start_date: Annotated[str, "Start date in yyyy-mm-dd format"],
@@ -989,6 +961,7 @@ def get_fundamentals_finnhub(ticker, curr_date):
         return f"Finnhub基本面数据获取失败: {str(e)}"
 
 
+@memoize_in_context
 def get_fundamentals_openai(ticker, curr_date):
     """
     获取股票基本面数据，优先使用OpenAI，失败时回退到Finnhub API
@@ -1286,6 +1259,7 @@ def get_china_stock_info_tushare(
 
 # ==================== 统一数据源接口 ====================
 
+@memoize_in_context(date_range=("start_date", "end_date"))
 def get_china_stock_data_unified(
     ticker: Annotated[str, "中国股票代码，如：000001、600036等"],
     start_date: Annotated[str, "开始日期，格式：YYYY-MM-DD"],
@@ -1372,6 +1346,7 @@ def get_china_stock_data_unified(
         return f"❌ 获取{ticker}股票数据失败: {e}"
 
 
+@memoize_in_context
 def get_china_stock_info_unified(
     ticker: Annotated[str, "中国股票代码，如：000001、600036等"]
 ) -> str:
@@ -1476,6 +1451,7 @@ def get_current_china_data_source() -> str:
 
 # ==================== 港股数据接口 ====================
 
+@memoize_in_context(date_range=("start_date", "end_date"))
 def get_hk_stock_data_unified(symbol: str, start_date: str = None, end_date: str = None) -> str:
     """
     获取港股数据的统一接口
@@ -1537,6 +1513,7 @@ def get_hk_stock_data_unified(symbol: str, start_date: str = None, end_date: str
         return f"❌ 获取港股{symbol}数据失败: {e}"
 
 
+@memoize_in_context
 def get_hk_stock_info_unified(symbol: str) -> Dict:
     """
     获取港股信息的统一接口
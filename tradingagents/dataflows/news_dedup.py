@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+新闻近似重复检测
+基于 SimHash 指纹 + 分段(LSH)索引，识别多个新闻源转载的同一篇报道
+"""
+
+import os
+import re
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar
+
+# 导入日志模块
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('agents')
+
+
+T = TypeVar('T')
+
+FINGERPRINT_BITS = 64
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+|[一-鿿]')
+
+
+def _tokenize(text: str) -> List[str]:
+    """英文按单词、中文按单字切分，忽略标点和空白"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def _shingles(tokens: List[str], size: int) -> List[str]:
+    """生成连续 token 的 shingle"""
+    if len(tokens) <= size:
+        return [' '.join(tokens)] if tokens else []
+    return [' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)]
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """计算文本的 64 位 SimHash 指纹"""
+    weights = [0] * FINGERPRINT_BITS
+    for shingle in _shingles(_tokenize(text), shingle_size):
+        h = _hash64(shingle)
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class SimHashDeduplicator:
+    """
+    SimHash 近似去重器
+
+    指纹按 (max_distance + 1) 段建立索引：根据抽屉原理，汉明距离不超过 max_distance 的两个指纹
+    至少有一段完全相同，因此只需比较同段候选，整体接近线性时间。
+    已见过的指纹保存在滚动窗口缓存中，跨请求共享。
+    """
+
+    def __init__(self, max_distance: int = 3, window_hours: float = 24,
+                 shingle_size: int = 3, max_entries: int = 20000):
+        """
+        初始化去重器
+
+        Args:
+            max_distance: 判定为重复的最大汉明距离（0-63，越大越宽松）
+            window_hours: 跨请求指纹缓存的保留时长（小时）
+            shingle_size: shingle 长度（token 数）
+            max_entries: 指纹缓存最大条数
+        """
+        if not 0 <= max_distance < FINGERPRINT_BITS:
+            raise ValueError(f"max_distance必须在0到{FINGERPRINT_BITS - 1}之间: {max_distance}")
+
+        self.max_distance = max_distance
+        self.window_seconds = window_hours * 3600
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+
+        bands = max_distance + 1
+        width = FINGERPRINT_BITS // bands
+        self._bands: List[Tuple[int, int]] = [
+            (i * width, FINGERPRINT_BITS - i * width if i == bands - 1 else width)
+            for i in range(bands)
+        ]
+
+        self._entries: Dict[int, Tuple[int, float]] = {}  # entry_id -> (fingerprint, seen_at)
+        self._buckets: Dict[Tuple[int, int], Set[int]] = {}  # (band, band_value) -> entry_ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _band_keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        return [
+            (i, (fingerprint >> offset) & ((1 << width) - 1))
+            for i, (offset, width) in enumerate(self._bands)
+        ]
+
+    def _evict(self, now: float):
+        """清理过期或超出容量的指纹（entry_id 单调递增，即按时间顺序）"""
+        expired = [
+            entry_id for entry_id, (_, seen_at) in self._entries.items()
+            if now - seen_at > self.window_seconds
+        ]
+        overflow = len(self._entries) - len(expired) - self.max_entries
+        if overflow > 0:
+            expired_set = set(expired)
+            alive = [entry_id for entry_id in self._entries if entry_id not in expired_set]
+            expired.extend(alive[:overflow])
+
+        for entry_id in expired:
+            fingerprint, _ = self._entries.pop(entry_id)
+            for key in self._band_keys(fingerprint):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(entry_id)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def _find_match(self, fingerprint: int, within: Set[int] = None) -> Optional[int]:
+        """查找汉明距离在阈值内的已有指纹（可限定在 within 范围内），返回其 entry_id"""
+        for key in self._band_keys(fingerprint):
+            for entry_id in self._buckets.get(key, ()):
+                if within is not None and entry_id not in within:
+                    continue
+                if hamming_distance(fingerprint, self._entries[entry_id][0]) <= self.max_distance:
+                    return entry_id
+        return None
+
+    def _remember(self, fingerprint: int, now: float) -> int:
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (fingerprint, now)
+        for key in self._band_keys(fingerprint):
+            self._buckets.setdefault(key, set()).add(entry_id)
+        return entry_id
+
+    def fingerprint(self, text: str) -> int:
+        return simhash(text, self.shingle_size)
+
+    def deduplicate(self, items: Iterable[T], text_of: Callable[[T], str],
+                    exclude_seen: bool = False) -> List[T]:
+        """
+        对一批条目去重，保留每组近似重复中的第一条
+
+        Args:
+            items: 待去重条目（应已按优先级排序）
+            text_of: 提取用于指纹计算的文本
+            exclude_seen: 是否同时丢弃在窗口期内已被之前请求见过的报道
+
+        Returns:
+            去重后的条目列表
+        """
+        now = time.time()
+        unique = []
+        with self._lock:
+            self._evict(now)
+            # 本批次已保留报道对应的指纹
+            batch_ids: Set[int] = set()
+
+            for item in items:
+                fingerprint = self.fingerprint(text_of(item))
+
+                if self._find_match(fingerprint, within=batch_ids) is not None:
+                    continue
+
+                seen_match = self._find_match(fingerprint)
+                if seen_match is not None:
+                    # 刷新历史指纹的时间，使持续被转载的报道留在窗口中
+                    self._entries[seen_match] = (self._entries[seen_match][0], now)
+                    if exclude_seen:
+                        continue
+                    batch_ids.add(seen_match)
+                else:
+                    batch_ids.add(self._remember(fingerprint, now))
+                unique.append(item)
+
+        return unique
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+
+# 全局去重器实例
+_news_deduplicator = None
+
+def get_news_deduplicator() -> SimHashDeduplicator:
+    """获取全局新闻去重器实例，阈值和窗口可通过环境变量调整"""
+    global _news_deduplicator
+    if _news_deduplicator is None:
+        _news_deduplicator = SimHashDeduplicator(
+            max_distance=int(os.getenv('NEWS_DEDUP_MAX_DISTANCE', '3')),
+            window_hours=float(os.getenv('NEWS_DEDUP_WINDOW_HOURS', '24')),
+        )
+    return _news_deduplicator
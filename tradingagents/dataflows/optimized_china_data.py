@@ -429,6 +429,15 @@ class OptimizedChinaDataProvider:
             }
         }
 
+        # 基本面仓库中有真实行业分类时优先使用
+        try:
+            from .fundamentals_warehouse import get_fundamentals_warehouse
+            metrics = get_fundamentals_warehouse().get_metrics(symbol)
+            if metrics and metrics.get("industry"):
+                info = dict(info, industry=metrics["industry"])
+        except Exception as e:
+            logger.debug(f"基本面仓库行业查询失败: {e}")
+
         if symbol in special_stocks:
             info.update(special_stocks[symbol])
         else:
@@ -442,7 +451,16 @@ class OptimizedChinaDataProvider:
         return info
 
     def _estimate_financial_metrics(self, symbol: str, current_price: str) -> dict:
-        """估算财务指标（基于行业平均值和股票特征）"""
+        """财务指标：优先使用基本面仓库中的真实数据，仓库中没有该股票时按行业平均值估算"""
+
+        try:
+            from .fundamentals_warehouse import get_fundamentals_warehouse
+            metrics = get_fundamentals_warehouse().get_metrics(symbol)
+            if metrics:
+                logger.debug(f"📊 [基本面仓库] 使用仓库指标: {symbol} (报告期 {metrics.get('end_date')})")
+                return self._format_warehouse_metrics(metrics)
+        except Exception as e:
+            logger.warning(f"⚠️ [基本面仓库] 查询失败，使用估算值: {e}")
 
         # 提取价格数值
         try:
@@ -509,6 +527,65 @@ class OptimizedChinaDataProvider:
                 "risk_level": "中等"
             }
 
+    def _format_warehouse_metrics(self, metrics: dict) -> dict:
+        """将仓库指标格式化为报告使用的字段，评分由行业分位数换算"""
+
+        def ratio(key, unit="倍"):
+            value = metrics.get(key)
+            if value is None:
+                return "N/A"
+            text = f"{value:.2f}{unit}"
+            pct = metrics.get(f"{key}_pct")
+            return f"{text}（行业分位 {pct:.0%}）" if pct is not None else text
+
+        def percent(key):
+            value = metrics.get(key)
+            if value is None:
+                return "N/A"
+            text = f"{value * 100:.1f}%"
+            pct = metrics.get(f"{key}_pct")
+            return f"{text}（行业分位 {pct:.0%}）" if pct is not None else text
+
+        def score(*percentiles):
+            # 分位数 0~1 映射到 3~9 分，缺失时取中性分
+            values = [p for p in percentiles if p is not None]
+            return round(3 + 6 * (sum(values) / len(values)), 1) if values else 6.0
+
+        def inverse(key):
+            pct = metrics.get(f"{key}_pct")
+            return None if pct is None else 1 - pct
+
+        debt_pct = metrics.get("debt_ratio_pct")
+        if debt_pct is None:
+            risk_level = "中等"
+        elif debt_pct >= 0.8:
+            risk_level = "较高"
+        elif debt_pct <= 0.3:
+            risk_level = "较低"
+        else:
+            risk_level = "中等"
+
+        dividend = metrics.get("dv_ttm")
+        return {
+            "pe": ratio("pe_ttm"),
+            "pb": ratio("pb"),
+            "ps": ratio("ps_ttm"),
+            # daily_basic 的股息率本身是百分数
+            "dividend_yield": f"{dividend:.2f}%" if dividend is not None else "N/A",
+            "roe": percent("roe"),
+            "roa": percent("roa"),
+            "gross_margin": percent("gross_margin"),
+            "net_margin": percent("net_margin"),
+            "debt_ratio": percent("debt_ratio"),
+            "current_ratio": ratio("current_ratio"),
+            "quick_ratio": ratio("quick_ratio", ""),
+            "cash_ratio": ratio("cash_ratio", ""),
+            "fundamental_score": score(metrics.get("roe_pct"), metrics.get("net_margin_pct"), inverse("debt_ratio")),
+            "valuation_score": score(inverse("pe_ttm"), inverse("pb")),
+            "growth_score": score(metrics.get("revenue_yoy_pct"), metrics.get("profit_yoy_pct")),
+            "risk_level": risk_level,
+        }
+
     def _analyze_valuation(self, financial_estimates: dict) -> str:
         """分析估值水平"""
         valuation_score = financial_estimates['valuation_score']
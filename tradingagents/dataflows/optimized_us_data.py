@@ -13,6 +13,7 @@ import yfinance as yf
 import pandas as pd
 from .cache_manager import get_cache
 from .config import get_config
+from .data_context import memoize_in_context
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
@@ -354,6 +355,7 @@ def get_optimized_us_data_provider() -> OptimizedUSDataProvider:
     return _us_data_provider
 
 
+@memoize_in_context
 def get_us_stock_data_cached(symbol: str, start_date: str, end_date: str, 
                            force_refresh: bool = False) -> str:
     """
@@ -10,8 +10,11 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from dataclasses import dataclass
 
+from .news_dedup import get_news_deduplicator
+
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
 logger = get_logger('agents')
@@ -33,7 +36,14 @@ class NewsItem:
 class RealtimeNewsAggregator:
     """实时新闻聚合器"""
     
-    def __init__(self):
+    def __init__(self, source_timeout: float = None, overall_timeout: float = None):
+        """
+        初始化新闻聚合器
+
+        Args:
+            source_timeout: 单个新闻源的请求超时（秒），默认读取 NEWS_SOURCE_TIMEOUT 或 5 秒
+            overall_timeout: 所有新闻源的总截止时间（秒），默认读取 NEWS_OVERALL_TIMEOUT 或 8 秒
+        """
         self.headers = {
             'User-Agent': 'TradingAgents-CN/1.0'
         }
@@ -42,33 +52,59 @@ class RealtimeNewsAggregator:
         self.finnhub_key = os.getenv('FINNHUB_API_KEY')
         self.alpha_vantage_key = os.getenv('ALPHA_VANTAGE_API_KEY')
         self.newsapi_key = os.getenv('NEWSAPI_KEY')
+
+        # 超时配置
+        self.source_timeout = source_timeout or float(os.getenv('NEWS_SOURCE_TIMEOUT', '5'))
+        self.overall_timeout = overall_timeout or float(os.getenv('NEWS_OVERALL_TIMEOUT', '8'))
         
-    def get_realtime_stock_news(self, ticker: str, hours_back: int = 6) -> List[NewsItem]:
+    def get_realtime_stock_news(self, ticker: str, hours_back: int = 6,
+                                only_new: bool = False) -> List[NewsItem]:
         """
         获取实时股票新闻
         优先级：专业API > 新闻API > 搜索引擎
+
+        各新闻源并发获取，每个新闻源受 source_timeout 约束；
+        超过 overall_timeout 仍未返回的新闻源将被放弃，只使用已到达的结果。
+        only_new 为 True 时，丢弃最近窗口期内已在之前请求中出现过的报道。
         """
-        all_news = []
-        
-        # 1. FinnHub实时新闻 (最高优先级)
-        finnhub_news = self._get_finnhub_realtime_news(ticker, hours_back)
-        all_news.extend(finnhub_news)
-        
-        # 2. Alpha Vantage新闻
-        av_news = self._get_alpha_vantage_news(ticker, hours_back)
-        all_news.extend(av_news)
-        
-        # 3. NewsAPI (如果配置了)
+        # 按优先级排列的新闻源
+        sources = [
+            ('FinnHub', self._get_finnhub_realtime_news),           # 1. FinnHub实时新闻 (最高优先级)
+            ('Alpha Vantage', self._get_alpha_vantage_news),        # 2. Alpha Vantage新闻
+        ]
         if self.newsapi_key:
-            newsapi_news = self._get_newsapi_news(ticker, hours_back)
-            all_news.extend(newsapi_news)
-        
-        # 4. 中文财经新闻源
-        chinese_news = self._get_chinese_finance_news(ticker, hours_back)
-        all_news.extend(chinese_news)
+            sources.append(('NewsAPI', self._get_newsapi_news))     # 3. NewsAPI (如果配置了)
+        sources.append(('中文财经', self._get_chinese_finance_news))  # 4. 中文财经新闻源
+
+        results: Dict[str, List[NewsItem]] = {}
+        executor = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix='news-source')
+        try:
+            futures = {
+                executor.submit(fetch, ticker, hours_back): name
+                for name, fetch in sources
+            }
+            try:
+                for future in as_completed(futures, timeout=self.overall_timeout):
+                    name = futures[future]
+                    try:
+                        results[name] = future.result()
+                        logger.debug(f"📰 {name}新闻到达: {len(results[name])}条")
+                    except Exception as e:
+                        logger.error(f"{name}新闻获取失败: {e}")
+            except FuturesTimeoutError:
+                pending = [name for future, name in futures.items() if not future.done()]
+                logger.warning(f"⏰ 新闻聚合超时({self.overall_timeout}s)，放弃未返回的新闻源: {pending}")
+        finally:
+            # 不等待慢速新闻源，直接返回已到达的结果
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        # 按优先级合并，保证去重时保留高优先级来源
+        all_news = []
+        for name, _ in sources:
+            all_news.extend(results.get(name, []))
         
         # 去重和排序
-        unique_news = self._deduplicate_news(all_news)
+        unique_news = self._deduplicate_news(all_news, exclude_seen=only_new)
         return sorted(unique_news, key=lambda x: x.publish_time, reverse=True)
     
     def _get_finnhub_realtime_news(self, ticker: str, hours_back: int) -> List[NewsItem]:
@@ -90,7 +126,7 @@ class RealtimeNewsAggregator:
                 'token': self.finnhub_key
             }
             
-            response = requests.get(url, params=params, headers=self.headers)
+            response = requests.get(url, params=params, headers=self.headers, timeout=self.source_timeout)
             response.raise_for_status()
             
             news_data = response.json()
@@ -135,7 +171,7 @@ class RealtimeNewsAggregator:
                 'limit': 50
             }
             
-            response = requests.get(url, params=params, headers=self.headers)
+            response = requests.get(url, params=params, headers=self.headers, timeout=self.source_timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -195,7 +231,7 @@ class RealtimeNewsAggregator:
                 'apiKey': self.newsapi_key
             }
             
-            response = requests.get(url, params=params, headers=self.headers)
+            response = requests.get(url, params=params, headers=self.headers, timeout=self.source_timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -309,18 +345,22 @@ class RealtimeNewsAggregator:
         
         return 0.3  # 默认相关性
     
-    def _deduplicate_news(self, news_items: List[NewsItem]) -> List[NewsItem]:
-        """去重新闻"""
-        seen_titles = set()
-        unique_news = []
-        
-        for item in news_items:
-            # 简单的标题去重
-            title_key = item.title.lower().strip()
-            if title_key not in seen_titles and len(title_key) > 10:
-                seen_titles.add(title_key)
-                unique_news.append(item)
-        
+    def _deduplicate_news(self, news_items: List[NewsItem], exclude_seen: bool = False) -> List[NewsItem]:
+        """
+        去重新闻
+        基于标题+正文的 SimHash 指纹识别多家新闻源转载的同一报道，保留优先级最高的一条
+        """
+        # 过滤过短的标题
+        candidates = [item for item in news_items if len(item.title.lower().strip()) > 10]
+
+        unique_news = get_news_deduplicator().deduplicate(
+            candidates,
+            text_of=lambda item: f"{item.title} {item.content or ''}",
+            exclude_seen=exclude_seen,
+        )
+
+        if len(unique_news) < len(candidates):
+            logger.debug(f"📰 新闻去重: {len(candidates)} -> {len(unique_news)}条")
         return unique_news
     
     def format_news_report(self, news_items: List[NewsItem], ticker: str) -> str:
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+SimFin 财报列式存储
+将全市场 SimFin CSV（;分隔）一次性转换为按 (Ticker, Publish Date) 排序的列式 .npy 文件，
+以内存映射方式加载，"截至某日最新财报" 的查询通过二分查找完成，避免每次调用都全量读取 CSV。
+"""
+
+import os
+import json
+import shutil
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 导入日志模块
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('agents')
+
+
+# 报表类型 -> (SimFin 子目录, 文件名前缀)
+SIMFIN_STATEMENTS = {
+    "balance_sheet": ("balance_sheet", "us-balance"),
+    "cashflow": ("cash_flow", "us-cashflow"),
+    "income_statement": ("income_statements", "us-income"),
+}
+
+# 需要按日期处理的列
+DATE_COLUMNS = ("Report Date", "Publish Date", "Restated Date")
+
+STORE_FORMAT_VERSION = 1
+_NAT = np.iinfo(np.int64).min
+
+
+class SimFinStatementTable:
+    """单张报表（某一频率）的内存映射列式表"""
+
+    def __init__(self, store_dir: str, meta: Dict[str, Any]):
+        self.store_dir = store_dir
+        self.meta = meta
+        self.columns = meta["columns"]
+        self.ticker_index = meta["ticker_index"]
+        self._arrays: Dict[str, np.ndarray] = {}
+        self.publish_dates = self._column("Publish Date")
+
+    def _column(self, name: str) -> np.ndarray:
+        """按需内存映射加载某一列"""
+        array = self._arrays.get(name)
+        if array is None:
+            file_name = self.meta["files"][name]
+            array = np.load(os.path.join(self.store_dir, file_name), mmap_mode="r")
+            self._arrays[name] = array
+        return array
+
+    def latest_row(self, ticker: str, curr_date: str) -> Optional[int]:
+        """
+        二分查找某股票在 curr_date 当天或之前发布的最新一行
+
+        Returns:
+            行号，不存在时返回 None
+        """
+        bounds = self.ticker_index.get(ticker)
+        if bounds is None:
+            return None
+
+        start, end = bounds
+        target = pd.to_datetime(curr_date, utc=True).normalize().value
+        dates = self.publish_dates[start:end]
+
+        pos = int(np.searchsorted(dates, target, side="right")) - 1
+        if pos < 0:
+            return None
+
+        # 同一发布日有多行时与 idxmax 保持一致，取第一行
+        pos = int(np.searchsorted(dates, dates[pos], side="left"))
+        return start + pos
+
+    def row_as_series(self, row: int) -> pd.Series:
+        """将一行还原为与原 DataFrame 行一致的 Series"""
+        values = {}
+        for name in self.columns:
+            kind = self.meta["kinds"][name]
+            raw = self._column(name)[row]
+            if kind == "date":
+                values[name] = pd.NaT if raw == _NAT else pd.Timestamp(int(raw), tz="UTC")
+            elif kind == "str":
+                values[name] = str(raw) if raw != "" else np.nan
+            else:
+                values[name] = raw.item()
+        return pd.Series(values, name=row)
+
+
+class SimFinStore:
+    """SimFin 财报列式存储管理器"""
+
+    def __init__(self, data_dir: str, store_dir: str = None):
+        """
+        初始化存储
+
+        Args:
+            data_dir: 数据目录（包含 fundamental_data/simfin_data_all）
+            store_dir: 列式存储目录，默认为 data_dir/fundamental_data/simfin_store
+        """
+        self.data_dir = data_dir
+        self.store_dir = store_dir or os.path.join(data_dir, "fundamental_data", "simfin_store")
+        self._tables: Dict[Tuple[str, str], SimFinStatementTable] = {}
+        self._lock = threading.Lock()
+
+    def _source_path(self, statement: str, freq: str) -> str:
+        folder, prefix = SIMFIN_STATEMENTS[statement]
+        return os.path.join(
+            self.data_dir,
+            "fundamental_data",
+            "simfin_data_all",
+            folder,
+            "companies",
+            "us",
+            f"{prefix}-{freq}.csv",
+        )
+
+    def _table_dir(self, statement: str, freq: str) -> str:
+        return os.path.join(self.store_dir, f"{statement}-{freq}")
+
+    def _load_meta(self, table_dir: str) -> Optional[Dict[str, Any]]:
+        meta_path = os.path.join(table_dir, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ SimFin存储元数据读取失败，将重建: {e}")
+            return None
+
+    def _is_fresh(self, meta: Optional[Dict[str, Any]], source_path: str) -> bool:
+        if not meta or meta.get("version") != STORE_FORMAT_VERSION:
+            return False
+        return meta.get("source_mtime") == os.path.getmtime(source_path)
+
+    def _build(self, statement: str, freq: str, source_path: str) -> Dict[str, Any]:
+        """将 CSV 转换为列式存储，先写临时目录再原子替换"""
+        logger.info(f"🔨 构建SimFin列式存储: {statement}-{freq}")
+        df = pd.read_csv(source_path, sep=";")
+
+        for name in DATE_COLUMNS:
+            if name in df.columns:
+                df[name] = pd.to_datetime(df[name], utc=True).dt.normalize()
+
+        # 发布日期缺失的行永远不会命中 "截至某日" 查询，直接丢弃以保证有序
+        df = df.dropna(subset=["Publish Date"])
+        df = df.sort_values(["Ticker", "Publish Date"], kind="mergesort").reset_index(drop=True)
+
+        table_dir = self._table_dir(statement, freq)
+        tmp_dir = f"{table_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        files, kinds = {}, {}
+        for i, name in enumerate(df.columns):
+            series = df[name]
+            if name in DATE_COLUMNS:
+                kinds[name] = "date"
+                array = series.dt.tz_convert(None).values.astype("datetime64[ns]").astype(np.int64)
+            elif pd.api.types.is_numeric_dtype(series):
+                kinds[name] = "num"
+                array = series.to_numpy()
+            else:
+                kinds[name] = "str"
+                array = series.fillna("").astype(str).to_numpy().astype(np.str_)
+            file_name = f"col_{i}.npy"
+            np.save(os.path.join(tmp_dir, file_name), array, allow_pickle=False)
+            files[name] = file_name
+
+        # Ticker -> [start, end) 行偏移
+        tickers = df["Ticker"].astype(str).to_numpy()
+        ticker_index = {}
+        if len(tickers):
+            change = np.flatnonzero(tickers[1:] != tickers[:-1]) + 1
+            starts = np.concatenate(([0], change))
+            ends = np.concatenate((change, [len(tickers)]))
+            ticker_index = {tickers[s]: [int(s), int(e)] for s, e in zip(starts, ends)}
+
+        meta = {
+            "version": STORE_FORMAT_VERSION,
+            "source_path": source_path,
+            "source_mtime": os.path.getmtime(source_path),
+            "rows": int(len(df)),
+            "columns": list(df.columns),
+            "files": files,
+            "kinds": kinds,
+            "ticker_index": ticker_index,
+        }
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        shutil.rmtree(table_dir, ignore_errors=True)
+        os.replace(tmp_dir, table_dir)
+        logger.info(f"✅ SimFin列式存储构建完成: {statement}-{freq}, {len(df)}行, {len(ticker_index)}只股票")
+        return meta
+
+    def get_table(self, statement: str, freq: str) -> SimFinStatementTable:
+        """获取（必要时构建）某张报表的列式表"""
+        if statement not in SIMFIN_STATEMENTS:
+            raise ValueError(f"不支持的SimFin报表类型: {statement}")
+
+        source_path = self._source_path(statement, freq)
+        if not os.path.exists(source_path):
+            raise FileNotFoundError(source_path)
+
+        key = (statement, freq)
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None and self._is_fresh(table.meta, source_path):
+                return table
+
+            table_dir = self._table_dir(statement, freq)
+            meta = self._load_meta(table_dir)
+            if not self._is_fresh(meta, source_path):
+                meta = self._build(statement, freq, source_path)
+
+            table = SimFinStatementTable(table_dir, meta)
+            self._tables[key] = table
+            return table
+
+    def get_latest_statement(self, statement: str, ticker: str, freq: str,
+                             curr_date: str) -> Optional[pd.Series]:
+        """
+        获取 curr_date 当天或之前发布的最新一期财报
+
+        Returns:
+            财报行（已去除 SimFinId），不存在时返回 None
+        """
+        table = self.get_table(statement, freq)
+        row = table.latest_row(ticker, curr_date)
+        if row is None:
+            return None
+
+        series = table.row_as_series(row)
+        if "SimFinId" in series.index:
+            series = series.drop("SimFinId")
+        return series
+
+    def get_latest_statements(self, ticker: str, freq: str,
+                              curr_date: str) -> Dict[str, Optional[pd.Series]]:
+        """一次获取资产负债表、现金流量表和利润表"""
+        results = {}
+        for statement in SIMFIN_STATEMENTS:
+            try:
+                results[statement] = self.get_latest_statement(statement, ticker, freq, curr_date)
+            except FileNotFoundError as e:
+                logger.warning(f"⚠️ SimFin数据文件不存在: {e}")
+                results[statement] = None
+        return results
+
+
+# 全局存储实例（按数据目录区分）
+_simfin_stores: Dict[str, SimFinStore] = {}
+_simfin_stores_lock = threading.Lock()
+
+def get_simfin_store(data_dir: str) -> SimFinStore:
+    """获取全局SimFin存储实例"""
+    with _simfin_stores_lock:
+        store = _simfin_stores.get(data_dir)
+        if store is None:
+            store = SimFinStore(data_dir)
+            _simfin_stores[data_dir] = store
+        return store
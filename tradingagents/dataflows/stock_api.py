@@ -86,7 +86,16 @@ def search_stocks_by_name(name: str) -> List[Dict[str, Any]]:
         >>> for stock in results:
         logger.info(f"{stock['code']}: {stock['name']}")
     """
-    # 这个功能需要MongoDB支持，暂时通过原有方式实现
+    # 优先使用内存中的证券搜索索引
+    try:
+        from .symbol_index import get_symbol_index
+        matches = get_symbol_index().search(name, limit=50)
+        if matches:
+            return matches
+    except Exception as e:
+        logger.warning(f"⚠️ 证券搜索索引不可用: {e}")
+
+    # 索引不可用时回退到MongoDB查询
     try:
         from ..examples.stock_query_examples import EnhancedStockQueryService
 
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+证券主数据搜索索引
+A股、港股、美股的代码和名称统一加载一次（本地 JSON 缓存，默认每天刷新），在内存中建立：
+- 代码前缀索引（有序数组 + 二分查找，等价于前缀树查询）
+- 中文名称拼音首字母前缀索引（需要 pypinyin）
+- 名称 n-gram 倒排索引（单字 + 双字），支持任意子串匹配
+查询只做二分查找和倒排表求交，返回按匹配程度排序的前 k 条结果。
+"""
+
+import bisect
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+# 导入日志模块
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('agents')
+
+try:
+    from pypinyin import lazy_pinyin, Style
+    PYPINYIN_AVAILABLE = True
+except ImportError:
+    lazy_pinyin = None
+    Style = None
+    PYPINYIN_AVAILABLE = False
+
+
+MARKET_A = "A股"
+MARKET_HK = "港股"
+MARKET_US = "美股"
+
+# 匹配等级（越小越靠前）
+RANK_CODE_EXACT = 0
+RANK_CODE_PREFIX = 1
+RANK_NAME_EXACT = 2
+RANK_NAME_PREFIX = 3
+RANK_PINYIN_PREFIX = 4
+RANK_NAME_CONTAINS = 5
+
+_CHINESE_PATTERN = re.compile(r'[一-鿿]')
+
+# 没有在线列表时使用的常见美股名称
+DEFAULT_US_SECURITIES = {
+    'AAPL': '苹果公司', 'TSLA': '特斯拉', 'NVDA': '英伟达', 'MSFT': '微软',
+    'GOOGL': '谷歌', 'AMZN': '亚马逊', 'META': 'Meta', 'NFLX': '奈飞',
+}
+
+
+def _code_variants(security: Dict[str, Any]) -> List[str]:
+    """一只证券可被检索到的代码写法（小写）"""
+    code = security['code'].lower()
+    variants = {code}
+    ts_code = (security.get('ts_code') or '').lower()
+    if ts_code:
+        variants.add(ts_code)
+        number, _, exchange = ts_code.partition('.')
+        if exchange:
+            variants.add(f"{exchange}{number}")  # sh600036
+    if security['market'] == MARKET_HK:
+        number = code.replace('.hk', '')
+        variants.update({number, number.zfill(5), f"{number}.hk"})
+    return sorted(variants)
+
+
+def _pinyin_initials(name: str) -> Optional[str]:
+    if not PYPINYIN_AVAILABLE or not _CHINESE_PATTERN.search(name):
+        return None
+    return ''.join(lazy_pinyin(name, style=Style.FIRST_LETTER)).lower()
+
+
+def _grams(text: str) -> List[str]:
+    """名称的单字和双字 n-gram"""
+    return list(text) + [text[i:i + 2] for i in range(len(text) - 1)]
+
+
+class _PrefixIndex:
+    """有序 (键, 证券序号) 数组上的前缀查询"""
+
+    def __init__(self, entries: List[Tuple[str, int]]):
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.ids = [security_id for _, security_id in entries]
+
+    def search(self, prefix: str, limit: int) -> List[Tuple[str, int]]:
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '￿', lo=start)
+        end = min(end, start + limit)
+        return [(self.keys[j], self.ids[j]) for j in range(start, end)]
+
+
+class SymbolSearchIndex:
+    """证券代码/名称搜索索引"""
+
+    def __init__(self, securities: List[Dict[str, Any]]):
+        """
+        Args:
+            securities: 证券列表，每项至少包含 code、name、market，可带 ts_code、industry 等字段
+        """
+        self.securities = securities
+        code_entries, name_entries, pinyin_entries = [], [], []
+        postings: Dict[str, List[int]] = defaultdict(list)
+
+        for security_id, security in enumerate(securities):
+            for key in _code_variants(security):
+                code_entries.append((key, security_id))
+
+            name = str(security.get('name') or '').lower()
+            if not name:
+                continue
+            name_entries.append((name, security_id))
+            initials = _pinyin_initials(name)
+            if initials:
+                pinyin_entries.append((initials, security_id))
+            for gram in set(_grams(name)):
+                postings[gram].append(security_id)
+
+        self._codes = _PrefixIndex(code_entries)
+        self._names = _PrefixIndex(name_entries)
+        self._pinyin = _PrefixIndex(pinyin_entries)
+        self._postings = dict(postings)
+
+    def __len__(self) -> int:
+        return len(self.securities)
+
+    def _contains(self, query: str, limit: int) -> List[int]:
+        """名称包含 query 的证券：n-gram 倒排表求交后逐条确认"""
+        grams = [query] if len(query) == 1 else [query[i:i + 2] for i in range(len(query) - 1)]
+        lists = [self._postings.get(gram) for gram in set(grams)]
+        if not all(lists):
+            return []
+        lists.sort(key=len)
+        candidates = set(lists[0])
+        for other in lists[1:]:
+            candidates.intersection_update(other)
+            if not candidates:
+                return []
+
+        matches = []
+        for security_id in sorted(candidates):
+            if query in str(self.securities[security_id]['name']).lower():
+                matches.append(security_id)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def search(self, keyword: str, limit: int = 10, market: str = None) -> List[Dict[str, Any]]:
+        """
+        搜索证券
+
+        Args:
+            keyword: 代码、代码前缀、名称片段或拼音首字母
+            limit: 返回的最大条数
+            market: 只返回该市场（A股/港股/美股），None 表示全部
+
+        Returns:
+            证券信息列表，按匹配程度排序，每项附带 match_rank
+        """
+        query = str(keyword or '').strip().lower()
+        if not query:
+            return []
+
+        ranks: Dict[int, int] = {}
+
+        def add(security_id: int, rank: int):
+            if market and self.securities[security_id]['market'] != market:
+                return
+            if rank < ranks.get(security_id, RANK_NAME_CONTAINS + 1):
+                ranks[security_id] = rank
+
+        # 过滤市场后仍需足够候选，多取一些
+        scan = max(limit * 5, 50)
+        for key, security_id in self._codes.search(query, scan):
+            add(security_id, RANK_CODE_EXACT if key == query else RANK_CODE_PREFIX)
+        for key, security_id in self._names.search(query, scan):
+            add(security_id, RANK_NAME_EXACT if key == query else RANK_NAME_PREFIX)
+        if query.isascii() and query.isalpha():
+            for _, security_id in self._pinyin.search(query, scan):
+                add(security_id, RANK_PINYIN_PREFIX)
+        if len(ranks) < limit:
+            for security_id in self._contains(query, scan):
+                add(security_id, RANK_NAME_CONTAINS)
+
+        ordered = sorted(
+            ranks.items(),
+            key=lambda item: (item[1], len(str(self.securities[item[0]]['name'])), self.securities[item[0]]['code'])
+        )
+        return [dict(self.securities[security_id], match_rank=rank) for security_id, rank in ordered[:limit]]
+
+    def get(self, code: str) -> Optional[Dict[str, Any]]:
+        """按代码精确查找"""
+        for key, security_id in self._codes.search(str(code).strip().lower(), 1):
+            if key == str(code).strip().lower():
+                return dict(self.securities[security_id])
+        return None
+
+
+def _a_share_ts_code(code: str) -> str:
+    if code.startswith(('6', '9')):
+        return f"{code}.SH"
+    if code.startswith(('4', '8')):
+        return f"{code}.BJ"
+    return f"{code}.SZ"
+
+
+def _load_a_shares() -> List[Dict[str, Any]]:
+    """A股列表：优先 Tushare，没有 Token 或只拿到缓存文本时依次使用 AKShare、内置常用股票表"""
+    try:
+        from .tushare_utils import get_tushare_provider
+        stock_list = get_tushare_provider().get_stock_list()
+        # 缓存命中时可能返回字符串形式，无法建立索引
+        if isinstance(stock_list, pd.DataFrame) and not stock_list.empty:
+            return [{
+                'code': str(record.get('symbol') or str(record['ts_code']).split('.')[0]),
+                'ts_code': record.get('ts_code'),
+                'name': record.get('name', ''),
+                'market': MARKET_A,
+                'industry': record.get('industry'),
+                'area': record.get('area'),
+                'list_date': record.get('list_date'),
+            } for record in stock_list.to_dict('records')]
+    except Exception as e:
+        logger.debug(f"Tushare A股列表获取失败: {e}")
+
+    try:
+        import akshare as ak
+        stock_list = ak.stock_info_a_code_name()
+        if stock_list is not None and not stock_list.empty:
+            return [{
+                'code': str(code).zfill(6),
+                'ts_code': _a_share_ts_code(str(code).zfill(6)),
+                'name': name,
+                'market': MARKET_A,
+            } for code, name in zip(stock_list['code'], stock_list['name'])]
+    except Exception as e:
+        logger.debug(f"AKShare A股列表获取失败: {e}")
+
+    from .tdx_utils import _common_stock_names
+    logger.warning("⚠️ [证券主数据] 无法获取完整A股列表，使用内置常用股票表")
+    return [{'code': code, 'ts_code': _a_share_ts_code(code), 'name': name, 'market': MARKET_A}
+            for code, name in _common_stock_names.items()]
+
+
+def _load_hk_shares() -> List[Dict[str, Any]]:
+    securities: Dict[str, Dict[str, Any]] = {}
+    try:
+        import akshare as ak
+        spot = ak.stock_hk_spot_em()
+        for code, name in zip(spot['代码'], spot['名称']):
+            display = f"{str(code).lstrip('0').zfill(4)}.HK"
+            securities[display] = {'code': display, 'name': name, 'market': MARKET_HK}
+    except Exception as e:
+        logger.debug(f"港股列表获取失败，使用内置名称: {e}")
+
+    from .improved_hk_utils import get_improved_hk_provider
+    for code, name in get_improved_hk_provider().hk_stock_names.items():
+        if code.endswith('.HK') and code not in securities:
+            securities[code] = {'code': code, 'name': name, 'market': MARKET_HK}
+    return list(securities.values())
+
+
+def _load_us_shares() -> List[Dict[str, Any]]:
+    securities: Dict[str, Dict[str, Any]] = {
+        code: {'code': code, 'name': name, 'market': MARKET_US}
+        for code, name in DEFAULT_US_SECURITIES.items()
+    }
+    try:
+        from .tushare_utils import get_tushare_provider
+        provider = get_tushare_provider()
+        if provider.connected:
+            offset = 0
+            while True:
+                page = provider.api.us_basic(offset=offset, limit=6000, fields='ts_code,name,enname')
+                if page is None or page.empty:
+                    break
+                for record in page.to_dict('records'):
+                    code = str(record['ts_code']).upper()
+                    if code not in securities:
+                        securities[code] = {
+                            'code': code,
+                            'name': record.get('name') or record.get('enname') or code,
+                            'market': MARKET_US,
+                        }
+                offset += len(page)
+    except Exception as e:
+        logger.debug(f"美股列表获取失败，使用内置名称: {e}")
+    return list(securities.values())
+
+
+def load_security_master(cache_file: str, max_age_hours: float = 24, force: bool = False) -> List[Dict[str, Any]]:
+    """
+    加载证券主数据：缓存文件未过期时直接读取，否则从各数据源重新构建并写入缓存
+
+    force=True 时忽略缓存有效期强制重建；重新构建失败时使用旧缓存，缓存文件在新数据写入后才被替换。
+    """
+    cached = None
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if not force and time.time() - os.path.getmtime(cache_file) < max_age_hours * 3600:
+                return cached
+        except Exception as e:
+            logger.warning(f"⚠️ 证券主数据缓存读取失败: {e}")
+
+    securities = []
+    for market, loader in ((MARKET_A, _load_a_shares), (MARKET_HK, _load_hk_shares), (MARKET_US, _load_us_shares)):
+        try:
+            loaded = loader()
+            logger.info(f"📇 [证券主数据] {market}: {len(loaded)}只")
+            securities.extend(loaded)
+        except Exception as e:
+            logger.warning(f"⚠️ [证券主数据] {market}加载失败: {e}")
+
+    if not any(s['market'] == MARKET_A for s in securities) and cached:
+        logger.warning("⚠️ [证券主数据] A股列表不可用，继续使用过期缓存")
+        return cached
+
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.tmp-{os.getpid()}"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(securities, f, ensure_ascii=False, default=str)
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        logger.warning(f"⚠️ 证券主数据缓存写入失败: {e}")
+    return securities
+
+
+# 全局索引实例
+_symbol_index = None
+_symbol_index_built_at = 0.0
+_symbol_index_refreshing = False
+_symbol_index_lock = threading.Lock()
+
+
+def _security_master_settings() -> Tuple[str, float]:
+    default_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_cache", "security_master.json")
+    cache_file = os.getenv('SECURITY_MASTER_FILE') or default_file
+    return cache_file, float(os.getenv('SECURITY_MASTER_MAX_AGE_HOURS', '24'))
+
+
+def _build_symbol_index(force: bool = False) -> Tuple[SymbolSearchIndex, float]:
+    """加载主数据并建立索引，返回 (索引, 数据时间)"""
+    cache_file, max_age_hours = _security_master_settings()
+    start = time.time()
+    securities = load_security_master(cache_file, max_age_hours, force=force)
+    index = SymbolSearchIndex(securities)
+    logger.info(f"📇 [证券主数据] 索引已建立: {len(securities)}只证券, 用时{time.time() - start:.2f}秒"
+                f"{'' if PYPINYIN_AVAILABLE else '（未安装pypinyin，拼音首字母检索不可用）'}")
+
+    # 数据时间取缓存文件的写入时间；重建失败仍在使用过期缓存时按当前时间计，避免每次访问都触发重建
+    built_at = time.time()
+    try:
+        mtime = os.path.getmtime(cache_file)
+        if built_at - mtime < max_age_hours * 3600:
+            built_at = mtime
+    except OSError:
+        pass
+    return index, built_at
+
+
+def _refresh_symbol_index():
+    """后台重建索引，完成后替换全局实例（重建期间继续使用旧索引）"""
+    global _symbol_index, _symbol_index_built_at, _symbol_index_refreshing
+    try:
+        index, built_at = _build_symbol_index()
+        with _symbol_index_lock:
+            _symbol_index, _symbol_index_built_at = index, built_at
+    except Exception as e:
+        logger.warning(f"⚠️ [证券主数据] 索引刷新失败，继续使用旧索引: {e}")
+        with _symbol_index_lock:
+            _symbol_index_built_at = time.time()
+    finally:
+        with _symbol_index_lock:
+            _symbol_index_refreshing = False
+
+
+def get_symbol_index(refresh: bool = False) -> SymbolSearchIndex:
+    """
+    获取全局证券搜索索引（首次调用时加载，数据过期后在后台刷新）
+
+    缓存文件路径和有效期可通过 SECURITY_MASTER_FILE、SECURITY_MASTER_MAX_AGE_HOURS 调整。
+    refresh=True 时立即从数据源重建。
+    """
+    global _symbol_index, _symbol_index_built_at, _symbol_index_refreshing
+    with _symbol_index_lock:
+        if _symbol_index is None or refresh:
+            _symbol_index, _symbol_index_built_at = _build_symbol_index(force=refresh)
+        elif (not _symbol_index_refreshing
+              and time.time() - _symbol_index_built_at > _security_master_settings()[1] * 3600):
+            _symbol_index_refreshing = True
+            threading.Thread(target=_refresh_symbol_index, name='symbol-index-refresh', daemon=True).start()
+        return _symbol_index
+
+
+def search_securities(keyword: str, limit: int = 10, market: str = None) -> List[Dict[str, Any]]:
+    """在全局索引中搜索证券"""
+    return get_symbol_index().search(keyword, limit=limit, market=market)
@@ -4,8 +4,16 @@ Tushare数据接口数据获取工具
 支持A股、港股实时数据和历史数据
 """
 
+import atexit
 import pandas as pd
 import numpy as np
+import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
 import warnings
@@ -51,14 +59,289 @@ except ImportError:
     logger.info(f"💡 安装命令: pip install pytdx")
 
 
+# 默认服务器列表（未找到 tdx_servers_config.json 时使用）
+DEFAULT_TDX_SERVERS = [
+    {'ip': '115.238.56.198', 'port': 7709},
+    {'ip': '115.238.90.165', 'port': 7709},
+    {'ip': '180.153.18.170', 'port': 7709},
+    {'ip': '119.147.212.81', 'port': 7709},  # 备用
+]
+
+
+class _PooledTdxConnection:
+    """连接池中的单个通达信连接"""
+
+    def __init__(self, api, server_index: int):
+        self.api = api
+        self.server_index = server_index
+        self.healthy = True
+        # 连接池停止后置为 True，借出中的连接归还时直接断开而不再放回空闲队列
+        self.retired = False
+
+
+class TdxConnectionPool:
+    """
+    通达信连接池
+    按实测延迟对服务器排序，在多台服务器上维持多个长连接；
+    后台心跳检测空闲连接，失效连接自动切换到下一台服务器。
+    """
+
+    def __init__(self, servers: List[Dict], size: int = None, connect_timeout: float = None,
+                 heartbeat_interval: float = None, acquire_timeout: float = 30.0):
+        """
+        初始化连接池
+
+        Args:
+            servers: 候选服务器列表 [{'ip': ..., 'port': ...}]
+            size: 连接数，默认读取 TDX_POOL_SIZE 或 3
+            connect_timeout: 测速和建连超时（秒），默认读取 TDX_CONNECT_TIMEOUT 或 3
+            heartbeat_interval: 心跳间隔（秒），默认读取 TDX_HEARTBEAT_INTERVAL 或 30
+            acquire_timeout: 等待空闲连接的最长时间（秒）
+        """
+        self.servers = servers
+        self.size = size or int(os.getenv('TDX_POOL_SIZE', '3'))
+        self.connect_timeout = connect_timeout or float(os.getenv('TDX_CONNECT_TIMEOUT', '3'))
+        self.heartbeat_interval = heartbeat_interval or float(os.getenv('TDX_HEARTBEAT_INTERVAL', '30'))
+        self.acquire_timeout = acquire_timeout
+
+        self.ranked_servers: List[Dict] = []
+        self._connections: List[_PooledTdxConnection] = []
+        self._idle: "queue.Queue[_PooledTdxConnection]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._heartbeat_thread = None
+        self._started = False
+
+    def _measure_latency(self, server: Dict) -> Optional[float]:
+        """测量到服务器的TCP建连耗时"""
+        start = time.perf_counter()
+        try:
+            with socket.create_connection((server['ip'], server['port']), timeout=self.connect_timeout):
+                return time.perf_counter() - start
+        except OSError:
+            return None
+
+    def rank_servers(self) -> List[Dict]:
+        """并发测速并按延迟排序服务器，不可达的服务器排在最后"""
+        with ThreadPoolExecutor(max_workers=max(len(self.servers), 1)) as executor:
+            latencies = list(executor.map(self._measure_latency, self.servers))
+
+        reachable = sorted(
+            (dict(server, latency=latency) for server, latency in zip(self.servers, latencies) if latency is not None),
+            key=lambda server: server['latency']
+        )
+        unreachable = [dict(server, latency=None) for server, latency in zip(self.servers, latencies) if latency is None]
+        self.ranked_servers = reachable + unreachable
+
+        for server in reachable:
+            logger.debug(f"🔍 [DEBUG] 通达信服务器 {server['ip']}:{server['port']} 延迟 {server['latency'] * 1000:.0f}ms")
+        if unreachable:
+            logger.warning(f"⚠️ 通达信服务器不可达: {[s['ip'] for s in unreachable]}")
+        return self.ranked_servers
+
+    def _open(self, start_index: int) -> Optional[_PooledTdxConnection]:
+        """从排名第 start_index 的服务器开始依次尝试建立连接"""
+        total = len(self.ranked_servers)
+        for offset in range(total):
+            index = (start_index + offset) % total
+            server = self.ranked_servers[index]
+            try:
+                api = TdxHq_API()
+                if api.connect(server['ip'], server['port'], time_out=self.connect_timeout):
+                    logger.debug(f"🔍 [DEBUG] 连接池建立连接: {server['ip']}:{server['port']}")
+                    return _PooledTdxConnection(api, index)
+            except Exception as e:
+                logger.error(f"⚠️ 服务器 {server['ip']}:{server['port']} 连接失败: {e}")
+        return None
+
+    def _reconnect(self, conn: _PooledTdxConnection) -> bool:
+        """故障切换：断开旧连接，从下一台服务器开始重连"""
+        try:
+            conn.api.disconnect()
+        except Exception:
+            pass
+
+        replacement = self._open(conn.server_index + 1)
+        if replacement is None:
+            conn.healthy = False
+            return False
+
+        conn.api = replacement.api
+        conn.server_index = replacement.server_index
+        conn.healthy = True
+        server = self.ranked_servers[conn.server_index]
+        logger.info(f"🔄 通达信连接已切换到: {server['ip']}:{server['port']}")
+        return True
+
+    def start(self) -> bool:
+        """测速、建立连接并启动心跳线程；已启动但无健康连接时立即重连"""
+        with self._lock:
+            if self._started:
+                if self.healthy_count() == 0:
+                    self._reconnect_idle()
+                return self.healthy_count() > 0
+
+            self.rank_servers()
+            self._stop_event.clear()
+            # 连接分散到延迟最低的几台服务器，避免单台慢服务器串行化所有请求
+            for i in range(self.size):
+                conn = self._open(i % max(len(self.ranked_servers), 1))
+                if conn is not None:
+                    self._connections.append(conn)
+                    self._idle.put(conn)
+
+            if not self._connections:
+                logger.error(f"❌ 所有数据服务器连接失败")
+                return False
+
+            self._heartbeat_thread = threading.Thread(
+                target=self._heartbeat_loop, name='tdx-heartbeat', daemon=True
+            )
+            self._heartbeat_thread.start()
+            self._started = True
+            logger.info(f"✅ 通达信连接池已启动: {len(self._connections)}个连接")
+            return True
+
+    def _reconnect_idle(self):
+        """立即重连空闲队列中的失效连接，不必等待下一次心跳"""
+        self.rank_servers()
+        for _ in range(self._idle.qsize()):
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if not conn.healthy:
+                self._reconnect(conn)
+            self._release(conn)
+
+    def stop(self):
+        """停止心跳并断开所有连接（借出中的连接在归还时断开）"""
+        with self._lock:
+            self._stop_event.set()
+            heartbeat_thread, self._heartbeat_thread = self._heartbeat_thread, None
+            for conn in self._connections:
+                conn.retired = True
+            self._connections = []
+            self._started = False
+
+            while True:
+                try:
+                    self._close(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+
+        if heartbeat_thread is not None and heartbeat_thread is not threading.current_thread():
+            heartbeat_thread.join(timeout=self.connect_timeout * 2)
+
+    @staticmethod
+    def _close(conn: _PooledTdxConnection):
+        try:
+            conn.api.disconnect()
+        except Exception:
+            pass
+
+    def _release(self, conn: _PooledTdxConnection):
+        """归还连接：连接池已停止时断开，否则放回空闲队列"""
+        if conn.retired:
+            self._close(conn)
+        else:
+            self._idle.put(conn)
+
+    def healthy_count(self) -> int:
+        return sum(1 for conn in self._connections if conn.healthy)
+
+    def _heartbeat_loop(self):
+        """定期检测空闲连接，失效则故障切换"""
+        while not self._stop_event.wait(self.heartbeat_interval):
+            # 每次只借出一个空闲连接检测，其余连接照常服务请求
+            failed = False
+            for _ in range(self._idle.qsize()):
+                if self._stop_event.is_set():
+                    break
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    count = conn.api.get_security_count(0)
+                    conn.healthy = count is not None and count > 0
+                except Exception:
+                    conn.healthy = False
+                if not conn.healthy:
+                    failed = True
+                    self._reconnect(conn)
+                self._release(conn)
+
+            # 出现失效连接时重新测速，后续切换优先选择更快的服务器
+            if failed:
+                self.rank_servers()
+
+    @contextmanager
+    def connection(self):
+        """借出一个空闲连接"""
+        try:
+            conn = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"等待通达信连接超时({self.acquire_timeout}s)")
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def call(self, method: str, *args, **kwargs):
+        """在池中某个连接上执行API调用，失败时切换服务器重试一次"""
+        last_error = None
+        for _ in range(2):
+            with self.connection() as conn:
+                if not conn.healthy and not self._reconnect(conn):
+                    continue
+                try:
+                    return getattr(conn.api, method)(*args, **kwargs)
+                except Exception as e:
+                    last_error = e
+                    logger.warning(f"⚠️ 通达信调用 {method} 失败，切换服务器重试: {e}")
+                    conn.healthy = False
+                    self._reconnect(conn)
+        if last_error is not None:
+            raise last_error
+        raise ConnectionError("通达信连接池无可用连接")
+
+
+_tdx_connection_pool = None
+_tdx_connection_pool_lock = threading.Lock()
+
+def get_tdx_connection_pool(servers: List[Dict] = None) -> TdxConnectionPool:
+    """获取全局通达信连接池（跨提供器实例共享）"""
+    global _tdx_connection_pool
+    with _tdx_connection_pool_lock:
+        if _tdx_connection_pool is None:
+            _tdx_connection_pool = TdxConnectionPool(servers or DEFAULT_TDX_SERVERS)
+        return _tdx_connection_pool
+
+
+def shutdown_tdx_connection_pool():
+    """停止全局通达信连接池（进程退出时自动调用）"""
+    global _tdx_connection_pool
+    with _tdx_connection_pool_lock:
+        pool, _tdx_connection_pool = _tdx_connection_pool, None
+    if pool is not None:
+        pool.stop()
+        logger.info(f"✅ 通达信连接池已关闭")
+
+
+atexit.register(shutdown_tdx_connection_pool)
+
+
+
 class TongDaXinDataProvider:
     """通达信数据提供器"""
     
     def __init__(self):
         logger.debug(f"🔍 [DEBUG] 初始化通达信数据提供器...")
-        self.api = None
+        self.pool = None
         self.exapi = None  # 扩展行情API
         self.connected = False
+        self._connect_lock = threading.Lock()
 
         logger.debug(f"🔍 [DEBUG] 检查pytdx库可用性: {TDX_AVAILABLE}")
         if not TDX_AVAILABLE:
@@ -68,51 +351,33 @@ class TongDaXinDataProvider:
         logger.debug(f"✅ [DEBUG] pytdx库检查通过")
     
     def connect(self):
-        """连接数据服务器"""
+        """连接数据服务器（使用共享连接池）"""
         logger.debug(f"🔍 [DEBUG] 开始连接数据服务器...")
-        try:
-            # 尝试从配置文件加载可用服务器
-            logger.debug(f"🔍 [DEBUG] 加载服务器配置...")
-            working_servers = self._load_working_servers()
-
-            # 如果没有配置文件，使用默认服务器列表
-            if not working_servers:
-                logger.debug(f"🔍 [DEBUG] 未找到配置文件，使用默认服务器列表")
-                working_servers = [
-                    {'ip': '115.238.56.198', 'port': 7709},
-                    {'ip': '115.238.90.165', 'port': 7709},
-                    {'ip': '180.153.18.170', 'port': 7709},
-                    {'ip': '119.147.212.81', 'port': 7709},  # 备用
-                ]
-            else:
-                logger.debug(f"🔍 [DEBUG] 从配置文件加载了 {len(working_servers)} 个服务器")
+        with self._connect_lock:
+            if self.connected:
+                return True
+            try:
+                # 尝试从配置文件加载可用服务器
+                logger.debug(f"🔍 [DEBUG] 加载服务器配置...")
+                working_servers = self._load_working_servers()
 
-            # 尝试连接可用服务器
-            logger.debug(f"🔍 [DEBUG] 创建Tushare数据接口实例...")
-            self.api = TdxHq_API()
-            logger.debug(f"🔍 [DEBUG] 开始尝试连接服务器...")
+                # 如果没有配置文件，使用默认服务器列表
+                if not working_servers:
+                    logger.debug(f"🔍 [DEBUG] 未找到配置文件，使用默认服务器列表")
+                    working_servers = DEFAULT_TDX_SERVERS
+                else:
+                    logger.debug(f"🔍 [DEBUG] 从配置文件加载了 {len(working_servers)} 个服务器")
 
-            for i, server in enumerate(working_servers):
-                try:
-                    logger.debug(f"🔍 [DEBUG] 尝试连接服务器 {i+1}/{len(working_servers)}: {server['ip']}:{server['port']}")
-                    result = self.api.connect(server['ip'], server['port'])
-                    logger.debug(f"🔍 [DEBUG] 连接结果: {result}")
-                    if result:
-                        logger.info(f"✅ Tushare数据接口连接成功: {server['ip']}:{server['port']}")
-                        self.connected = True
-                        return True
-                except Exception as e:
-                    logger.error(f"⚠️ 服务器 {server['ip']}:{server['port']} 连接失败: {e}")
-                    continue
+                self.pool = get_tdx_connection_pool(working_servers)
+                self.connected = self.pool.start()
+                if self.connected:
+                    logger.info(f"✅ Tushare数据接口连接成功")
+                return self.connected
 
-            logger.error(f"❌ 所有数据服务器连接失败")
-            self.connected = False
-            return False
-
-        except Exception as e:
-            logger.error(f"❌ Tushare数据接口连接失败: {e}")
-            self.connected = False
-            return False
+            except Exception as e:
+                logger.error(f"❌ Tushare数据接口连接失败: {e}")
+                self.connected = False
+                return False
 
     def _load_working_servers(self):
         """加载可用服务器配置"""
@@ -130,10 +395,9 @@ class TongDaXinDataProvider:
         return []
     
     def disconnect(self):
-        """断开连接"""
+        """断开连接（只释放本实例对共享连接池的引用，连接池由 shutdown_tdx_connection_pool 关闭）"""
         try:
-            if self.api:
-                self.api.disconnect()
+            self.pool = None
             if self.exapi:
                 self.exapi.disconnect()
             self.connected = False
@@ -142,19 +406,10 @@ class TongDaXinDataProvider:
             pass
 
     def is_connected(self):
-        """检查连接状态"""
-        if not self.connected or not self.api:
-            return False
-
-        # 尝试简单的API调用来验证连接是否有效
-        try:
-            # 获取市场信息作为连接测试
-            result = self.api.get_security_count(0)  # 获取深圳市场股票数量
-            return result is not None and result > 0
-        except Exception as e:
-            logger.error(f"🔍 [DEBUG] 连接测试失败: {e}")
-            self.connected = False
+        """检查连接状态（连接有效性由连接池心跳维护）"""
+        if not self.connected or not self.pool:
             return False
+        return self.pool.healthy_count() > 0
     
     def _get_stock_name(self, stock_code: str) -> str:
         """
@@ -196,7 +451,7 @@ class TongDaXinDataProvider:
             if market == 0:  # 深圳市场
                 try:
                     for start_pos in range(0, 2000, 1000):  # 分批获取
-                        stock_list = self.api.get_security_list(market, start_pos)
+                        stock_list = self.pool.call('get_security_list', market, start_pos)
                         if stock_list:
                             for stock_info in stock_list:
                                 if stock_info.get('code') == stock_code:
@@ -234,7 +489,7 @@ class TongDaXinDataProvider:
             market = self._get_market_code(stock_code)
             
             # 获取实时数据
-            data = self.api.get_security_quotes([(market, stock_code)])
+            data = self.pool.call('get_security_quotes', [(market, stock_code)])
 
             if not data:
                 return {}
@@ -305,7 +560,7 @@ class TongDaXinDataProvider:
             category_map = {'D': 9, 'W': 5, 'M': 6}
             category = category_map.get(period, 9)
             
-            data = self.api.get_security_bars(category, market, stock_code, 0, count)
+            data = self.pool.call('get_security_bars', category, market, stock_code, 0, count)
             
             if not data:
                 return pd.DataFrame()
@@ -412,37 +667,21 @@ class TongDaXinDataProvider:
                 return []
         
         try:
-            # 中国股票数据没有直接的搜索API，这里提供一个简化的实现
-            # 实际使用中可以维护一个股票代码表
-            
-            # 常见股票代码映射
-            stock_mapping = {
-                '平安银行': '000001',
-                '万科A': '000002', 
-                '中国平安': '601318',
-                '贵州茅台': '600519',
-                '招商银行': '600036',
-                '五粮液': '000858',
-                '格力电器': '000651',
-                '美的集团': '000333',
-                '中国石化': '600028',
-                '工商银行': '601398'
-            }
-            
+            from .symbol_index import get_symbol_index, MARKET_A
+
             results = []
             
-            # 按关键词搜索
-            for name, code in stock_mapping.items():
-                if keyword.lower() in name.lower() or keyword in code:
-                    # 获取实时数据
-                    realtime_data = self.get_real_time_data(code)
-                    if realtime_data:
-                        results.append({
-                            'code': code,
-                            'name': name,
-                            'price': realtime_data.get('price', 0),
-                            'change_percent': realtime_data.get('change_percent', 0)
-                        })
+            # 在证券搜索索引中查找，再获取实时数据
+            for match in get_symbol_index().search(keyword, limit=10, market=MARKET_A):
+                code = match['code']
+                realtime_data = self.get_real_time_data(code)
+                if realtime_data:
+                    results.append({
+                        'code': code,
+                        'name': match['name'],
+                        'price': realtime_data.get('price', 0),
+                        'change_percent': realtime_data.get('change_percent', 0)
+                    })
             
             return results
             
@@ -481,18 +720,19 @@ class TongDaXinDataProvider:
             }
             
             market_data = {}
+
+            # 一次请求批量获取全部指数行情
+            names = list(indices.keys())
+            quotes = self.pool.call('get_security_quotes', [(int(market), code) for market, code in indices.values()])
             
-            for name, (market, code) in indices.items():
+            for name, quote in zip(names, quotes or []):
                 try:
-                    data = self.api.get_security_quotes([(int(market), code)])
-                    if data:
-                        quote = data[0]
-                        market_data[name] = {
-                            'price': quote['price'],
-                            'change': quote['price'] - quote['last_close'],
-                            'change_percent': ((quote['price'] - quote['last_close']) / quote['last_close'] * 100) if quote['last_close'] > 0 else 0,
-                            'volume': quote['vol']
-                        }
+                    market_data[name] = {
+                        'price': quote['price'],
+                        'change': quote['price'] - quote['last_close'],
+                        'change_percent': ((quote['price'] - quote['last_close']) / quote['last_close'] * 100) if quote['last_close'] > 0 else 0,
+                        'volume': quote['vol']
+                    }
                 except:
                     continue
             
@@ -683,21 +923,24 @@ def get_china_stock_data(stock_code: str, start_date: str, end_date: str) -> str
 
     try:
         provider = get_tdx_provider()
+        if not provider.connected:
+            provider.connect()
+
+        # 历史数据、实时数据和技术指标互不依赖，在连接池的多个连接上并发获取
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            history_future = executor.submit(provider.get_stock_history_data, stock_code, start_date, end_date)
+            realtime_future = executor.submit(provider.get_real_time_data, stock_code)
+            indicators_future = executor.submit(provider.get_stock_technical_indicators, stock_code)
 
-        # 获取历史数据
-        df = provider.get_stock_history_data(stock_code, start_date, end_date)
+            df = history_future.result()
+            realtime_data = realtime_future.result()
+            indicators = indicators_future.result()
 
         if df.empty:
             error_msg = f"❌ 未能获取股票 {stock_code} 的历史数据"
             print(error_msg)
             return error_msg
         
-        # 获取实时数据
-        realtime_data = provider.get_real_time_data(stock_code)
-
-        # 获取技术指标
-        indicators = provider.get_stock_technical_indicators(stock_code)
-        
         # 格式化输出
         result = f"""
 # {stock_code} 股票数据分析
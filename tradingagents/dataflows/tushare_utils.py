@@ -430,30 +430,32 @@ class TushareProvider:
             logger.info(f"🔍 [股票代码追踪] 默认深圳证券交易所: '{symbol}' -> '{result}'")
             return result
     
-    def search_stocks(self, keyword: str) -> pd.DataFrame:
+    def search_stocks(self, keyword: str, limit: int = 100) -> pd.DataFrame:
         """
-        搜索股票
+        搜索股票（使用内存中的证券搜索索引，支持代码前缀、名称片段和拼音首字母）
         
         Args:
             keyword: 搜索关键词
+            limit: 最多返回的条数
             
         Returns:
-            DataFrame: 搜索结果
+            DataFrame: 搜索结果，按匹配程度排序
         """
         try:
-            stock_list = self.get_stock_list()
-            
-            if stock_list.empty:
+            from .symbol_index import get_symbol_index, MARKET_A
+
+            matches = get_symbol_index().search(keyword, limit=limit, market=MARKET_A)
+            if not matches:
                 return pd.DataFrame()
-            
-            # 按名称和代码搜索
-            mask = (
-                stock_list['name'].str.contains(keyword, na=False) |
-                stock_list['symbol'].str.contains(keyword, na=False) |
-                stock_list['ts_code'].str.contains(keyword, na=False)
-            )
-            
-            results = stock_list[mask]
+
+            results = pd.DataFrame([{
+                'ts_code': m.get('ts_code'),
+                'symbol': m['code'],
+                'name': m['name'],
+                'area': m.get('area'),
+                'industry': m.get('industry'),
+                'list_date': m.get('list_date'),
+            } for m in matches])
             logger.debug(f"🔍 搜索'{keyword}'找到{len(results)}只股票")
             
             return results
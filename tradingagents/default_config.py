@@ -17,6 +17,33 @@ DEFAULT_CONFIG = {
     "max_debate_rounds": 1,
     "max_risk_discuss_rounds": 1,
     "max_recur_limit": 100,
+    # Per-analyst tool loop budgets (0 = unlimited); "analyst_budgets" overrides them per analyst type,
+    # e.g. {"news": {"tool_calls": 4, "tokens": 30000}}
+    "analyst_max_tool_calls": int(os.getenv("ANALYST_MAX_TOOL_CALLS", "8")),
+    "analyst_max_tokens": int(os.getenv("ANALYST_MAX_TOKENS", "60000")),
+    "analyst_budgets": {},
+    # Run the selected analysts as concurrent branches instead of one after another
+    "parallel_analysts": os.getenv("PARALLEL_ANALYSTS", "false").lower() == "true",
+    # Run the risky/safe/neutral analysts of each risk debate round concurrently
+    "parallel_risk_debate": os.getenv("PARALLEL_RISK_DEBATE", "false").lower() == "true",
+    # Digest the analyst reports once before the debates and use the digests in debate prompts
+    "report_digest_enabled": os.getenv("REPORT_DIGEST_ENABLED", "true").lower() == "true",
+    "report_digest_max_chars": int(os.getenv("REPORT_DIGEST_MAX_CHARS", "1500")),
+    # Fold older debate turns into a rolling summary above this many tokens (0 = never)
+    "debate_history_max_tokens": int(os.getenv("DEBATE_HISTORY_MAX_TOKENS", "3000")),
+    # Memory settings: a Chroma server shared by all processes (e.g. http://localhost:8000), or
+    # a local persistent directory for single-process use (MEMORY_PERSISTENT=true); in-memory by default
+    "memory_server_url": os.getenv("CHROMA_SERVER_URL") or None,
+    "memory_persist_dir": (
+        os.getenv(
+            "TRADINGAGENTS_MEMORY_DIR",
+            os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), ".")), "dataflows/data_cache/chroma_memory"),
+        )
+        if os.getenv("MEMORY_PERSISTENT", "false").lower() == "true"
+        else None
+    ),
+    # Stream LLM token deltas to the analysis event bus (requires an analysis_id in propagate)
+    "stream_llm_tokens": os.getenv("STREAM_LLM_TOKENS", "false").lower() == "true",
     # Tool settings
     "online_tools": True,
 
@@ -77,3 +77,9 @@ class ConditionalLogic:
         if state["risk_debate_state"]["latest_speaker"].startswith("Safe"):
             return "Neutral Analyst"
         return "Risky Analyst"
+
+    def should_continue_risk_round(self, state: AgentState) -> str:
+        """Determine if another concurrent risk debate round should run."""
+        if state["risk_debate_state"]["count"] >= 3 * self.max_risk_discuss_rounds:
+            return "Risk Judge"
+        return "Risk Debate Round"
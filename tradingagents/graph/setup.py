@@ -1,6 +1,10 @@
 # TradingAgents/graph/setup.py
 
+import contextvars
+import inspect
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any
+from langchain_core.runnables import Runnable, RunnableConfig
 from langchain_openai import ChatOpenAI
 from langgraph.graph import END, StateGraph, START
 from langgraph.prebuilt import ToolNode
@@ -9,13 +13,42 @@ from tradingagents.agents import *
 from tradingagents.agents.utils.agent_states import AgentState
 from tradingagents.agents.utils.agent_utils import Toolkit
 
+from tradingagents.utils.tracing import trace_span
+
 from .conditional_logic import ConditionalLogic
+from .tool_budget import AnalystToolBudget, create_budgeted_analyst
+from tradingagents.agents.utils.report_digest import (
+    RISK_DEBATE_KEEP_TURNS, compact_debate_history, create_report_digest_node
+)
 
 # 导入统一日志系统
 from tradingagents.utils.logging_init import get_logger
 logger = get_logger("default")
 
 
+# 分析师类型 -> 写入 AgentState 的报告字段
+ANALYST_REPORT_FIELDS = {
+    "market": "market_report",
+    "social": "sentiment_report",
+    "news": "news_report",
+    "fundamentals": "fundamentals_report",
+}
+
+
+def _traced_node(name: str, node):
+    """包装图节点，每次执行记录为链路追踪 span；Runnable 节点（ToolNode、子图）通过 invoke 调用"""
+    if isinstance(node, Runnable):
+        invoke, accepts_config = node.invoke, True
+    else:
+        invoke, accepts_config = node, "config" in inspect.signature(node).parameters
+
+    def traced_node(state, config: RunnableConfig = None):
+        with trace_span(f"node {name}", **{"graph.node": name}):
+            return invoke(state, config) if accepts_config else invoke(state)
+
+    return traced_node
+
+
 class GraphSetup:
     """Handles the setup and configuration of the agent graph."""
 
@@ -156,54 +189,107 @@ class GraphSetup:
             self.deep_thinking_llm, self.risk_manager_memory
         )
 
-        # Create workflow
-        workflow = StateGraph(AgentState)
-
-        # Add analyst nodes to the graph
+        # 限制每个分析师的工具调用次数和 token 用量，超出时直接生成最终报告
         for analyst_type, node in analyst_nodes.items():
-            workflow.add_node(f"{analyst_type.capitalize()} Analyst", node)
-            workflow.add_node(
-                f"Msg Clear {analyst_type.capitalize()}", delete_nodes[analyst_type]
+            analyst_nodes[analyst_type] = create_budgeted_analyst(
+                analyst_type,
+                node,
+                self.quick_thinking_llm,
+                AnalystToolBudget.from_config(self.config, analyst_type),
+                ANALYST_REPORT_FIELDS[analyst_type],
             )
-            workflow.add_node(f"tools_{analyst_type}", tool_nodes[analyst_type])
 
-        # Add other nodes
-        workflow.add_node("Bull Researcher", bull_researcher_node)
-        workflow.add_node("Bear Researcher", bear_researcher_node)
-        workflow.add_node("Research Manager", research_manager_node)
-        workflow.add_node("Trader", trader_node)
-        workflow.add_node("Risky Analyst", risky_analyst)
-        workflow.add_node("Neutral Analyst", neutral_analyst)
-        workflow.add_node("Safe Analyst", safe_analyst)
-        workflow.add_node("Risk Judge", risk_manager_node)
+        # 分析师完成后、辩论开始前生成一次报告摘要
+        debate_entry = "Bull Researcher"
+        report_digest_enabled = self.config.get("report_digest_enabled", True)
+        if report_digest_enabled:
+            debate_entry = "Report Digest"
 
-        # Define edges
-        # Start with the first analyst
-        first_analyst = selected_analysts[0]
-        workflow.add_edge(START, f"{first_analyst.capitalize()} Analyst")
+        # Create workflow
+        workflow = StateGraph(AgentState)
 
-        # Connect analysts in sequence
-        for i, analyst_type in enumerate(selected_analysts):
-            current_analyst = f"{analyst_type.capitalize()} Analyst"
-            current_tools = f"tools_{analyst_type}"
-            current_clear = f"Msg Clear {analyst_type.capitalize()}"
+        parallel_analysts = self.config.get("parallel_analysts", False)
+        if parallel_analysts:
+            # 并行模式：每个分析师是独立子图，作为并发分支运行，在辩论前汇合
+            analyst_names = []
+            for analyst_type in selected_analysts:
+                name = f"{analyst_type.capitalize()} Analyst"
+                self._add_node(
+                    workflow,
+                    name,
+                    self._create_parallel_analyst_node(
+                        analyst_type, analyst_nodes[analyst_type], tool_nodes[analyst_type]
+                    ),
+                )
+                workflow.add_edge(START, name)
+                analyst_names.append(name)
+            workflow.add_edge(analyst_names, debate_entry)
+            logger.info(f"🔀 [并行分析] 分析师并行执行: {', '.join(analyst_names)}")
+        else:
+            # Add analyst nodes to the graph
+            for analyst_type, node in analyst_nodes.items():
+                self._add_node(workflow, f"{analyst_type.capitalize()} Analyst", node)
+                self._add_node(
+                    workflow, f"Msg Clear {analyst_type.capitalize()}", delete_nodes[analyst_type]
+                )
+                self._add_node(workflow, f"tools_{analyst_type}", tool_nodes[analyst_type])
 
-            # Add conditional edges for current analyst
-            workflow.add_conditional_edges(
-                current_analyst,
-                getattr(self.conditional_logic, f"should_continue_{analyst_type}"),
-                [current_tools, current_clear],
+        # Add other nodes
+        if report_digest_enabled:
+            self._add_node(
+                workflow,
+                "Report Digest",
+                create_report_digest_node(
+                    self.quick_thinking_llm, self.config.get("report_digest_max_chars", 1500)
+                ),
             )
-            workflow.add_edge(current_tools, current_analyst)
+        self._add_node(workflow, "Bull Researcher", bull_researcher_node)
+        self._add_node(workflow, "Bear Researcher", bear_researcher_node)
+        self._add_node(workflow, "Research Manager", research_manager_node)
+        self._add_node(workflow, "Trader", trader_node)
+        parallel_risk_debate = self.config.get("parallel_risk_debate", False)
+        if parallel_risk_debate:
+            self._add_node(
+                workflow,
+                "Risk Debate Round",
+                self._create_concurrent_risk_round_node(risky_analyst, safe_analyst, neutral_analyst),
+            )
+        else:
+            self._add_node(workflow, "Risky Analyst", risky_analyst)
+            self._add_node(workflow, "Neutral Analyst", neutral_analyst)
+            self._add_node(workflow, "Safe Analyst", safe_analyst)
+        self._add_node(workflow, "Risk Judge", risk_manager_node)
 
-            # Connect to next analyst or to Bull Researcher if this is the last analyst
-            if i < len(selected_analysts) - 1:
-                next_analyst = f"{selected_analysts[i+1].capitalize()} Analyst"
-                workflow.add_edge(current_clear, next_analyst)
-            else:
-                workflow.add_edge(current_clear, "Bull Researcher")
+        # Define edges
+        if not parallel_analysts:
+            # Start with the first analyst
+            first_analyst = selected_analysts[0]
+            workflow.add_edge(START, f"{first_analyst.capitalize()} Analyst")
+
+            # Connect analysts in sequence
+            for i, analyst_type in enumerate(selected_analysts):
+                current_analyst = f"{analyst_type.capitalize()} Analyst"
+                current_tools = f"tools_{analyst_type}"
+                current_clear = f"Msg Clear {analyst_type.capitalize()}"
+
+                # Add conditional edges for current analyst
+                workflow.add_conditional_edges(
+                    current_analyst,
+                    getattr(self.conditional_logic, f"should_continue_{analyst_type}"),
+                    [current_tools, current_clear],
+                )
+                workflow.add_edge(current_tools, current_analyst)
+
+                # Connect to next analyst or to the debate entry if this is the last analyst
+                if i < len(selected_analysts) - 1:
+                    next_analyst = f"{selected_analysts[i+1].capitalize()} Analyst"
+                    workflow.add_edge(current_clear, next_analyst)
+                else:
+                    workflow.add_edge(current_clear, debate_entry)
 
         # Add remaining edges
+        if report_digest_enabled:
+            workflow.add_edge("Report Digest", "Bull Researcher")
         workflow.add_conditional_edges(
             "Bull Researcher",
             self.conditional_logic.should_continue_debate,
@@ -221,33 +307,129 @@ class GraphSetup:
             },
         )
         workflow.add_edge("Research Manager", "Trader")
-        workflow.add_edge("Trader", "Risky Analyst")
-        workflow.add_conditional_edges(
-            "Risky Analyst",
-            self.conditional_logic.should_continue_risk_analysis,
-            {
-                "Safe Analyst": "Safe Analyst",
-                "Risk Judge": "Risk Judge",
-            },
-        )
-        workflow.add_conditional_edges(
-            "Safe Analyst",
-            self.conditional_logic.should_continue_risk_analysis,
-            {
-                "Neutral Analyst": "Neutral Analyst",
-                "Risk Judge": "Risk Judge",
-            },
-        )
-        workflow.add_conditional_edges(
-            "Neutral Analyst",
-            self.conditional_logic.should_continue_risk_analysis,
-            {
-                "Risky Analyst": "Risky Analyst",
-                "Risk Judge": "Risk Judge",
-            },
-        )
+        if parallel_risk_debate:
+            workflow.add_edge("Trader", "Risk Debate Round")
+            workflow.add_conditional_edges(
+                "Risk Debate Round",
+                self.conditional_logic.should_continue_risk_round,
+                {
+                    "Risk Debate Round": "Risk Debate Round",
+                    "Risk Judge": "Risk Judge",
+                },
+            )
+        else:
+            workflow.add_edge("Trader", "Risky Analyst")
+            workflow.add_conditional_edges(
+                "Risky Analyst",
+                self.conditional_logic.should_continue_risk_analysis,
+                {
+                    "Safe Analyst": "Safe Analyst",
+                    "Risk Judge": "Risk Judge",
+                },
+            )
+            workflow.add_conditional_edges(
+                "Safe Analyst",
+                self.conditional_logic.should_continue_risk_analysis,
+                {
+                    "Neutral Analyst": "Neutral Analyst",
+                    "Risk Judge": "Risk Judge",
+                },
+            )
+            workflow.add_conditional_edges(
+                "Neutral Analyst",
+                self.conditional_logic.should_continue_risk_analysis,
+                {
+                    "Risky Analyst": "Risky Analyst",
+                    "Risk Judge": "Risk Judge",
+                },
+            )
 
         workflow.add_edge("Risk Judge", END)
 
         # Compile and return
         return workflow.compile()
+
+    def _add_node(self, graph: StateGraph, name: str, node):
+        """添加节点，节点每次执行记录为链路追踪 span"""
+        graph.add_node(name, _traced_node(name, node))
+
+    def _create_parallel_analyst_node(self, analyst_type: str, analyst_node, tool_node):
+        """
+        将分析师及其工具循环封装为独立子图
+
+        子图拥有自己的消息通道，分支之间互不可见；父图只接收该分析师的报告字段。
+        """
+        analyst_name = f"{analyst_type.capitalize()} Analyst"
+        tools_name = f"tools_{analyst_type}"
+        report_field = ANALYST_REPORT_FIELDS[analyst_type]
+
+        subgraph = StateGraph(AgentState)
+        self._add_node(subgraph, analyst_name, analyst_node)
+        self._add_node(subgraph, tools_name, tool_node)
+        subgraph.add_edge(START, analyst_name)
+        subgraph.add_conditional_edges(
+            analyst_name,
+            getattr(self.conditional_logic, f"should_continue_{analyst_type}"),
+            {
+                tools_name: tools_name,
+                f"Msg Clear {analyst_type.capitalize()}": END,
+            },
+        )
+        subgraph.add_edge(tools_name, analyst_name)
+        compiled = subgraph.compile()
+
+        def parallel_analyst_node(state, config: RunnableConfig):
+            branch_state = {key: value for key, value in state.items() if key != "messages"}
+            branch_state["messages"] = [("human", state["company_of_interest"])]
+
+            result = compiled.invoke(branch_state, config)
+            report = result.get(report_field, "")
+            logger.info(f"✅ [并行分析] {analyst_name} 完成，报告长度: {len(report)}")
+            return {report_field: report}
+
+        return parallel_analyst_node
+
+    def _create_concurrent_risk_round_node(self, risky_analyst, safe_analyst, neutral_analyst):
+        """
+        将一轮风险辩论中的激进、保守、中性分析师合并为一个节点
+
+        三位分析师基于同一份 risk_debate_state 快照并发发言（只依赖交易员计划和上一轮的发言），
+        完成后按 激进 -> 保守 -> 中性 的顺序合并发言和历史。
+        辩论历史在并发前压缩一次，三位分析师拿到的历史最多只有 RISK_DEBATE_KEEP_TURNS 段原文，不会各自再压缩。
+        """
+        speakers = [
+            ("risky", _traced_node("Risky Analyst", risky_analyst)),
+            ("safe", _traced_node("Safe Analyst", safe_analyst)),
+            ("neutral", _traced_node("Neutral Analyst", neutral_analyst)),
+        ]
+
+        def risk_debate_round_node(state) -> dict:
+            _, history_updates = compact_debate_history(
+                self.quick_thinking_llm, state["risk_debate_state"], keep_turns=RISK_DEBATE_KEEP_TURNS
+            )
+            snapshot = {**state["risk_debate_state"], **history_updates}
+            round_state = {**state, "risk_debate_state": snapshot}
+            with ThreadPoolExecutor(max_workers=len(speakers)) as executor:
+                # 复制上下文，发言中的 LLM 调用仍记录在当前 trace 下
+                futures = [(role, executor.submit(contextvars.copy_context().run, node, round_state))
+                           for role, node in speakers]
+                results = {role: future.result()["risk_debate_state"] for role, future in futures}
+
+            history = snapshot.get("history", "")
+            merged = {}
+            for role, _ in speakers:
+                argument = results[role][f"current_{role}_response"]
+                history += "\n" + argument
+                merged[f"{role}_history"] = results[role][f"{role}_history"]
+                merged[f"current_{role}_response"] = argument
+
+            merged.update({
+                "history": history,
+                **history_updates,
+                "latest_speaker": "Neutral",
+                "count": snapshot["count"] + len(speakers),
+            })
+            logger.info(f"🔀 [并行风险辩论] 第{merged['count'] // len(speakers)}轮完成")
+            return {"risk_debate_state": merged}
+
+        return risk_debate_round_node
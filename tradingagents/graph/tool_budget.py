@@ -0,0 +1,121 @@
+# TradingAgents/graph/tool_budget.py
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from tradingagents.utils.tracing import set_span_attributes
+
+# 导入统一日志系统
+from tradingagents.utils.logging_init import get_logger
+logger = get_logger("default")
+
+
+ANALYST_DISPLAY_NAMES = {
+    "market": "市场",
+    "social": "社交媒体情绪",
+    "news": "新闻",
+    "fundamentals": "基本面",
+}
+
+
+class AnalystToolBudget:
+    """单个分析师在一次分析中的工具调用次数和 token 预算（0 表示不限制）"""
+
+    def __init__(self, max_tool_calls: int = 0, max_tokens: int = 0):
+        self.max_tool_calls = max_tool_calls
+        self.max_tokens = max_tokens
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], analyst_type: str) -> "AnalystToolBudget":
+        """读取默认预算，analyst_budgets 中按分析师类型覆盖"""
+        override = (config.get("analyst_budgets") or {}).get(analyst_type, {})
+        return cls(
+            max_tool_calls=int(override.get("tool_calls", config.get("analyst_max_tool_calls", 0))),
+            max_tokens=int(override.get("tokens", config.get("analyst_max_tokens", 0))),
+        )
+
+    def exceeded(self, messages: List[BaseMessage], result: AIMessage) -> Optional[str]:
+        """
+        判断执行 result 中的工具调用是否超出预算
+
+        Returns:
+            超出原因，未超出时返回 None
+        """
+        calls, tokens, seen = _tool_usage(messages)
+        new_calls = result.tool_calls or []
+        tokens += _message_tokens(messages + [result], len(messages))
+
+        if self.max_tool_calls and calls + len(new_calls) > self.max_tool_calls:
+            return f"工具调用次数达到上限 {self.max_tool_calls}"
+        if self.max_tokens and tokens > self.max_tokens:
+            return f"token 用量 {tokens} 超过上限 {self.max_tokens}"
+        if new_calls and all(_call_key(call) in seen for call in new_calls):
+            return "重复调用相同参数的工具"
+        return None
+
+
+def _call_key(call: Dict[str, Any]) -> Tuple[str, str]:
+    return call.get("name", ""), json.dumps(call.get("args", {}), sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _message_tokens(messages: List[BaseMessage], index: int) -> int:
+    """第 index 条 AI 消息的 token 数：优先使用模型返回的 usage，没有时按 2 字符/token 估算"""
+    usage = getattr(messages[index], "usage_metadata", None)
+    if usage:
+        return usage.get("total_tokens") or usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+    return sum(len(str(m.content)) for m in messages[:index + 1]) // 2
+
+
+def _tool_usage(messages: List[BaseMessage]) -> Tuple[int, int, set]:
+    """当前消息中已发生的工具调用次数、token 用量和调用过的 (工具, 参数)"""
+    calls, tokens, seen = 0, 0, set()
+    for index, message in enumerate(messages):
+        if not isinstance(message, AIMessage):
+            continue
+        tokens += _message_tokens(messages, index)
+        for call in message.tool_calls or []:
+            calls += 1
+            seen.add(_call_key(call))
+    return calls, tokens, seen
+
+
+def _finalize_report(llm, analyst_type: str, state: Dict[str, Any], reason: str) -> AIMessage:
+    """不再调用工具，基于已获取的数据直接生成最终报告"""
+    name = ANALYST_DISPLAY_NAMES.get(analyst_type, analyst_type)
+    instruction = HumanMessage(content=(
+        f"{reason}，不能再调用工具。请作为{name}分析师，基于以上已获取的数据，"
+        f"用中文为{state['company_of_interest']}（分析日期 {state['trade_date']}）撰写完整的最终分析报告。"
+    ))
+    try:
+        response = llm.invoke(list(state["messages"]) + [instruction])
+        return AIMessage(content=response.content)
+    except Exception as e:
+        logger.error(f"❌ [工具预算] {name}分析师生成最终报告失败: {e}")
+        gathered = [str(m.content)[:2000] for m in state["messages"] if isinstance(m, ToolMessage)]
+        return AIMessage(content=f"⚠️ {name}分析因{reason}提前结束，以下为已获取的数据：\n\n" + "\n\n".join(gathered))
+
+
+def create_budgeted_analyst(analyst_type: str, analyst_node, llm, budget: AnalystToolBudget, report_field: str):
+    """
+    包装分析师节点：本轮工具调用会超出预算或只是重复已有调用时，不再进入工具节点，
+    改为直接生成最终报告（返回不含 tool_calls 的消息，条件边随之结束循环）
+    """
+    def budgeted_analyst_node(state):
+        output = analyst_node(state)
+        new_messages = output.get("messages") or []
+        result = new_messages[-1] if new_messages else None
+        if not isinstance(result, AIMessage) or not result.tool_calls:
+            return output
+
+        reason = budget.exceeded(list(state["messages"]), result)
+        if reason is None:
+            return output
+
+        logger.warning(f"⚠️ [工具预算] {analyst_type} 分析师{reason}，停止调用工具并生成最终报告")
+        set_span_attributes(**{"analyst.budget_exhausted": reason})
+        final_message = _finalize_report(llm, analyst_type, state, reason)
+        return {"messages": [final_message], report_field: final_message.content}
+
+    return budgeted_analyst_node
@@ -11,11 +11,17 @@ from langchain_anthropic import ChatAnthropic
 from langchain_google_genai import ChatGoogleGenerativeAI
 from tradingagents.llm_adapters import ChatDashScope, ChatDashScopeOpenAI
 
+from langchain_core.tools import BaseTool, StructuredTool
 from langgraph.prebuilt import ToolNode
 
 from tradingagents.agents import *
 from tradingagents.default_config import DEFAULT_CONFIG
 from tradingagents.agents.utils.memory import FinancialSituationMemory
+from tradingagents.utils.analysis_events import (
+    ANALYSIS_END,
+    AnalysisEventCallbackHandler,
+    get_analysis_event_bus,
+)
 
 # 导入统一日志系统
 from tradingagents.utils.logging_init import get_logger
@@ -29,6 +35,8 @@ from tradingagents.agents.utils.agent_states import (
     RiskDebateState,
 )
 from tradingagents.dataflows.interface import set_config
+from tradingagents.dataflows.data_context import analysis_data_context, memoize_in_context
+from tradingagents.utils.tracing import start_trace, traced
 
 from .conditional_logic import ConditionalLogic
 from .setup import GraphSetup
@@ -37,6 +45,23 @@ from .reflection import Reflector
 from .signal_processing import SignalProcessor
 
 
+def _instrument_tools(tools: List[BaseTool]) -> List[BaseTool]:
+    """
+    复制工具（名称和参数模式不变）：每次调用记录为链路追踪 span，
+    同一次分析内相同 (工具, 参数) 的调用直接返回已有结果
+    """
+    return [
+        StructuredTool.from_function(
+            func=traced(f"tool {t.name}")(memoize_in_context(t.func)),
+            name=t.name,
+            description=t.description,
+            args_schema=t.args_schema,
+            return_direct=t.return_direct,
+        )
+        for t in tools
+    ]
+
+
 class TradingAgentsGraph:
     """Main class that orchestrates the trading agents framework."""
 
@@ -180,6 +205,7 @@ class TradingAgentsGraph:
         # State tracking
         self.curr_state = None
         self.ticker = None
+        self.last_trace = None  # 最近一次 propagate 的链路追踪
         self.log_states_dict = {}  # date to full state dict
 
         # Set up the graph
@@ -189,7 +215,7 @@ class TradingAgentsGraph:
         """Create tool nodes for different data sources."""
         return {
             "market": ToolNode(
-                [
+                _instrument_tools([
                     # 统一工具
                     self.toolkit.get_stock_market_data_unified,
                     # online tools
@@ -198,18 +224,18 @@ class TradingAgentsGraph:
                     # offline tools
                     self.toolkit.get_YFin_data,
                     self.toolkit.get_stockstats_indicators_report,
-                ]
+                ])
             ),
             "social": ToolNode(
-                [
+                _instrument_tools([
                     # online tools
                     self.toolkit.get_stock_news_openai,
                     # offline tools
                     self.toolkit.get_reddit_stock_info,
-                ]
+                ])
             ),
             "news": ToolNode(
-                [
+                _instrument_tools([
                     # online tools
                     self.toolkit.get_realtime_stock_news,
                     self.toolkit.get_company_news,
@@ -219,10 +245,10 @@ class TradingAgentsGraph:
                     # offline tools
                     self.toolkit.get_finnhub_news,
                     self.toolkit.get_reddit_news,
-                ]
+                ])
             ),
             "fundamentals": ToolNode(
-                [
+                _instrument_tools([
                     # 统一工具
                     self.toolkit.get_stock_fundamentals_unified,
                     # offline tools
@@ -231,12 +257,17 @@ class TradingAgentsGraph:
                     self.toolkit.get_simfin_balance_sheet,
                     self.toolkit.get_simfin_cashflow,
                     self.toolkit.get_simfin_income_stmt,
-                ]
+                    self.toolkit.get_simfin_financial_statements,
+                ])
             ),
         }
 
-    def propagate(self, company_name, trade_date):
-        """Run the trading agents graph for a company on a specific date."""
+    def propagate(self, company_name, trade_date, analysis_id=None):
+        """Run the trading agents graph for a company on a specific date.
+
+        If analysis_id is given, node start/finish events (and LLM token deltas when
+        config["stream_llm_tokens"] is enabled) are published on the analysis event bus.
+        """
 
         # 添加详细的接收日志
         logger.debug(f"🔍 [GRAPH DEBUG] ===== TradingAgentsGraph.propagate 接收参数 =====")
@@ -255,6 +286,47 @@ class TradingAgentsGraph:
         logger.debug(f"🔍 [GRAPH DEBUG] 初始状态中的trade_date: '{init_agent_state.get('trade_date', 'NOT_FOUND')}'")
         args = self.propagator.get_graph_args()
 
+        if analysis_id:
+            args["config"]["callbacks"] = [AnalysisEventCallbackHandler(analysis_id)]
+            if self.config.get("stream_llm_tokens", False):
+                # messages 模式让节点内的模型调用走流式接口，token 增量经回调发布
+                args["stream_mode"] = ["values", "messages"]
+
+        try:
+            # 同一次分析内（含 Web 端的预获取阶段）相同的数据请求只访问一次上游
+            with start_trace(f"analysis {company_name} {trade_date}", **{"stock.symbol": company_name}) as trace, \
+                    analysis_data_context(f"{company_name} {trade_date}"):
+                self.last_trace = trace
+                final_state = self._run_graph(init_agent_state, args)
+        except Exception as e:
+            if analysis_id:
+                get_analysis_event_bus().publish(analysis_id, ANALYSIS_END, status="failed", error=str(e))
+            raise
+        if analysis_id:
+            get_analysis_event_bus().publish(analysis_id, ANALYSIS_END, status="completed")
+
+        # Store current state for reflection
+        self.curr_state = final_state
+
+        # Log state
+        self._log_state(trade_date, final_state)
+
+        # Return decision and processed signal
+        return final_state, self.process_signal(final_state["final_trade_decision"], company_name)
+
+    def _run_graph(self, init_agent_state, args):
+        """Execute the graph and return the final state."""
+        if isinstance(args["stream_mode"], list):
+            # Token streaming mode: keep the latest full state from the "values" stream
+            final_state = None
+            for mode, chunk in self.graph.stream(init_agent_state, **args):
+                if mode != "values":
+                    continue
+                final_state = chunk
+                if self.debug and len(chunk["messages"]) > 0:
+                    chunk["messages"][-1].pretty_print()
+            return final_state
+
         if self.debug:
             # Debug mode with tracing
             trace = []
@@ -265,19 +337,10 @@ class TradingAgentsGraph:
                     chunk["messages"][-1].pretty_print()
                     trace.append(chunk)
 
-            final_state = trace[-1]
-        else:
-            # Standard mode without tracing
-            final_state = self.graph.invoke(init_agent_state, **args)
+            return trace[-1]
 
-        # Store current state for reflection
-        self.curr_state = final_state
-
-        # Log state
-        self._log_state(trade_date, final_state)
-
-        # Return decision and processed signal
-        return final_state, self.process_signal(final_state["final_trade_decision"], company_name)
+        # Standard mode without tracing
+        return self.graph.invoke(init_agent_state, **args)
 
     def _log_state(self, trade_date, final_state):
         """Log the final state to a JSON file."""
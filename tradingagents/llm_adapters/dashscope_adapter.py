@@ -5,10 +5,13 @@
 
 import os
 import json
+import asyncio
+import weakref
 from typing import Any, Dict, List, Optional, Union, Iterator, AsyncIterator, Sequence
+import httpx
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, SystemMessage
-from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.messages import BaseMessage, AIMessage, AIMessageChunk, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
 from langchain_core.callbacks.manager import CallbackManagerForLLMRun, AsyncCallbackManagerForLLMRun
 from langchain_core.tools import BaseTool
 from langchain_core.utils.function_calling import convert_to_openai_tool
@@ -16,12 +19,39 @@ from pydantic import Field, SecretStr
 import dashscope
 from dashscope import Generation
 from ..config.config_manager import token_tracker
+from ..utils.tracing import traced_llm_generate
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
 logger = get_logger('agents')
 
 
+# DashScope 文本生成 HTTP 接口（异步路径直接调用，不经过同步 SDK）
+DASHSCOPE_GENERATION_PATH = "/services/aigc/text-generation/generation"
+
+# 记录用的参数，不发送给 API
+_TRACKING_KWARGS = ("session_id", "analysis_type")
+
+# 每个事件循环一个连接池（httpx.AsyncClient 不能跨事件循环使用）
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    """获取当前事件循环共享的异步 HTTP 客户端"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=os.getenv("DASHSCOPE_HTTP_BASE_URL", "https://dashscope.aliyuncs.com/api/v1"),
+            timeout=httpx.Timeout(float(os.getenv("DASHSCOPE_TIMEOUT", "120")), connect=10.0),
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("DASHSCOPE_MAX_CONNECTIONS", "20")),
+                max_keepalive_connections=int(os.getenv("DASHSCOPE_MAX_KEEPALIVE", "10")),
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
 
 class ChatDashScope(BaseChatModel):
     """阿里百炼大模型的 LangChain 适配器"""
@@ -93,97 +123,158 @@ class ChatDashScope(BaseChatModel):
         
         return dashscope_messages
     
-    def _generate(
-        self,
-        messages: List[BaseMessage],
-        stop: Optional[List[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
-        **kwargs: Any,
-    ) -> ChatResult:
-        """生成聊天回复"""
-        
-        # 转换消息格式
-        dashscope_messages = self._convert_messages_to_dashscope_format(messages)
-        
-        # 准备请求参数
+    def _build_request_params(
+        self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """准备 Generation.call 参数"""
         request_params = {
             "model": self.model,
-            "messages": dashscope_messages,
+            "messages": self._convert_messages_to_dashscope_format(messages),
             "result_format": "message",
             "temperature": self.temperature,
             "max_tokens": self.max_tokens,
             "top_p": self.top_p,
         }
-        
+
         # 添加停止词
         if stop:
             request_params["stop"] = stop
-        
+
         # 合并额外参数
         request_params.update(kwargs)
-        
+        return request_params
+
+    def _build_http_payload(
+        self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """准备 HTTP 接口请求体（input/parameters 结构）"""
+        params = self._build_request_params(
+            messages, stop, {k: v for k, v in kwargs.items() if k not in _TRACKING_KWARGS}
+        )
+        model = params.pop("model")
+        dashscope_messages = params.pop("messages")
+        return {"model": model, "input": {"messages": dashscope_messages}, "parameters": params}
+
+    def _http_headers(self, stream: bool = False) -> Dict[str, str]:
+        api_key = self.api_key.get_secret_value() if isinstance(self.api_key, SecretStr) else self.api_key
+        headers = {
+            "Authorization": f"Bearer {api_key or dashscope.api_key}",
+            "Content-Type": "application/json",
+        }
+        if stream:
+            headers["Accept"] = "text/event-stream"
+            headers["X-DashScope-SSE"] = "enable"
+        return headers
+
+    @staticmethod
+    def _extract_usage_tokens(usage: Any) -> tuple:
+        """从 usage（SDK 对象或 dict）中提取输入/输出 token 数"""
+        if not usage:
+            return 0, 0
+
+        def read(name):
+            if isinstance(usage, dict):
+                return usage.get(name)
+            return getattr(usage, name, None)
+
+        input_tokens = read('input_tokens') or 0
+        output_tokens = read('output_tokens') or 0
+        if not output_tokens and read('total_tokens'):
+            # 估算输入和输出token（如果没有分别提供）
+            # 简单估算：假设输入占30%，输出占70%
+            total_tokens = read('total_tokens')
+            input_tokens = int(total_tokens * 0.3)
+            output_tokens = int(total_tokens * 0.7)
+        return input_tokens, output_tokens
+
+    def _track_token_usage(self, messages: List[BaseMessage], usage: Any, kwargs: Dict[str, Any]):
+        """记录token使用量（失败不影响主要功能）"""
+        input_tokens, output_tokens = self._extract_usage_tokens(usage)
+        if input_tokens <= 0 and output_tokens <= 0:
+            return
+        try:
+            # 生成会话ID（如果没有提供）
+            session_id = kwargs.get('session_id', f"dashscope_{hash(str(messages))%10000}")
+            analysis_type = kwargs.get('analysis_type', 'stock_analysis')
+
+            # 使用TokenTracker记录使用量
+            token_tracker.track_usage(
+                provider="dashscope",
+                model_name=self.model,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                session_id=session_id,
+                analysis_type=analysis_type
+            )
+        except Exception as track_error:
+            logger.info(f"Token tracking failed: {track_error}")
+
+    @traced_llm_generate
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """生成聊天回复"""
+        request_params = self._build_request_params(messages, stop, kwargs)
+
         try:
             # 调用 DashScope API
             response = Generation.call(**request_params)
-            
+
             if response.status_code == 200:
                 # 解析响应
                 output = response.output
                 message_content = output.choices[0].message.content
-                
-                # 提取token使用量信息
-                input_tokens = 0
-                output_tokens = 0
-                
-                # DashScope API响应中包含usage信息
-                if hasattr(response, 'usage') and response.usage:
-                    usage = response.usage
-                    # 根据API文档，usage可能包含input_tokens和output_tokens
-                    if hasattr(usage, 'input_tokens'):
-                        input_tokens = usage.input_tokens
-                    if hasattr(usage, 'output_tokens'):
-                        output_tokens = usage.output_tokens
-                    # 有些情况下可能是total_tokens
-                    elif hasattr(usage, 'total_tokens'):
-                        # 估算输入和输出token（如果没有分别提供）
-                        total_tokens = usage.total_tokens
-                        # 简单估算：假设输入占30%，输出占70%
-                        input_tokens = int(total_tokens * 0.3)
-                        output_tokens = int(total_tokens * 0.7)
-                
+
                 # 记录token使用量
-                if input_tokens > 0 or output_tokens > 0:
-                    try:
-                        # 生成会话ID（如果没有提供）
-                        session_id = kwargs.get('session_id', f"dashscope_{hash(str(messages))%10000}")
-                        analysis_type = kwargs.get('analysis_type', 'stock_analysis')
-                        
-                        # 使用TokenTracker记录使用量
-                        token_tracker.track_usage(
-                            provider="dashscope",
-                            model_name=self.model,
-                            input_tokens=input_tokens,
-                            output_tokens=output_tokens,
-                            session_id=session_id,
-                            analysis_type=analysis_type
-                        )
-                    except Exception as track_error:
-                        # 记录失败不应该影响主要功能
-                        logger.info(f"Token tracking failed: {track_error}")
-                
+                self._track_token_usage(messages, getattr(response, 'usage', None), kwargs)
+
                 # 创建 AI 消息
                 ai_message = AIMessage(content=message_content)
-                
+
                 # 创建生成结果
                 generation = ChatGeneration(message=ai_message)
-                
+
                 return ChatResult(generations=[generation])
             else:
                 raise Exception(f"DashScope API error: {response.code} - {response.message}")
-                
+
         except Exception as e:
             raise Exception(f"Error calling DashScope API: {str(e)}")
-    
+
+    @traced_llm_generate
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        """流式生成（增量输出），结束后记录token使用量"""
+        request_params = self._build_request_params(messages, stop, kwargs)
+        request_params.update({"stream": True, "incremental_output": True})
+
+        usage = None
+        for response in Generation.call(**request_params):
+            if response.status_code != 200:
+                raise Exception(f"Error calling DashScope API: {response.code} - {response.message}")
+
+            usage = getattr(response, 'usage', None) or usage
+            delta = response.output.choices[0].message.content
+            if not delta:
+                continue
+
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=delta))
+            if run_manager:
+                run_manager.on_llm_new_token(delta, chunk=chunk)
+            yield chunk
+
+        self._track_token_usage(messages, usage, kwargs)
+
+    @traced_llm_generate
     async def _agenerate(
         self,
         messages: List[BaseMessage],
@@ -191,10 +282,64 @@ class ChatDashScope(BaseChatModel):
         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> ChatResult:
-        """异步生成聊天回复"""
-        # 目前使用同步方法，后续可以实现真正的异步
-        return self._generate(messages, stop, run_manager, **kwargs)
-    
+        """异步生成聊天回复（原生异步 HTTP 调用，共享连接池，不阻塞事件循环）"""
+        payload = self._build_http_payload(messages, stop, kwargs)
+
+        try:
+            response = await _get_async_client().post(
+                DASHSCOPE_GENERATION_PATH, json=payload, headers=self._http_headers()
+            )
+            data = response.json()
+            if response.status_code != 200:
+                raise Exception(f"DashScope API error: {data.get('code')} - {data.get('message')}")
+
+            message_content = data["output"]["choices"][0]["message"]["content"]
+            self._track_token_usage(messages, data.get("usage"), kwargs)
+
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=message_content))])
+
+        except Exception as e:
+            raise Exception(f"Error calling DashScope API: {str(e)}")
+
+    @traced_llm_generate
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        """异步流式生成（SSE，增量输出）"""
+        payload = self._build_http_payload(messages, stop, kwargs)
+        payload["parameters"]["incremental_output"] = True
+
+        usage = None
+        async with _get_async_client().stream(
+            "POST", DASHSCOPE_GENERATION_PATH, json=payload, headers=self._http_headers(stream=True)
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                raise Exception(f"Error calling DashScope API: {response.status_code} - {body.decode('utf-8', 'ignore')}")
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                event = json.loads(line[len("data:"):].strip())
+                if "output" not in event:
+                    raise Exception(f"DashScope API error: {event.get('code')} - {event.get('message')}")
+
+                usage = event.get("usage") or usage
+                delta = event["output"]["choices"][0]["message"].get("content", "")
+                if not delta:
+                    continue
+
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=delta))
+                if run_manager:
+                    await run_manager.on_llm_new_token(delta, chunk=chunk)
+                yield chunk
+
+        self._track_token_usage(messages, usage, kwargs)
+
     def bind_tools(
         self,
         tools: Sequence[Union[Dict[str, Any], type, BaseTool]],
@@ -5,12 +5,14 @@
 """
 
 import os
-from typing import Any, Dict, List, Optional, Union, Sequence
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union, Sequence
 from langchain_openai import ChatOpenAI
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
 from langchain_core.tools import BaseTool
 from langchain_core.utils.function_calling import convert_to_openai_tool
 from pydantic import Field, SecretStr
 from ..config.config_manager import token_tracker
+from ..utils.tracing import traced_llm_generate
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
@@ -51,41 +53,66 @@ class ChatDashScopeOpenAI(ChatOpenAI):
         api_base = getattr(self, 'base_url', None) or getattr(self, 'openai_api_base', None) or kwargs.get('base_url', 'unknown')
         logger.info(f"   API Base: {api_base}")
     
+    @traced_llm_generate
     def _generate(self, *args, **kwargs):
         """重写生成方法，添加 token 使用量追踪"""
         
         # 调用父类的生成方法
         result = super()._generate(*args, **kwargs)
         
-        # 尝试追踪 token 使用量
+        # 从结果中提取 token 使用信息
+        if hasattr(result, 'llm_output') and result.llm_output:
+            token_usage = result.llm_output.get('token_usage', {})
+            self._record_token_usage(
+                token_usage.get('prompt_tokens', 0), token_usage.get('completion_tokens', 0), args, kwargs
+            )
+        
+        return result
+
+    @traced_llm_generate
+    def _stream(self, *args, **kwargs) -> Iterator[ChatGenerationChunk]:
+        """重写流式生成方法，流结束后按最后一个分块中的 usage 追踪 token 使用量"""
+        kwargs.setdefault("stream_usage", True)
+
+        usage = None
+        for chunk in super()._stream(*args, **kwargs):
+            usage = getattr(chunk.message, "usage_metadata", None) or usage
+            yield chunk
+
+        if usage:
+            self._record_token_usage(usage.get("input_tokens", 0), usage.get("output_tokens", 0), args, kwargs)
+
+    @traced_llm_generate
+    async def _agenerate(self, *args, **kwargs) -> ChatResult:
+        """异步生成（记录链路追踪 span）"""
+        return await super()._agenerate(*args, **kwargs)
+
+    @traced_llm_generate
+    async def _astream(self, *args, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        """异步流式生成（记录链路追踪 span）"""
+        async for chunk in super()._astream(*args, **kwargs):
+            yield chunk
+
+    def _record_token_usage(self, input_tokens: int, output_tokens: int, args, kwargs):
+        """使用 TokenTracker 记录使用量（追踪失败不影响主要功能）"""
         try:
-            # 从结果中提取 token 使用信息
-            if hasattr(result, 'llm_output') and result.llm_output:
-                token_usage = result.llm_output.get('token_usage', {})
-                
-                input_tokens = token_usage.get('prompt_tokens', 0)
-                output_tokens = token_usage.get('completion_tokens', 0)
+            if input_tokens > 0 or output_tokens > 0:
+                # 生成会话ID
+                session_id = kwargs.get('session_id', f"dashscope_openai_{hash(str(args))%10000}")
+                analysis_type = kwargs.get('analysis_type', 'stock_analysis')
                 
-                if input_tokens > 0 or output_tokens > 0:
-                    # 生成会话ID
-                    session_id = kwargs.get('session_id', f"dashscope_openai_{hash(str(args))%10000}")
-                    analysis_type = kwargs.get('analysis_type', 'stock_analysis')
-                    
-                    # 使用 TokenTracker 记录使用量
-                    token_tracker.track_usage(
-                        provider="dashscope",
-                        model_name=self.model_name,
-                        input_tokens=input_tokens,
-                        output_tokens=output_tokens,
-                        session_id=session_id,
-                        analysis_type=analysis_type
-                    )
+                token_tracker.track_usage(
+                    provider="dashscope",
+                    model_name=self.model_name,
+                    input_tokens=input_tokens,
+                    output_tokens=output_tokens,
+                    session_id=session_id,
+                    analysis_type=analysis_type
+                )
                     
         except Exception as track_error:
             # token 追踪失败不应该影响主要功能
             logger.error(f"⚠️ Token 追踪失败: {track_error}")
-        
-        return result
     
     def bind_tools(
         self,
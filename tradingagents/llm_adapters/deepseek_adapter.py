@@ -4,9 +4,9 @@ DeepSeek LLM适配器，支持Token使用统计
 
 import os
 import time
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union
 from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, SystemMessage
-from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
 from langchain_openai import ChatOpenAI
 from langchain_core.callbacks import CallbackManagerForLLMRun
 
@@ -15,6 +15,7 @@ from tradingagents.utils.logging_init import setup_llm_logging
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger, get_logger_manager
+from tradingagents.utils.tracing import traced_llm_generate
 logger = get_logger('agents')
 logger = setup_llm_logging()
 
@@ -74,6 +75,7 @@ class ChatDeepSeek(ChatOpenAI):
         
         self.model_name = model
         
+    @traced_llm_generate
     def _generate(
         self,
         messages: List[BaseMessage],
@@ -159,6 +161,22 @@ class ChatDeepSeek(ChatOpenAI):
             logger.error(f"❌ [DeepSeek] 调用失败: {e}", exc_info=True)
             raise
     
+    @traced_llm_generate
+    def _stream(self, *args, **kwargs) -> Iterator[ChatGenerationChunk]:
+        """流式生成（记录链路追踪 span）"""
+        yield from super()._stream(*args, **kwargs)
+
+    @traced_llm_generate
+    async def _agenerate(self, *args, **kwargs) -> ChatResult:
+        """异步生成（记录链路追踪 span）"""
+        return await super()._agenerate(*args, **kwargs)
+
+    @traced_llm_generate
+    async def _astream(self, *args, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        """异步流式生成（记录链路追踪 span）"""
+        async for chunk in super()._astream(*args, **kwargs):
+            yield chunk
+
     def _estimate_input_tokens(self, messages: List[BaseMessage]) -> int:
         """
         估算输入token数量
@@ -5,9 +5,9 @@ OpenAI兼容适配器基类
 
 import os
 import time
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union
 from langchain_core.messages import BaseMessage
-from langchain_core.outputs import ChatResult
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
 from langchain_openai import ChatOpenAI
 from langchain_core.callbacks import CallbackManagerForLLMRun
 
@@ -16,6 +16,7 @@ from tradingagents.utils.logging_init import setup_llm_logging
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger, get_logger_manager
+from tradingagents.utils.tracing import traced_llm_generate
 logger = get_logger('agents')
 logger = setup_llm_logging()
 
@@ -101,6 +102,7 @@ class OpenAICompatibleBase(ChatOpenAI):
         logger.info(f"   模型: {model}")
         logger.info(f"   API Base: {base_url}")
     
+    @traced_llm_generate
     def _generate(
         self,
         messages: List[BaseMessage],
@@ -127,6 +129,44 @@ class OpenAICompatibleBase(ChatOpenAI):
         
         return result
     
+    @traced_llm_generate
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        """
+        流式生成聊天响应，流结束后按最后一个分块中的 usage 记录token使用量
+        """
+        start_time = time.time()
+        kwargs.setdefault("stream_usage", True)
+
+        usage = None
+        for chunk in super()._stream(messages, stop, run_manager, **kwargs):
+            usage = getattr(chunk.message, "usage_metadata", None) or usage
+            yield chunk
+
+        if TOKEN_TRACKING_ENABLED and usage:
+            try:
+                self._record_token_usage(
+                    usage.get("input_tokens", 0), usage.get("output_tokens", 0), kwargs, start_time
+                )
+            except Exception as e:
+                logger.error(f"⚠️ {self.provider_name} Token追踪失败: {e}", exc_info=True)
+
+    @traced_llm_generate
+    async def _agenerate(self, *args, **kwargs) -> ChatResult:
+        """异步生成（记录链路追踪 span）"""
+        return await super()._agenerate(*args, **kwargs)
+
+    @traced_llm_generate
+    async def _astream(self, *args, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        """异步流式生成（记录链路追踪 span）"""
+        async for chunk in super()._astream(*args, **kwargs):
+            yield chunk
+
     def _track_token_usage(self, result: ChatResult, kwargs: Dict, start_time: float):
         """追踪token使用量"""
         
@@ -136,37 +176,40 @@ class OpenAICompatibleBase(ChatOpenAI):
             
             input_tokens = token_usage.get('prompt_tokens', 0)
             output_tokens = token_usage.get('completion_tokens', 0)
+            self._record_token_usage(input_tokens, output_tokens, kwargs, start_time)
+
+    def _record_token_usage(self, input_tokens: int, output_tokens: int, kwargs: Dict, start_time: float):
+        """记录一次调用的token使用量和成本"""
+        if input_tokens > 0 or output_tokens > 0:
+            # 生成会话ID
+            session_id = kwargs.get('session_id', f"{self.provider_name}_{hash(str(kwargs))%10000}")
+            analysis_type = kwargs.get('analysis_type', 'stock_analysis')
             
-            if input_tokens > 0 or output_tokens > 0:
-                # 生成会话ID
-                session_id = kwargs.get('session_id', f"{self.provider_name}_{hash(str(kwargs))%10000}")
-                analysis_type = kwargs.get('analysis_type', 'stock_analysis')
-                
-                # 记录使用量
-                token_tracker.track_usage(
-                    provider=self.provider_name,
-                    model_name=self.model_name,
-                    input_tokens=input_tokens,
-                    output_tokens=output_tokens,
-                    session_id=session_id,
-                    analysis_type=analysis_type
-                )
-                
-                # 计算成本
-                cost = token_tracker.calculate_cost(
-                    provider=self.provider_name,
-                    model_name=self.model_name,
-                    input_tokens=input_tokens,
-                    output_tokens=output_tokens
-                )
-                
-                # 使用统一日志管理器记录Token使用
-                logger_manager = get_logger_manager()
-                logger_manager.log_token_usage(
-                    logger, self.provider_name, self.model_name,
-                    input_tokens, output_tokens, cost,
-                    session_id
+            # 记录使用量（记录中已包含计算好的成本）
+            usage_record = token_tracker.track_usage(
+                provider=self.provider_name,
+                model_name=self.model_name,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                session_id=session_id,
+                analysis_type=analysis_type
+            )
+            
+            # 未启用成本跟踪时才单独计算成本
+            if usage_record is not None:
+                cost = usage_record.cost
+            else:
+                cost = token_tracker.estimate_cost(
+                    self.provider_name, self.model_name, input_tokens, output_tokens
                 )
+            
+            # 使用统一日志管理器记录Token使用
+            logger_manager = get_logger_manager()
+            logger_manager.log_token_usage(
+                logger, self.provider_name, self.model_name,
+                input_tokens, output_tokens, cost,
+                session_id
+            )
 
 
 class ChatDeepSeekOpenAI(OpenAICompatibleBase):
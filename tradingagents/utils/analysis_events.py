@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+分析过程事件流
+将图节点的开始/结束和 LLM 的 token 增量发布到订阅通道（进程内队列，Redis 可用时同时走 Redis pub/sub），
+前端可以边生成边渲染部分报告，而不必等节点结束或从日志里猜进度。
+"""
+
+import json
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# 导入日志模块
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('agents')
+
+
+REDIS_CHANNEL_PREFIX = "analysis_events:"
+
+# 事件类型
+NODE_START = "node_start"
+NODE_END = "node_end"
+TOKEN = "token"
+ANALYSIS_END = "analysis_end"
+
+
+class EventSubscription:
+    """单个订阅者的事件队列，队列满时丢弃最旧的事件"""
+
+    def __init__(self, bus: "AnalysisEventBus", analysis_id: str, max_queue: int):
+        self.bus = bus
+        self.analysis_id = analysis_id
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self.closed = False
+
+    def _put(self, event: Dict[str, Any]):
+        while True:
+            try:
+                self._queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """阻塞读取下一个事件，超时返回 None"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """取出当前已到达的全部事件（不阻塞）"""
+        events = []
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """持续迭代事件，直到收到分析结束事件或订阅关闭"""
+        while not self.closed:
+            event = self.get(timeout=1.0)
+            if event is None:
+                continue
+            yield event
+            if event.get("type") == ANALYSIS_END:
+                return
+
+    def close(self):
+        self.closed = True
+        self.bus.unsubscribe(self)
+
+
+class AnalysisEventBus:
+    """按分析ID分发事件的发布/订阅通道"""
+
+    def __init__(self, max_queue: int = 10000, use_redis: bool = True):
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, List[EventSubscription]] = {}
+        self._lock = threading.Lock()
+
+        self._redis = None
+        if use_redis:
+            try:
+                from tradingagents.config.database_manager import get_database_manager
+                self._redis = get_database_manager().get_redis_client()
+            except Exception as e:
+                logger.debug(f"Redis不可用，分析事件只在进程内分发: {e}")
+
+    def subscribe(self, analysis_id: str) -> EventSubscription:
+        """订阅某次分析的事件（进程内）"""
+        subscription = EventSubscription(self, analysis_id, self.max_queue)
+        with self._lock:
+            self._subscribers.setdefault(analysis_id, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: EventSubscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.analysis_id, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.analysis_id, None)
+
+    def publish(self, analysis_id: str, event_type: str, **payload):
+        """发布事件，失败不影响分析流程"""
+        event = {"analysis_id": analysis_id, "type": event_type, "ts": time.time(), **payload}
+
+        with self._lock:
+            subscribers = list(self._subscribers.get(analysis_id, ()))
+        for subscription in subscribers:
+            subscription._put(event)
+
+        if self._redis is not None:
+            try:
+                self._redis.publish(REDIS_CHANNEL_PREFIX + analysis_id, json.dumps(event, ensure_ascii=False))
+            except Exception as e:
+                logger.debug(f"Redis发布分析事件失败: {e}")
+
+    def listen_redis(self, analysis_id: str, timeout: float = 1.0) -> Iterator[Dict[str, Any]]:
+        """跨进程订阅（Redis pub/sub），直到收到分析结束事件"""
+        if self._redis is None:
+            raise RuntimeError("Redis不可用，无法跨进程订阅分析事件")
+
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(REDIS_CHANNEL_PREFIX + analysis_id)
+        try:
+            while True:
+                message = pubsub.get_message(timeout=timeout)
+                if not message:
+                    continue
+                data = message["data"]
+                event = json.loads(data.decode("utf-8") if isinstance(data, bytes) else data)
+                yield event
+                if event.get("type") == ANALYSIS_END:
+                    return
+        finally:
+            pubsub.close()
+
+
+class AnalysisEventCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain 回调处理器：把 LangGraph 节点的开始/结束和 LLM token 增量转为分析事件
+
+    节点运行通过 metadata 中的 langgraph_node 识别，LLM 调用归属到所在的节点。
+    """
+
+    def __init__(self, analysis_id: str, bus: "AnalysisEventBus" = None):
+        self.analysis_id = analysis_id
+        self.bus = bus or get_analysis_event_bus()
+        self._node_runs: Dict[UUID, str] = {}
+        self._llm_nodes: Dict[UUID, str] = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                       tags=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        name = kwargs.get("name") or (serialized or {}).get("name")
+        if node and name == node:
+            self._node_runs[run_id] = node
+            self.bus.publish(self.analysis_id, NODE_START, node=node)
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs):
+        node = self._node_runs.pop(run_id, None)
+        if node:
+            self.bus.publish(self.analysis_id, NODE_END, node=node)
+
+    def on_chain_error(self, error, *, run_id: UUID, **kwargs):
+        node = self._node_runs.pop(run_id, None)
+        if node:
+            self.bus.publish(self.analysis_id, NODE_END, node=node, error=str(error))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs):
+        self._llm_nodes[run_id] = (metadata or {}).get("langgraph_node", "")
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs):
+        if token:
+            self.bus.publish(self.analysis_id, TOKEN, node=self._llm_nodes.get(run_id, ""), delta=token)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        self._llm_nodes.pop(run_id, None)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._llm_nodes.pop(run_id, None)
+
+
+class PartialReportBuffer:
+    """按节点累积 token 增量，供界面渲染生成中的部分报告"""
+
+    def __init__(self):
+        self.reports: Dict[str, str] = {}
+        self.running_nodes: List[str] = []
+        self.finished_nodes: List[str] = []
+        self.completed = False
+
+    def apply(self, event: Dict[str, Any]):
+        event_type = event.get("type")
+        node = event.get("node", "")
+        if event_type == NODE_START:
+            if node not in self.running_nodes:
+                self.running_nodes.append(node)
+            # 节点重新执行（如工具循环后再次调用模型）时从头累积
+            self.reports[node] = ""
+        elif event_type == TOKEN:
+            self.reports[node] = self.reports.get(node, "") + event.get("delta", "")
+        elif event_type == NODE_END:
+            if node in self.running_nodes:
+                self.running_nodes.remove(node)
+            if node not in self.finished_nodes:
+                self.finished_nodes.append(node)
+        elif event_type == ANALYSIS_END:
+            self.completed = True
+
+
+# 全局事件通道实例
+_analysis_event_bus = None
+_analysis_event_bus_lock = threading.Lock()
+
+def get_analysis_event_bus() -> AnalysisEventBus:
+    """获取全局分析事件通道"""
+    global _analysis_event_bus
+    with _analysis_event_bus_lock:
+        if _analysis_event_bus is None:
+            _analysis_event_bus = AnalysisEventBus()
+        return _analysis_event_bus
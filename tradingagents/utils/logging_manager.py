@@ -4,10 +4,14 @@
 提供项目级别的日志配置和管理功能
 """
 
+import atexit
+import copy
 import logging
 import logging.handlers
 import os
+import queue
 import sys
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, Optional, Union
@@ -33,6 +37,8 @@ class ColoredFormatter(logging.Formatter):
     }
     
     def format(self, record):
+        # 在副本上着色，同一条记录随后交给文件处理器时不会带上颜色代码
+        record = copy.copy(record)
         # 添加颜色
         if hasattr(record, 'levelname') and record.levelname in self.COLORS:
             record.levelname = f"{self.COLORS[record.levelname]}{record.levelname}{self.COLORS['RESET']}"
@@ -69,13 +75,171 @@ class StructuredFormatter(logging.Formatter):
         return json.dumps(log_entry, ensure_ascii=False)
 
 
+LOG_DROP_POLICIES = ('drop_new', 'drop_oldest', 'block')
+
+
+def _default_async_config() -> Dict[str, Any]:
+    """异步日志默认配置（可通过环境变量覆盖）"""
+    return {
+        'enabled': os.getenv('TRADINGAGENTS_LOG_ASYNC', 'true').lower() == 'true',
+        'queue_size': int(os.getenv('TRADINGAGENTS_LOG_QUEUE_SIZE', '10000')),
+        'drop_policy': os.getenv('TRADINGAGENTS_LOG_DROP_POLICY', 'drop_new'),
+        'sample_interval': float(os.getenv('TRADINGAGENTS_LOG_SAMPLE_INTERVAL', '1.0')),
+    }
+
+
+class SamplingFilter(logging.Filter):
+    """
+    高频日志采样过滤器
+
+    带 sample_key 属性的 WARNING 以下日志（logger.info(..., extra={'sample_key': key})），
+    每个键在 interval 秒内只放行一条，放行时注明期间省略的条数。其他日志不受影响。
+    """
+
+    MAX_KEYS = 10000
+
+    def __init__(self, interval: float):
+        super().__init__()
+        self.interval = interval
+        self._last_emit: Dict[str, float] = {}
+        self._suppressed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, 'sample_key', None)
+        if key is None or self.interval <= 0 or record.levelno >= logging.WARNING:
+            return True
+        # 同一条记录经过多个处理器时沿用第一次的判定
+        decision = getattr(record, '_sample_decision', None)
+        if decision is not None:
+            return decision
+
+        suppressed = 0
+        with self._lock:
+            last = self._last_emit.get(key)
+            if last is not None and record.created - last < self.interval:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                decision = False
+            else:
+                if len(self._last_emit) >= self.MAX_KEYS:
+                    self._last_emit.clear()
+                    self._suppressed.clear()
+                self._last_emit[key] = record.created
+                suppressed = self._suppressed.pop(key, 0)
+                decision = True
+
+        if suppressed and isinstance(record.msg, str):
+            record.msg = f"{record.msg} （期间省略{suppressed}条同类日志）"
+        record._sample_decision = decision
+        return decision
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    有界队列日志处理器
+
+    调用线程只负责入队，格式化和写文件由 QueueListener 的后台线程完成。
+    队列满时按 drop_policy 处理：drop_new 丢弃新日志，drop_oldest 丢弃最旧的一条，block 阻塞等待。
+    ERROR 及以上的日志在 drop_new 策略下最多等待1秒再丢弃。丢弃条数会在队列恢复后补记一条警告。
+    """
+
+    _IMMUTABLE_ARG_TYPES = (str, int, float, bool, type(None))
+
+    def __init__(self, log_queue: queue.Queue, drop_policy: str = 'drop_new'):
+        super().__init__(log_queue)
+        self.drop_policy = drop_policy if drop_policy in LOG_DROP_POLICIES else 'drop_new'
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 不在调用线程拼接消息：参数都是不可变值时保留 %-格式参数，由后台线程格式化
+        record = copy.copy(record)
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(a, self._IMMUTABLE_ARG_TYPES) for a in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.drop_policy == 'block':
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if not self._enqueue_when_full(record):
+                with self._dropped_lock:
+                    self.dropped += 1
+                return
+        self._report_dropped()
+
+    def _enqueue_when_full(self, record: logging.LogRecord) -> bool:
+        try:
+            if self.drop_policy == 'drop_oldest':
+                try:
+                    self.queue.get_nowait()
+                    self.queue.task_done()
+                    with self._dropped_lock:
+                        self.dropped += 1
+                except queue.Empty:
+                    pass
+                self.queue.put_nowait(record)
+            elif record.levelno >= logging.ERROR:
+                self.queue.put(record, timeout=1)
+            else:
+                return False
+            return True
+        except queue.Full:
+            return False
+
+    def _report_dropped(self):
+        if not self.dropped or self.queue.qsize() > self.queue.maxsize // 2:
+            return
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            try:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    'name': 'tradingagents.logging', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': f"⚠️ 日志队列已满，丢弃了{dropped}条日志",
+                }))
+            except queue.Full:
+                with self._dropped_lock:
+                    self.dropped += dropped
+
+
+class BoundedQueueListener(logging.handlers.QueueListener):
+    """
+    有界队列的日志写出线程
+
+    停止时阻塞等待放入结束标记（后台线程仍在消费队列），超时仍满时丢弃最旧的一条腾出位置，
+    避免队列已满时 put_nowait 抛出 queue.Full、后台线程无法退出、剩余日志没有写出。
+    """
+
+    SENTINEL_TIMEOUT = 5.0
+
+    def enqueue_sentinel(self):
+        try:
+            self.queue.put(self._sentinel, timeout=self.SENTINEL_TIMEOUT)
+            return
+        except queue.Full:
+            pass
+        try:
+            self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        self.queue.put(self._sentinel, timeout=self.SENTINEL_TIMEOUT)
+
+
 class TradingAgentsLogger:
     """统一日志管理器"""
     
     def __init__(self, config: Optional[Dict[str, Any]] = None):
         self.config = config or self._load_default_config()
         self.loggers: Dict[str, logging.Logger] = {}
+        self._listener: Optional[BoundedQueueListener] = None
         self._setup_logging()
+        atexit.register(self.stop)
     
     def _load_default_config(self) -> Dict[str, Any]:
         """加载默认日志配置"""
@@ -125,7 +289,8 @@ class TradingAgentsLogger:
             'docker': {
                 'enabled': os.getenv('DOCKER_CONTAINER', 'false').lower() == 'true',
                 'stdout_only': True  # Docker环境只输出到stdout
-            }
+            },
+            'async': _default_async_config()
         }
 
     def _load_config_file(self) -> Optional[Dict[str, Any]]:
@@ -170,6 +335,7 @@ class TradingAgentsLogger:
                 'enabled': is_docker,
                 'stdout_only': logging_config.get('docker', {}).get('stdout_only', True)
             },
+            'async': {**_default_async_config(), **logging_config.get('async', {})},
             'performance': logging_config.get('performance', {}),
             'security': logging_config.get('security', {}),
             'business': logging_config.get('business', {})
@@ -197,9 +363,50 @@ class TradingAgentsLogger:
             if self.config['handlers']['structured']['enabled']:
                 self._add_structured_handler(root_logger)
         
+        # 改为经由有界队列异步写出
+        self._setup_async_pipeline(root_logger)
+
         # 配置特定日志器
         self._configure_specific_loggers()
     
+    def _setup_async_pipeline(self, root_logger: logging.Logger):
+        """
+        把根日志器上的处理器移到 QueueListener 后台线程，根日志器只保留一个入队的 BoundedQueueHandler
+
+        未启用异步时处理器保持同步写出，仍然加上采样过滤器。
+        """
+        async_config = self.config.get('async') or _default_async_config()
+        sampling_filter = SamplingFilter(float(async_config.get('sample_interval', 1.0)))
+        handlers = list(root_logger.handlers)
+
+        if not async_config.get('enabled', True) or not handlers:
+            for handler in handlers:
+                handler.addFilter(sampling_filter)
+            return
+
+        log_queue = queue.Queue(maxsize=int(async_config.get('queue_size', 10000)))
+        queue_handler = BoundedQueueHandler(log_queue, async_config.get('drop_policy', 'drop_new'))
+        # 低于所有处理器级别的日志在入队前就过滤掉
+        queue_handler.setLevel(min(handler.level for handler in handlers))
+        queue_handler.addFilter(sampling_filter)
+
+        root_logger.handlers.clear()
+        root_logger.addHandler(queue_handler)
+        self._listener = BoundedQueueListener(log_queue, *handlers, respect_handler_level=True)
+        self._listener.start()
+
+    def stop(self):
+        """停止后台写出线程，写完队列中剩余的日志（进程退出时自动调用）"""
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            try:
+                listener.stop()
+            except queue.Full:
+                # 其他线程持续写满队列，放弃等待后台线程（守护线程随进程退出）
+                pass
+            for handler in listener.handlers:
+                handler.flush()
+    
     def _add_console_handler(self, logger: logging.Logger):
         """添加控制台处理器"""
         if not self.config['handlers']['console']['enabled']:
@@ -406,5 +613,7 @@ def get_logger(name: str) -> logging.Logger:
 def setup_logging(config: Optional[Dict[str, Any]] = None):
     """设置项目日志系统（便捷函数）"""
     global _logger_manager
+    if _logger_manager is not None:
+        _logger_manager.stop()
     _logger_manager = TradingAgentsLogger(config)
     return _logger_manager
@@ -4,6 +4,7 @@
 为所有工具调用添加统一的日志记录
 """
 
+import logging
 import time
 import functools
 from typing import Any, Dict, Optional, Callable
@@ -19,6 +20,12 @@ logger = get_logger('agents')
 tool_logger = get_logger("tools")
 
 
+def _preview(value: Any, limit: int) -> str:
+    """截断后的字符串表示（只调用一次 str）"""
+    text = value if isinstance(value, str) else str(value)
+    return text[:limit] + '...' if len(text) > limit else text
+
+
 def log_tool_call(tool_name: Optional[str] = None, log_args: bool = True, log_result: bool = False):
     """
     工具调用日志装饰器
@@ -37,30 +44,28 @@ def log_tool_call(tool_name: Optional[str] = None, log_args: bool = True, log_re
             # 记录开始时间
             start_time = time.time()
             
-            # 准备参数信息
-            args_info = {}
-            if log_args:
-                # 记录位置参数
-                if args:
-                    args_info['args'] = [str(arg)[:100] + '...' if len(str(arg)) > 100 else str(arg) for arg in args]
-                
-                # 记录关键字参数
-                if kwargs:
-                    args_info['kwargs'] = {
-                        k: str(v)[:100] + '...' if len(str(v)) > 100 else str(v) 
-                        for k, v in kwargs.items()
+            # 日志级别被过滤时不拼接参数
+            if tool_logger.isEnabledFor(logging.INFO):
+                args_info = None
+                if log_args:
+                    args_info = {}
+                    # 记录位置参数
+                    if args:
+                        args_info['args'] = [_preview(arg, 100) for arg in args]
+                    # 记录关键字参数
+                    if kwargs:
+                        args_info['kwargs'] = {k: _preview(v, 100) for k, v in kwargs.items()}
+
+                # 记录工具调用开始
+                tool_logger.info(
+                    "🔧 [工具调用] %s - 开始", name,
+                    extra={
+                        'tool_name': name,
+                        'event_type': 'tool_call_start',
+                        'timestamp': datetime.now().isoformat(),
+                        'args_info': args_info
                     }
-            
-            # 记录工具调用开始
-            tool_logger.info(
-                f"🔧 [工具调用] {name} - 开始",
-                extra={
-                    'tool_name': name,
-                    'event_type': 'tool_call_start',
-                    'timestamp': datetime.now().isoformat(),
-                    'args_info': args_info if log_args else None
-                }
-            )
+                )
             
             try:
                 # 执行工具函数
@@ -69,23 +74,21 @@ def log_tool_call(tool_name: Optional[str] = None, log_args: bool = True, log_re
                 # 计算执行时间
                 duration = time.time() - start_time
                 
-                # 准备结果信息
-                result_info = None
-                if log_result and result is not None:
-                    result_str = str(result)
-                    result_info = result_str[:200] + '...' if len(result_str) > 200 else result_str
-                
                 # 记录工具调用成功
-                tool_logger.info(
-                    f"✅ [工具调用] {name} - 完成 (耗时: {duration:.2f}s)",
-                    extra={
-                        'tool_name': name,
-                        'event_type': 'tool_call_success',
-                        'duration': duration,
-                        'result_info': result_info if log_result else None,
-                        'timestamp': datetime.now().isoformat()
-                    }
-                )
+                if tool_logger.isEnabledFor(logging.INFO):
+                    result_info = None
+                    if log_result and result is not None:
+                        result_info = _preview(result, 200)
+                    tool_logger.info(
+                        "✅ [工具调用] %s - 完成 (耗时: %.2fs)", name, duration,
+                        extra={
+                            'tool_name': name,
+                            'event_type': 'tool_call_success',
+                            'duration': duration,
+                            'result_info': result_info,
+                            'timestamp': datetime.now().isoformat()
+                        }
+                    )
                 
                 return result
                 
@@ -129,38 +132,44 @@ def log_data_source_call(source_name: str):
             symbol = args[0] if args else kwargs.get('symbol', kwargs.get('ticker', 'unknown'))
             
             # 记录数据源调用开始
-            tool_logger.info(
-                f"📊 [数据源] {source_name} - 获取 {symbol} 数据",
-                extra={
-                    'data_source': source_name,
-                    'symbol': symbol,
-                    'event_type': 'data_source_call',
-                    'timestamp': datetime.now().isoformat()
-                }
-            )
+            if tool_logger.isEnabledFor(logging.INFO):
+                tool_logger.info(
+                    "📊 [数据源] %s - 获取 %s 数据", source_name, symbol,
+                    extra={
+                        'data_source': source_name,
+                        'symbol': symbol,
+                        'event_type': 'data_source_call',
+                        'timestamp': datetime.now().isoformat()
+                    }
+                )
             
             try:
                 result = func(*args, **kwargs)
                 duration = time.time() - start_time
-                
-                # 检查结果是否成功
-                success = result and "❌" not in str(result) and "错误" not in str(result)
+
+                if not tool_logger.isEnabledFor(logging.WARNING):
+                    return result
+
+                # 检查结果是否成功（结果只转换一次字符串）
+                result_text = (result if isinstance(result, str) else str(result)) if result else ""
+                success = bool(result) and "❌" not in result_text and "错误" not in result_text
                 
                 if success:
-                    tool_logger.info(
-                        f"✅ [数据源] {source_name} - {symbol} 数据获取成功 (耗时: {duration:.2f}s)",
-                        extra={
-                            'data_source': source_name,
-                            'symbol': symbol,
-                            'event_type': 'data_source_success',
-                            'duration': duration,
-                            'data_size': len(str(result)) if result else 0,
-                            'timestamp': datetime.now().isoformat()
-                        }
-                    )
+                    if tool_logger.isEnabledFor(logging.INFO):
+                        tool_logger.info(
+                            "✅ [数据源] %s - %s 数据获取成功 (耗时: %.2fs)", source_name, symbol, duration,
+                            extra={
+                                'data_source': source_name,
+                                'symbol': symbol,
+                                'event_type': 'data_source_success',
+                                'duration': duration,
+                                'data_size': len(result_text),
+                                'timestamp': datetime.now().isoformat()
+                            }
+                        )
                 else:
                     tool_logger.warning(
-                        f"⚠️ [数据源] {source_name} - {symbol} 数据获取失败 (耗时: {duration:.2f}s)",
+                        "⚠️ [数据源] %s - %s 数据获取失败 (耗时: %.2fs)", source_name, symbol, duration,
                         extra={
                             'data_source': source_name,
                             'symbol': symbol,
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+分析链路追踪
+一次分析对应一条 trace，图节点、工具、数据接口、LLM 调用各自记录为 span，
+span 的父子关系通过 contextvars 传递（LangGraph 线程池执行节点时会复制上下文）。
+
+分析结束后：
+- 以 OTLP/JSON 格式写入本地文件（可用 OpenTelemetry 工具离线导入），按条数和天数清理旧文件
+- 同时写出 collapsed stack 格式（flamegraph.pl / speedscope 可直接绘制火焰图）
+- 安装了 opentelemetry-sdk 且 TRADINGAGENTS_TRACE_OTEL=true 时，转发给全局 OpenTelemetry TracerProvider
+
+没有打开 trace 时 trace_span 不做任何记录。
+"""
+
+import functools
+import inspect
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# 导入日志模块
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('agents')
+
+try:
+    from opentelemetry import trace as otel_trace
+    from opentelemetry.trace import SpanKind as OtelSpanKind, Status as OtelStatus, StatusCode as OtelStatusCode
+    OTEL_AVAILABLE = True
+except ImportError:
+    otel_trace = None
+    OTEL_AVAILABLE = False
+
+
+# span 类型（与 OpenTelemetry SpanKind 对应）
+SPAN_INTERNAL = "internal"
+SPAN_CLIENT = "client"
+
+# 常用属性名
+ATTR_INPUT_TOKENS = "llm.usage.input_tokens"
+ATTR_OUTPUT_TOKENS = "llm.usage.output_tokens"
+ATTR_CACHE = "cache.result"
+
+TRACE_DIR = os.getenv('TRADINGAGENTS_TRACE_DIR', './data/traces')
+# 本地 trace 文件保留的最大条数和天数（每条 trace 两个文件，0 表示不限制）
+TRACE_MAX_FILES = int(os.getenv('TRADINGAGENTS_TRACE_MAX_FILES', '200'))
+TRACE_MAX_AGE_DAYS = float(os.getenv('TRADINGAGENTS_TRACE_MAX_AGE_DAYS', '7'))
+TRACE_FILE_SUFFIXES = ('.otlp.json', '.folded')
+
+
+def _tracing_enabled() -> bool:
+    return os.getenv('TRADINGAGENTS_TRACE_ENABLED', 'true').lower() == 'true'
+
+
+class Span:
+    """一个计时区间"""
+
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+                 "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: str = SPAN_INTERNAL,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        """耗时（秒）"""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def add_to_attribute(self, key: str, amount: float):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+
+class Trace:
+    """一次分析的全部 span"""
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = secrets.token_hex(16)
+        self.root = Span(name, self.trace_id, None, attributes=attributes)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def finished_spans(self) -> List[Span]:
+        with self._lock:
+            return [self.root] + list(self.spans)
+
+    def summary(self) -> Dict[str, Any]:
+        """整体耗时、token 和缓存命中统计"""
+        spans = self.finished_spans()
+        cache_results = [s.attributes.get(ATTR_CACHE) for s in spans if ATTR_CACHE in s.attributes]
+        return {
+            'trace_id': self.trace_id,
+            'name': self.root.name,
+            'duration': self.root.duration,
+            'span_count': len(spans),
+            'input_tokens': sum(s.attributes.get(ATTR_INPUT_TOKENS, 0) for s in spans),
+            'output_tokens': sum(s.attributes.get(ATTR_OUTPUT_TOKENS, 0) for s in spans),
+            'cache_hits': cache_results.count('hit'),
+            'cache_misses': cache_results.count('miss'),
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("analysis_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("analysis_span", default=None)
+
+
+def get_current_trace() -> Optional[Trace]:
+    """当前生效的 trace，没有时返回 None"""
+    return _current_trace.get()
+
+
+def get_current_span() -> Optional[Span]:
+    """当前所在的 span，没有时返回 None"""
+    return _current_span.get()
+
+
+@contextmanager
+def start_trace(name: str, **attributes) -> Iterator[Optional[Trace]]:
+    """
+    开始一条 trace；已有 trace 时直接复用（例如 Web 分析流程内再调用 propagate）
+
+    结束时导出到 TRADINGAGENTS_TRACE_DIR 并记录摘要。
+    TRADINGAGENTS_TRACE_ENABLED=false 时不记录，yield None。
+    """
+    current = _current_trace.get()
+    if current is not None or not _tracing_enabled():
+        yield current
+        return
+
+    trace = Trace(name, attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except Exception as e:
+        trace.root.error = str(e)
+        raise
+    finally:
+        trace.root.end_ns = time.time_ns()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        export_trace(trace)
+
+
+def _new_span(trace: Trace, name: str, kind: str, attributes: Dict[str, Any]) -> Span:
+    parent = _current_span.get()
+    return Span(name, trace.trace_id, parent.span_id if parent else trace.root.span_id, kind, attributes)
+
+
+@contextmanager
+def trace_span(name: str, kind: str = SPAN_INTERNAL, **attributes) -> Iterator[Optional[Span]]:
+    """在当前 trace 中记录一个 span，没有 trace 时 yield None"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    span = _new_span(trace, name, kind, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.error = str(e)
+        raise
+    finally:
+        span.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace.add(span)
+
+
+def traced(name: str = None, kind: str = SPAN_INTERNAL, **attributes) -> Callable:
+    """装饰器：函数的每次调用记录为一个 span"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with trace_span(span_name, kind, **attributes):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _llm_span_args(llm) -> tuple:
+    model = str(getattr(llm, 'model_name', None) or getattr(llm, 'model', ''))
+    return f"llm {model}", {"llm.model": model, "llm.adapter": type(llm).__name__}
+
+
+def traced_llm_generate(func: Callable) -> Callable:
+    """
+    LLM 适配器 _generate / _stream / _agenerate / _astream 的装饰器：每次调用记录为 client span，
+    token 数由 token_tracker 记入该 span
+
+    流式方法的 span 覆盖整个流，只在生成每个分块时设为当前 span，不影响消费分块的调用方。
+    """
+    if inspect.isasyncgenfunction(func):
+        @functools.wraps(func)
+        async def async_stream_wrapper(self, *args, **kwargs):
+            trace = _current_trace.get()
+            stream = func(self, *args, **kwargs)
+            if trace is None:
+                async for chunk in stream:
+                    yield chunk
+                return
+
+            name, attributes = _llm_span_args(self)
+            span = _new_span(trace, name, SPAN_CLIENT, attributes)
+            try:
+                while True:
+                    token = _current_span.set(span)
+                    try:
+                        chunk = await stream.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        _current_span.reset(token)
+                    yield chunk
+            except Exception as e:
+                span.error = str(e)
+                raise
+            finally:
+                await stream.aclose()
+                span.end_ns = time.time_ns()
+                trace.add(span)
+
+        return async_stream_wrapper
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def stream_wrapper(self, *args, **kwargs):
+            trace = _current_trace.get()
+            stream = func(self, *args, **kwargs)
+            if trace is None:
+                yield from stream
+                return
+
+            name, attributes = _llm_span_args(self)
+            span = _new_span(trace, name, SPAN_CLIENT, attributes)
+            try:
+                while True:
+                    token = _current_span.set(span)
+                    try:
+                        chunk = next(stream)
+                    except StopIteration:
+                        break
+                    finally:
+                        _current_span.reset(token)
+                    yield chunk
+            except Exception as e:
+                span.error = str(e)
+                raise
+            finally:
+                stream.close()
+                span.end_ns = time.time_ns()
+                trace.add(span)
+
+        return stream_wrapper
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(self, *args, **kwargs):
+            if _current_trace.get() is None:
+                return await func(self, *args, **kwargs)
+            name, attributes = _llm_span_args(self)
+            with trace_span(name, SPAN_CLIENT, **attributes):
+                return await func(self, *args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if _current_trace.get() is None:
+            return func(self, *args, **kwargs)
+        name, attributes = _llm_span_args(self)
+        with trace_span(name, SPAN_CLIENT, **attributes):
+            return func(self, *args, **kwargs)
+
+    return wrapper
+
+
+def set_span_attributes(**attributes):
+    """给当前 span 添加属性"""
+    span = _current_span.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+
+def record_llm_usage(input_tokens: int, output_tokens: int):
+    """把一次 LLM 调用的 token 数累加到当前 span"""
+    span = _current_span.get()
+    if span is not None and _current_trace.get() is not None:
+        span.add_to_attribute(ATTR_INPUT_TOKENS, input_tokens or 0)
+        span.add_to_attribute(ATTR_OUTPUT_TOKENS, output_tokens or 0)
+
+
+def _span_tree(trace: Trace) -> Dict[Optional[str], List[Span]]:
+    children: Dict[Optional[str], List[Span]] = {}
+    for span in trace.finished_spans():
+        children.setdefault(span.parent_id, []).append(span)
+    for spans in children.values():
+        spans.sort(key=lambda s: s.start_ns)
+    return children
+
+
+def format_trace_breakdown(trace: Trace, min_seconds: float = 0.0) -> str:
+    """
+    按调用层级输出耗时分解（总耗时、自身耗时、占比、token、缓存命中）
+
+    Args:
+        min_seconds: 低于该耗时的 span 不展开
+    """
+    children = _span_tree(trace)
+    total = max(trace.root.duration, 1e-9)
+    lines = []
+
+    def visit(span: Span, depth: int):
+        child_spans = children.get(span.span_id, [])
+        self_time = max(span.duration - sum(c.duration for c in child_spans), 0.0)
+        notes = []
+        if ATTR_INPUT_TOKENS in span.attributes:
+            notes.append(f"tokens {span.attributes[ATTR_INPUT_TOKENS]}/{span.attributes.get(ATTR_OUTPUT_TOKENS, 0)}")
+        if ATTR_CACHE in span.attributes:
+            notes.append(f"cache {span.attributes[ATTR_CACHE]}")
+        if span.error:
+            notes.append("error")
+        lines.append(f"{'  ' * depth}{span.name}  {span.duration:.2f}s (自身 {self_time:.2f}s, "
+                     f"{span.duration / total:.0%}){'  [' + ', '.join(notes) + ']' if notes else ''}")
+        for child in child_spans:
+            if child.duration >= min_seconds:
+                visit(child, depth + 1)
+
+    visit(trace.root, 0)
+    return "\n".join(lines)
+
+
+def to_collapsed_stacks(trace: Trace) -> List[str]:
+    """collapsed stack 格式（"根;节点;工具 自身耗时微秒"），用于绘制火焰图"""
+    children = _span_tree(trace)
+    lines = []
+
+    def visit(span: Span, stack: str):
+        path = f"{stack};{span.name}" if stack else span.name
+        path = path.replace(" ", "_")
+        child_spans = children.get(span.span_id, [])
+        self_us = int(max(span.duration - sum(c.duration for c in child_spans), 0.0) * 1e6)
+        if self_us > 0:
+            lines.append(f"{path} {self_us}")
+        for child in child_spans:
+            visit(child, path)
+
+    visit(trace.root, "")
+    return lines
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp_json(trace: Trace) -> Dict[str, Any]:
+    """转换为 OTLP/JSON（ExportTraceServiceRequest）结构"""
+    kinds = {SPAN_INTERNAL: 1, SPAN_CLIENT: 3}
+    spans = []
+    for span in trace.finished_spans():
+        item = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": kinds.get(span.kind, 1),
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns or span.start_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            item["parentSpanId"] = span.parent_id
+        spans.append(item)
+
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "tradingagents"}}]},
+        "scopeSpans": [{"scope": {"name": "tradingagents.tracing"}, "spans": spans}],
+    }]}
+
+
+def _export_to_files(trace: Trace):
+    os.makedirs(TRACE_DIR, exist_ok=True)
+    base = os.path.join(TRACE_DIR, trace.trace_id)
+    with open(f"{base}.otlp.json", 'w', encoding='utf-8') as f:
+        json.dump(to_otlp_json(trace), f, ensure_ascii=False)
+    with open(f"{base}.folded", 'w', encoding='utf-8') as f:
+        f.write("\n".join(to_collapsed_stacks(trace)) + "\n")
+    _prune_trace_files()
+
+
+def _prune_trace_files():
+    """删除超过保留天数的 trace 文件，并只保留最近 TRACE_MAX_FILES 条 trace"""
+    traces: Dict[str, List[str]] = {}
+    for filename in os.listdir(TRACE_DIR):
+        for suffix in TRACE_FILE_SUFFIXES:
+            if filename.endswith(suffix):
+                traces.setdefault(filename[:-len(suffix)], []).append(os.path.join(TRACE_DIR, filename))
+
+    def mtime(paths: List[str]) -> float:
+        try:
+            return max(os.path.getmtime(path) for path in paths)
+        except OSError:
+            return 0.0
+
+    ordered = sorted(traces.values(), key=mtime, reverse=True)
+    cutoff = time.time() - TRACE_MAX_AGE_DAYS * 86400
+    expired = [paths for index, paths in enumerate(ordered)
+               if (TRACE_MAX_FILES and index >= TRACE_MAX_FILES) or (TRACE_MAX_AGE_DAYS and mtime(paths) < cutoff)]
+    for paths in expired:
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    if expired:
+        logger.debug(f"⏱️ [链路追踪] 清理了 {len(expired)} 条过期 trace 文件")
+
+
+def _export_to_otel(trace: Trace):
+    """按原始时间戳重放到全局 OpenTelemetry TracerProvider（由部署方配置导出器）"""
+    tracer = otel_trace.get_tracer("tradingagents.tracing")
+    kinds = {SPAN_INTERNAL: OtelSpanKind.INTERNAL, SPAN_CLIENT: OtelSpanKind.CLIENT}
+    otel_spans = {}
+    for span in sorted(trace.finished_spans(), key=lambda s: s.start_ns):
+        parent = otel_spans.get(span.parent_id)
+        context = otel_trace.set_span_in_context(parent) if parent is not None else None
+        attributes = {k: v for k, v in span.attributes.items() if isinstance(v, (str, bool, int, float))}
+        otel_span = tracer.start_span(span.name, context=context, kind=kinds.get(span.kind, OtelSpanKind.INTERNAL),
+                                      attributes=attributes, start_time=span.start_ns)
+        if span.error:
+            otel_span.set_status(OtelStatus(OtelStatusCode.ERROR, span.error))
+        otel_spans[span.span_id] = otel_span
+    # 子 span 先结束
+    for span in sorted(trace.finished_spans(), key=lambda s: s.end_ns or s.start_ns):
+        otel_spans[span.span_id].end(end_time=span.end_ns or span.start_ns)
+
+
+def export_trace(trace: Trace):
+    """导出 trace 并记录摘要（导出失败只记录日志）"""
+    summary = trace.summary()
+    logger.info(f"⏱️ [链路追踪] {summary['name']}: 耗时{summary['duration']:.1f}s, {summary['span_count']}个span, "
+                f"token {summary['input_tokens']}/{summary['output_tokens']}, "
+                f"缓存命中{summary['cache_hits']}/未命中{summary['cache_misses']}, trace_id={trace.trace_id}")
+    logger.debug(f"⏱️ [链路追踪] 耗时分解:\n{format_trace_breakdown(trace, min_seconds=0.01)}")
+
+    try:
+        _export_to_files(trace)
+    except Exception as e:
+        logger.warning(f"⚠️ [链路追踪] 写入文件失败: {e}")
+
+    if OTEL_AVAILABLE and os.getenv('TRADINGAGENTS_TRACE_OTEL', 'false').lower() == 'true':
+        try:
+            _export_to_otel(trace)
+        except Exception as e:
+            logger.warning(f"⚠️ [链路追踪] OpenTelemetry 导出失败: {e}")
@@ -1,13 +1,13 @@
 #!/usr/bin/env python3
 """
 异步进度显示组件
-支持定时刷新，从Redis或文件获取进度状态
+首次从Redis或文件读取进度快照，之后阻塞读取增量进度事件刷新显示
 """
 
 import streamlit as st
 import time
 from typing import Optional, Dict, Any
-from web.utils.async_progress_tracker import get_progress_by_id, format_time
+from web.utils.async_progress_tracker import ProgressFollower, get_progress_by_id, format_time
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
@@ -30,21 +30,17 @@ class AsyncProgressDisplay:
             self.refresh_button = st.empty()
         
         # 初始化状态
-        self.last_update = 0
+        self.follower = ProgressFollower(analysis_id)
         self.is_completed = False
         
         logger.info(f"📊 [异步显示] 初始化: {analysis_id}, 刷新间隔: {refresh_interval}s")
     
     def update_display(self) -> bool:
-        """更新显示，返回是否需要继续刷新"""
-        current_time = time.time()
-        
-        # 检查是否需要刷新
-        if current_time - self.last_update < self.refresh_interval and not self.is_completed:
-            return not self.is_completed
-        
-        # 获取进度数据
-        progress_data = get_progress_by_id(self.analysis_id)
+        """等待新的进度事件（最多一个刷新间隔）并更新显示，返回是否需要继续刷新"""
+        if self.is_completed:
+            return False
+
+        progress_data = self.follower.poll(block_seconds=self.refresh_interval)
         
         if not progress_data:
             self.status_text.error("❌ 无法获取分析进度，请检查分析是否正在运行")
@@ -52,7 +48,6 @@ class AsyncProgressDisplay:
         
         # 更新显示
         self._render_progress(progress_data)
-        self.last_update = current_time
         
         # 检查是否完成
         status = progress_data.get('status', 'running')
@@ -177,18 +172,59 @@ def auto_refresh_progress(display: AsyncProgressDisplay, max_duration: float = 1
                 st.warning("⚠️ 分析时间过长，已停止自动刷新。请手动刷新页面查看最新状态。")
             break
         
-        # 更新显示
+        # 更新显示（没有新事件时阻塞等待一个刷新间隔）
         should_continue = display.update_display()
         
         if not should_continue:
             # 分析完成或失败，停止刷新
             break
-        
-        # 等待刷新间隔
-        time.sleep(display.refresh_interval)
     
     logger.info(f"📊 [异步显示] 自动刷新结束: {display.analysis_id}")
 
+# 部分报告每个节点最多显示的末尾字符数
+PARTIAL_REPORT_TAIL_CHARS = 1500
+
+
+def render_live_progress(placeholder, progress_data: Optional[Dict[str, Any]], title: str = "",
+                         partial_reports=None):
+    """
+    在占位容器中渲染进度，供等待循环中反复调用
+
+    不创建按钮等带 key 的交互控件，同一次脚本运行中可以多次重绘。
+    partial_reports 为 PartialReportBuffer 时，同时显示正在生成的节点输出。
+    """
+    with placeholder.container():
+        if title:
+            st.markdown(f"**{title}**")
+        if not progress_data:
+            st.info("🔄 **当前状态**: 等待分析任务开始...")
+            return
+
+        status = progress_data.get('status', 'running')
+        progress_percentage = progress_data.get('progress_percentage', 0.0)
+        st.progress(min(progress_percentage / 100, 1.0),
+                    text=f"{progress_data.get('current_step_name', '准备阶段')} ({progress_percentage:.1f}%)")
+
+        last_message = progress_data.get('last_message', '')
+        if status == 'failed':
+            st.error(f"❌ **分析失败**: {last_message}")
+        elif status == 'completed':
+            st.success(f"✅ **分析完成**: {last_message}")
+        else:
+            start_time = progress_data.get('start_time', 0)
+            elapsed_time = time.time() - start_time if start_time > 0 else progress_data.get('elapsed_time', 0)
+            st.caption(f"🔄 {last_message} | ⏱️ 已用时间 {format_time(elapsed_time)}"
+                       f" | 预计剩余 {format_time(progress_data.get('remaining_time', 0))}")
+
+            if partial_reports is not None:
+                for node in partial_reports.running_nodes:
+                    text = partial_reports.reports.get(node, "")
+                    if not text:
+                        continue
+                    with st.expander(f"✍️ {node}（生成中）", expanded=True):
+                        st.markdown(text[-PARTIAL_REPORT_TAIL_CHARS:])
+
+
 # Streamlit专用的自动刷新组件
 def streamlit_auto_refresh_progress(analysis_id: str, refresh_interval: int = 2):
     """Streamlit专用的自动刷新进度显示"""
@@ -93,8 +93,7 @@ def render_token_statistics():
         render_provider_statistics(stats)
         
         # 显示成本趋势
-        if records:
-            render_cost_trends(records)
+        render_cost_trends(days)
         
         # 显示详细记录表
         render_detailed_records_table(records)
@@ -262,30 +261,25 @@ def render_provider_statistics(stats: Dict[str, Any]):
         )
         st.plotly_chart(fig_requests, use_container_width=True)
 
-def render_cost_trends(records: List[UsageRecord]):
+def render_cost_trends(days: int):
     """渲染成本趋势图"""
     st.markdown("**📈 成本趋势分析**")
     
-    # 按日期聚合数据
-    df_records = pd.DataFrame([
-        {
-            'date': datetime.fromisoformat(record.timestamp).date(),
-            'cost': record.cost,
-            'tokens': record.input_tokens + record.output_tokens,
-            'provider': record.provider
-        }
-        for record in records
-    ])
+    # 直接读取按日增量汇总结果
+    daily_usage = config_manager.get_daily_usage(days)
     
-    if df_records.empty:
+    if not daily_usage:
         st.info("暂无趋势数据")
         return
     
-    # 按日期聚合
-    daily_stats = df_records.groupby('date').agg({
-        'cost': 'sum',
-        'tokens': 'sum'
-    }).reset_index()
+    daily_stats = pd.DataFrame([
+        {
+            'date': item['date'],
+            'cost': item['cost'],
+            'tokens': item['input_tokens'] + item['output_tokens']
+        }
+        for item in daily_usage
+    ])
     
     # 创建双轴图表
     fig = make_subplots(
@@ -97,7 +97,7 @@ def extract_risk_assessment(state):
         logger.info(f"提取风险评估数据时出错: {e}")
         return None
 
-def run_stock_analysis(stock_symbol, analysis_date, analysts, research_depth, llm_provider, llm_model, market_type="美股", progress_callback=None):
+def run_stock_analysis(stock_symbol, analysis_date, analysts, research_depth, llm_provider, llm_model, market_type="美股", progress_callback=None, analysis_id=None):
     """执行股票分析
 
     Args:
@@ -108,7 +108,22 @@ def run_stock_analysis(stock_symbol, analysis_date, analysts, research_depth, ll
         llm_provider: LLM提供商 (dashscope/deepseek/google)
         llm_model: 大模型名称
         progress_callback: 进度回调函数，用于更新UI状态
+        analysis_id: 分析ID，提供时节点事件和token增量会发布到分析事件通道（见 tradingagents.utils.analysis_events）
     """
+    from tradingagents.dataflows.data_context import analysis_data_context
+    from tradingagents.utils.tracing import start_trace
+
+    # 数据预获取阶段取得的数据在分析图中直接复用，不再重复请求上游；
+    # 预获取和图执行记录在同一条链路追踪中
+    with start_trace(f"analysis {stock_symbol} {analysis_date}", **{"stock.symbol": stock_symbol,
+                                                                    "analysis.id": analysis_id or ""}), \
+            analysis_data_context(f"{stock_symbol} {analysis_date}"):
+        return _run_stock_analysis(stock_symbol, analysis_date, analysts, research_depth, llm_provider,
+                                   llm_model, market_type, progress_callback, analysis_id)
+
+
+def _run_stock_analysis(stock_symbol, analysis_date, analysts, research_depth, llm_provider, llm_model, market_type, progress_callback, analysis_id):
+    """执行股票分析（在数据上下文中运行）"""
 
     def update_progress(message, step=None, total_steps=None):
         """更新进度"""
@@ -296,6 +311,10 @@ def run_stock_analysis(stock_symbol, analysis_date, analysts, research_depth, ll
             # Google AI不需要backend_url，使用默认的OpenAI格式
             config["backend_url"] = "https://api.openai.com/v1"
 
+        # Web 分析有进度界面：流式输出 token，界面随进度事件渲染生成中的部分报告
+        if analysis_id:
+            config["stream_llm_tokens"] = True
+
         # 修复路径问题
         config["data_dir"] = str(project_root / "data")
         config["results_dir"] = str(project_root / "results")
@@ -349,7 +368,7 @@ def run_stock_analysis(stock_symbol, analysis_date, analysts, research_depth, ll
         logger.debug(f"🔍 [RUNNER DEBUG]   symbol: '{formatted_symbol}'")
         logger.debug(f"🔍 [RUNNER DEBUG]   date: '{analysis_date}'")
 
-        state, decision = graph.propagate(formatted_symbol, analysis_date)
+        state, decision = graph.propagate(formatted_symbol, analysis_date, analysis_id=analysis_id)
 
         # 调试信息
         logger.debug(f"🔍 [DEBUG] 分析完成，decision类型: {type(decision)}")
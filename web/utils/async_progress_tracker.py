@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 """
 异步进度跟踪器
-支持Redis和文件两种存储方式，前端定时轮询获取进度
+支持Redis和文件两种存储方式：
+- 每次更新追加一条小的增量事件（Redis Stream 或本地 JSONL 追加日志），前端可阻塞读取新事件
+- 同时维护一份紧凑的进度快照，供 get_progress_by_id 直接读取
+- 时间窗口内的突发更新合并后再写入
+- 分析图的节点开始/结束和 LLM token 增量随进度事件一起写入，界面据此渲染生成中的部分报告
 """
 
 import json
 import time
 import os
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 import threading
 from pathlib import Path
@@ -16,6 +20,34 @@ from pathlib import Path
 from tradingagents.utils.logging_manager import get_logger
 logger = get_logger('async_progress')
 
+# 进度快照/事件的过期时间（秒）
+PROGRESS_TTL = 3600
+# 合并窗口（秒）：窗口内的多次更新只写一次快照、追加一条事件
+PROGRESS_COALESCE_SECONDS = float(os.getenv('PROGRESS_COALESCE_SECONDS', '0.5'))
+# 单条事件最多携带的合并消息数
+MAX_EVENT_MESSAGES = 20
+# Redis Stream 保留的事件数（近似）
+PROGRESS_STREAM_MAXLEN = 2000
+# 按最后更新时间排序的分析索引（有序集合），以及按用户划分的索引前缀
+PROGRESS_INDEX_KEY = "progress_index:all"
+PROGRESS_USER_INDEX_PREFIX = "progress_index:user:"
+
+
+def _progress_file(analysis_id: str) -> str:
+    return f"./data/progress_{analysis_id}.json"
+
+
+def _progress_events_file(analysis_id: str) -> str:
+    return f"./data/progress_{analysis_id}.events.jsonl"
+
+
+def _progress_stream_key(analysis_id: str) -> str:
+    return f"progress_events:{analysis_id}"
+
+
+def _progress_user_index_key(user_id: str) -> str:
+    return f"{PROGRESS_USER_INDEX_PREFIX}{user_id}"
+
 def safe_serialize(obj):
     """安全序列化对象，处理不可序列化的类型"""
     if hasattr(obj, 'dict'):
@@ -46,8 +78,10 @@ def safe_serialize(obj):
 class AsyncProgressTracker:
     """异步进度跟踪器"""
     
-    def __init__(self, analysis_id: str, analysts: List[str], research_depth: int, llm_provider: str):
+    def __init__(self, analysis_id: str, analysts: List[str], research_depth: int, llm_provider: str,
+                 user_id: Optional[str] = None):
         self.analysis_id = analysis_id
+        self.user_id = user_id
         self.analysts = analysts
         self.research_depth = research_depth
         self.llm_provider = llm_provider
@@ -73,27 +107,20 @@ class AsyncProgressTracker:
             'last_message': '准备开始分析...',
             'last_update': time.time(),
             'start_time': self.start_time,
+            'user_id': user_id,
             'steps': self.analysis_steps
         }
         
-        # 尝试初始化Redis，失败则使用文件
-        self.redis_client = None
-        self.use_redis = self._init_redis()
-        
-        if not self.use_redis:
-            # 使用文件存储
-            self.progress_file = f"./data/progress_{analysis_id}.json"
-            os.makedirs(os.path.dirname(self.progress_file), exist_ok=True)
+        self._init_storage()
         
         # 保存初始状态
-        self._save_progress()
+        self._save_progress(force=True)
         
         logger.info(f"📊 [异步进度] 初始化完成: {analysis_id}, 存储方式: {'Redis' if self.use_redis else '文件'}")
 
         # 注册到日志系统进行自动进度更新
         try:
             from .progress_log_handler import register_analysis_tracker
-            import threading
 
             # 使用超时机制避免死锁
             def register_with_timeout():
@@ -116,6 +143,46 @@ class AsyncProgressTracker:
         except Exception as e:
             print(f"❌ [进度集成] 跟踪器注册异常: {e}")
     
+    @classmethod
+    def attach(cls, analysis_id: str) -> Optional['AsyncProgressTracker']:
+        """
+        接管已有的进度记录（例如由已终止的任务子进程创建），不重置快照
+
+        Returns:
+            可继续更新该进度的跟踪器；进度记录不存在时返回 None
+        """
+        data = get_progress_by_id(analysis_id)
+        if data is None:
+            return None
+
+        tracker = cls.__new__(cls)
+        tracker.analysis_id = analysis_id
+        tracker.user_id = data.get('user_id')
+        tracker.start_time = data.get('start_time', time.time())
+        tracker.progress_data = data
+        tracker._init_storage()
+        return tracker
+
+    def _init_storage(self):
+        """初始化存储方式和合并写入状态"""
+        # 尝试初始化Redis，失败则使用文件
+        self.redis_client = None
+        self.use_redis = self._init_redis()
+
+        if not self.use_redis:
+            # 使用文件存储
+            self.progress_file = _progress_file(self.analysis_id)
+            self.events_file = _progress_events_file(self.analysis_id)
+            os.makedirs(os.path.dirname(self.progress_file), exist_ok=True)
+
+        # 合并窗口内待写入的消息
+        self._flush_lock = threading.Lock()
+        self._pending_messages: List[str] = []
+        self._recorded_message = None
+        self._pending_analysis_events: List[Dict[str, Any]] = []
+        self._last_flush = 0.0
+        self._flush_timer: Optional[threading.Timer] = None
+
     def _init_redis(self) -> bool:
         """初始化Redis连接"""
         try:
@@ -128,34 +195,11 @@ class AsyncProgressTracker:
                 logger.info(f"📊 [异步进度] Redis已禁用，使用文件存储")
                 return False
 
-            import redis
-
-            # 从环境变量获取Redis配置
-            redis_host = os.getenv('REDIS_HOST', 'localhost')
-            redis_port = int(os.getenv('REDIS_PORT', 6379))
-            redis_password = os.getenv('REDIS_PASSWORD', None)
-            redis_db = int(os.getenv('REDIS_DB', 0))
-
-            # 创建Redis连接
-            if redis_password:
-                self.redis_client = redis.Redis(
-                    host=redis_host,
-                    port=redis_port,
-                    password=redis_password,
-                    db=redis_db,
-                    decode_responses=True
-                )
-            else:
-                self.redis_client = redis.Redis(
-                    host=redis_host,
-                    port=redis_port,
-                    db=redis_db,
-                    decode_responses=True
-                )
+            self.redis_client = _get_redis_client()
 
             # 测试连接
             self.redis_client.ping()
-            logger.info(f"📊 [异步进度] Redis连接成功: {redis_host}:{redis_port}")
+            logger.info(f"📊 [异步进度] Redis连接成功: {os.getenv('REDIS_HOST', 'localhost')}:{os.getenv('REDIS_PORT', 6379)}")
             return True
         except Exception as e:
             logger.warning(f"📊 [异步进度] Redis连接失败，使用文件存储: {e}")
@@ -340,26 +384,35 @@ class AsyncProgressTracker:
         elif "模块完成" in message:
             step_description = f"{current_step_info['name']}已完成"
 
-        self.progress_data.update({
-            'current_step': self.current_step,
-            'progress_percentage': progress_percentage,
-            'current_step_name': current_step_info['name'],
-            'current_step_description': step_description,
-            'elapsed_time': elapsed_time,
-            'remaining_time': remaining_time,
-            'last_message': message,
-            'last_update': current_time,
-            'status': 'completed' if progress_percentage >= 100 else 'running'
-        })
+        # 与刷新线程的快照互斥，避免序列化时字典被修改
+        with self._flush_lock:
+            self.progress_data.update({
+                'current_step': self.current_step,
+                'progress_percentage': progress_percentage,
+                'current_step_name': current_step_info['name'],
+                'current_step_description': step_description,
+                'elapsed_time': elapsed_time,
+                'remaining_time': remaining_time,
+                'last_message': message,
+                'last_update': current_time,
+                'status': 'completed' if progress_percentage >= 100 else 'running'
+            })
 
-        # 保存到存储
-        self._save_progress()
+        # 保存到存储（状态变为完成时立即写入，不等待合并窗口）
+        self._save_progress(force=self.progress_data['status'] != 'running')
 
         # 详细的更新日志
         step_name = current_step_info.get('name', '未知')
-        logger.info(f"📊 [进度更新] {self.analysis_id}: {message[:50]}...")
-        logger.debug(f"📊 [进度详情] 步骤{self.current_step + 1}/{len(self.analysis_steps)} ({step_name}), 进度{progress_percentage:.1f}%, 耗时{elapsed_time:.1f}s")
+        # 每次更新都会调用，按分析ID采样并延迟格式化
+        logger.info("📊 [进度更新] %s: %s...", self.analysis_id, message[:50],
+                    extra={'sample_key': f"progress_update:{self.analysis_id}"})
+        logger.debug("📊 [进度详情] 步骤%d/%d (%s), 进度%.1f%%, 耗时%.1fs", self.current_step + 1,
+                     len(self.analysis_steps), step_name, progress_percentage, elapsed_time)
     
+    def _log_sample_extra(self, status: str) -> Optional[Dict[str, Any]]:
+        """运行中的保存日志按分析ID采样，最终状态的保存日志总是输出"""
+        return {'sample_key': f"progress_save:{self.analysis_id}"} if status == 'running' else None
+
     def _detect_step_from_message(self, message: str) -> Optional[int]:
         """根据消息内容智能检测当前步骤"""
         message_lower = message.lower()
@@ -474,30 +527,106 @@ class AsyncProgressTracker:
 
         return remaining
     
-    def _save_progress(self):
-        """保存进度到存储"""
+    def _save_progress(self, force: bool = False):
+        """
+        记录一次进度变化
+
+        合并窗口内的多次调用只在窗口结束时写一次快照并追加一条事件；
+        force=True（初始化、完成、失败）时立即写入。
+        """
+        with self._flush_lock:
+            message = self.progress_data.get('last_message')
+            if message and message != self._recorded_message:
+                self._recorded_message = message
+                self._pending_messages.append(str(message))
+                del self._pending_messages[:-MAX_EVENT_MESSAGES]
+
+            wait = PROGRESS_COALESCE_SECONDS - (time.time() - self._last_flush)
+            if not force and wait > 0:
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(wait, self._flush_progress)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return
+
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+
+        self._flush_progress()
+
+    @staticmethod
+    def _build_event(data: Dict[str, Any], messages: List[str]) -> Dict[str, Any]:
+        """增量事件：只包含界面刷新需要的少量字段"""
+        return {
+            'status': data.get('status'),
+            'current_step': data.get('current_step'),
+            'current_step_name': data.get('current_step_name'),
+            'current_step_description': data.get('current_step_description'),
+            'progress_percentage': round(data.get('progress_percentage', 0.0), 2),
+            'elapsed_time': round(data.get('elapsed_time', 0.0), 1),
+            'remaining_time': round(data.get('remaining_time', 0.0), 1),
+            'messages': messages,
+            'last_update': data.get('last_update'),
+        }
+
+    def _flush_progress(self):
+        """写入快照并追加一条增量事件"""
+        with self._flush_lock:
+            self._flush_timer = None
+            self._last_flush = time.time()
+            messages, self._pending_messages = self._pending_messages, []
+            analysis_events, self._pending_analysis_events = self._pending_analysis_events, []
+            # 在锁内取浅拷贝，刷新线程序列化期间调用方可继续更新 progress_data
+            data = dict(self.progress_data)
+
         try:
-            current_step_name = self.progress_data.get('current_step_name', '未知')
-            progress_pct = self.progress_data.get('progress_percentage', 0)
-            status = self.progress_data.get('status', 'running')
+            current_step_name = data.get('current_step_name', '未知')
+            progress_pct = data.get('progress_percentage', 0)
+            status = data.get('status', 'running')
+
+            # progress_data 中只有基础类型（raw_results 已在 mark_completed 中安全序列化），
+            # 直接紧凑序列化，个别无法序列化的值转为字符串
+            snapshot_json = json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str)
+            event = self._build_event(data, messages)
+            if analysis_events:
+                event['analysis_events'] = analysis_events
+            event_json = json.dumps(event, ensure_ascii=False, separators=(',', ':'), default=str)
 
             if self.use_redis:
-                # 保存到Redis（安全序列化）
                 key = f"progress:{self.analysis_id}"
-                safe_data = safe_serialize(self.progress_data)
-                data_json = json.dumps(safe_data, ensure_ascii=False)
-                self.redis_client.setex(key, 3600, data_json)  # 1小时过期
-
-                logger.info(f"📊 [Redis写入] {self.analysis_id} -> {status} | {current_step_name} | {progress_pct:.1f}%")
-                logger.debug(f"📊 [Redis详情] 键: {key}, 数据大小: {len(data_json)} 字节")
+                stream_key = _progress_stream_key(self.analysis_id)
+                pipe = self.redis_client.pipeline()
+                pipe.setex(key, PROGRESS_TTL, snapshot_json)
+                pipe.xadd(stream_key, {'data': event_json}, maxlen=PROGRESS_STREAM_MAXLEN, approximate=True)
+                pipe.expire(stream_key, PROGRESS_TTL)
+                # 维护按更新时间排序的索引，顺带剔除快照已过期的条目
+                last_update = data.get('last_update', time.time())
+                index_keys = [PROGRESS_INDEX_KEY]
+                if self.user_id:
+                    index_keys.append(_progress_user_index_key(self.user_id))
+                for index_key in index_keys:
+                    pipe.zadd(index_key, {self.analysis_id: last_update})
+                    pipe.zremrangebyscore(index_key, '-inf', time.time() - PROGRESS_TTL)
+                    pipe.expire(index_key, PROGRESS_TTL)
+                pipe.execute()
+
+                logger.info("📊 [Redis写入] %s -> %s | %s | %.1f%%", self.analysis_id, status, current_step_name,
+                            progress_pct, extra=self._log_sample_extra(status))
+                logger.debug("📊 [Redis详情] 键: %s, 快照大小: %d 字节", key, len(snapshot_json))
             else:
-                # 保存到文件（安全序列化）
-                safe_data = safe_serialize(self.progress_data)
-                with open(self.progress_file, 'w', encoding='utf-8') as f:
-                    json.dump(safe_data, f, ensure_ascii=False, indent=2)
-
-                logger.info(f"📊 [文件写入] {self.analysis_id} -> {status} | {current_step_name} | {progress_pct:.1f}%")
-                logger.debug(f"📊 [文件详情] 路径: {self.progress_file}")
+                # 事件以二进制追加写入（读取方按字节偏移续读，不能有换行符转换）；
+                # 快照先写临时文件再原子替换，读取方不会读到半个文件
+                with open(self.events_file, 'ab') as f:
+                    f.write((event_json + "\n").encode('utf-8'))
+                tmp_file = f"{self.progress_file}.tmp"
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    f.write(snapshot_json)
+                os.replace(tmp_file, self.progress_file)
+
+                logger.info("📊 [文件写入] %s -> %s | %s | %.1f%%", self.analysis_id, status, current_step_name,
+                            progress_pct, extra=self._log_sample_extra(status))
+                logger.debug("📊 [文件详情] 路径: %s", self.progress_file)
 
         except Exception as e:
             logger.error(f"📊 [异步进度] 保存失败: {e}")
@@ -506,50 +635,72 @@ class AsyncProgressTracker:
                 if self.use_redis:
                     # Redis失败，尝试文件存储
                     logger.warning(f"📊 [异步进度] Redis保存失败，尝试文件存储")
-                    backup_file = f"./data/progress_{self.analysis_id}.json"
+                    backup_file = _progress_file(self.analysis_id)
                     os.makedirs(os.path.dirname(backup_file), exist_ok=True)
-                    safe_data = safe_serialize(self.progress_data)
+                    safe_data = safe_serialize(data)
                     with open(backup_file, 'w', encoding='utf-8') as f:
-                        json.dump(safe_data, f, ensure_ascii=False, indent=2)
+                        json.dump(safe_data, f, ensure_ascii=False)
                     logger.info(f"📊 [备用存储] 文件保存成功: {backup_file}")
                 else:
                     # 文件存储失败，尝试简化数据
                     logger.warning(f"📊 [异步进度] 文件保存失败，尝试简化数据")
                     simplified_data = {
                         'analysis_id': self.analysis_id,
-                        'status': self.progress_data.get('status', 'unknown'),
-                        'progress_percentage': self.progress_data.get('progress_percentage', 0),
-                        'last_message': str(self.progress_data.get('last_message', '')),
-                        'last_update': self.progress_data.get('last_update', time.time())
+                        'status': data.get('status', 'unknown'),
+                        'progress_percentage': data.get('progress_percentage', 0),
+                        'last_message': str(data.get('last_message', '')),
+                        'last_update': data.get('last_update', time.time())
                     }
-                    backup_file = f"./data/progress_{self.analysis_id}.json"
+                    backup_file = _progress_file(self.analysis_id)
                     with open(backup_file, 'w', encoding='utf-8') as f:
-                        json.dump(simplified_data, f, ensure_ascii=False, indent=2)
+                        json.dump(simplified_data, f, ensure_ascii=False)
                     logger.info(f"📊 [备用存储] 简化数据保存成功: {backup_file}")
             except Exception as backup_e:
                 logger.error(f"📊 [异步进度] 备用存储也失败: {backup_e}")
     
+    def record_analysis_event(self, event: Dict[str, Any]):
+        """
+        记录一条分析图事件（节点开始/结束、token 增量），随下一条进度事件写入
+
+        同一节点连续的 token 增量合并为一条，合并窗口内不会逐 token 写入。
+        """
+        compact = {key: event[key] for key in ('type', 'node', 'delta', 'error', 'status') if key in event}
+        with self._flush_lock:
+            last = self._pending_analysis_events[-1] if self._pending_analysis_events else None
+            if (last is not None and compact.get('type') == 'token' and last.get('type') == 'token'
+                    and last.get('node') == compact.get('node')):
+                last['delta'] = last.get('delta', '') + compact.get('delta', '')
+            else:
+                self._pending_analysis_events.append(compact)
+        self._save_progress()
+
     def get_progress(self) -> Dict[str, Any]:
         """获取当前进度"""
-        return self.progress_data.copy()
+        with self._flush_lock:
+            return self.progress_data.copy()
     
     def mark_completed(self, message: str = "分析完成", results: Any = None):
         """标记分析完成"""
         self.update_progress(message)
-        self.progress_data['status'] = 'completed'
-        self.progress_data['progress_percentage'] = 100.0
-        self.progress_data['remaining_time'] = 0.0
 
         # 保存分析结果（安全序列化）
+        raw_results = None
         if results is not None:
             try:
-                self.progress_data['raw_results'] = safe_serialize(results)
+                raw_results = safe_serialize(results)
                 logger.info(f"📊 [异步进度] 保存分析结果: {self.analysis_id}")
             except Exception as e:
                 logger.warning(f"📊 [异步进度] 结果序列化失败: {e}")
-                self.progress_data['raw_results'] = str(results)  # 最后的fallback
+                raw_results = str(results)  # 最后的fallback
 
-        self._save_progress()
+        with self._flush_lock:
+            self.progress_data['status'] = 'completed'
+            self.progress_data['progress_percentage'] = 100.0
+            self.progress_data['remaining_time'] = 0.0
+            if raw_results is not None:
+                self.progress_data['raw_results'] = raw_results
+
+        self._save_progress(force=True)
         logger.info(f"📊 [异步进度] 分析完成: {self.analysis_id}")
 
         # 从日志系统注销
@@ -561,10 +712,11 @@ class AsyncProgressTracker:
     
     def mark_failed(self, error_message: str):
         """标记分析失败"""
-        self.progress_data['status'] = 'failed'
-        self.progress_data['last_message'] = f"分析失败: {error_message}"
-        self.progress_data['last_update'] = time.time()
-        self._save_progress()
+        with self._flush_lock:
+            self.progress_data['status'] = 'failed'
+            self.progress_data['last_message'] = f"分析失败: {error_message}"
+            self.progress_data['last_update'] = time.time()
+        self._save_progress(force=True)
         logger.error(f"📊 [异步进度] 分析失败: {self.analysis_id}, 错误: {error_message}")
 
         # 从日志系统注销
@@ -574,6 +726,31 @@ class AsyncProgressTracker:
         except ImportError:
             pass
 
+# 进程内共享的Redis客户端（连接池复用连接）
+_redis_client = None
+_redis_client_lock = threading.Lock()
+
+def _get_redis_client():
+    """获取共享的Redis客户端，连接池大小可通过 REDIS_MAX_CONNECTIONS 调整"""
+    global _redis_client
+    with _redis_client_lock:
+        if _redis_client is None:
+            import redis
+
+            pool_kwargs = {
+                'host': os.getenv('REDIS_HOST', 'localhost'),
+                'port': int(os.getenv('REDIS_PORT', 6379)),
+                'db': int(os.getenv('REDIS_DB', 0)),
+                'decode_responses': True,
+                'max_connections': int(os.getenv('REDIS_MAX_CONNECTIONS', '50')),
+            }
+            redis_password = os.getenv('REDIS_PASSWORD', None)
+            if redis_password:
+                pool_kwargs['password'] = redis_password
+            _redis_client = redis.Redis(connection_pool=redis.ConnectionPool(**pool_kwargs))
+        return _redis_client
+
+
 def get_progress_by_id(analysis_id: str) -> Optional[Dict[str, Any]]:
     """根据分析ID获取进度"""
     try:
@@ -583,30 +760,7 @@ def get_progress_by_id(analysis_id: str) -> Optional[Dict[str, Any]]:
         # 如果Redis启用，先尝试Redis
         if redis_enabled:
             try:
-                import redis
-
-                # 从环境变量获取Redis配置
-                redis_host = os.getenv('REDIS_HOST', 'localhost')
-                redis_port = int(os.getenv('REDIS_PORT', 6379))
-                redis_password = os.getenv('REDIS_PASSWORD', None)
-                redis_db = int(os.getenv('REDIS_DB', 0))
-
-                # 创建Redis连接
-                if redis_password:
-                    redis_client = redis.Redis(
-                        host=redis_host,
-                        port=redis_port,
-                        password=redis_password,
-                        db=redis_db,
-                        decode_responses=True
-                    )
-                else:
-                    redis_client = redis.Redis(
-                        host=redis_host,
-                        port=redis_port,
-                        db=redis_db,
-                        decode_responses=True
-                    )
+                redis_client = _get_redis_client()
 
                 key = f"progress:{analysis_id}"
                 data = redis_client.get(key)
@@ -626,6 +780,101 @@ def get_progress_by_id(analysis_id: str) -> Optional[Dict[str, Any]]:
         logger.error(f"📊 [异步进度] 获取进度失败: {analysis_id}, 错误: {e}")
         return None
 
+def read_progress_events(analysis_id: str, last_id: Optional[str] = None,
+                         block_seconds: float = 5.0) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    阻塞读取某次分析的新进度事件，替代定时轮询完整快照
+
+    Args:
+        analysis_id: 分析ID
+        last_id: 上次读取返回的位置，None 表示从头读取
+        block_seconds: 没有新事件时最多等待的秒数
+
+    Returns:
+        (事件列表, 新的读取位置)，下次调用时传回该位置
+    """
+    redis_enabled = os.getenv('REDIS_ENABLED', 'false').lower() == 'true'
+
+    if redis_enabled:
+        try:
+            redis_client = _get_redis_client()
+            response = redis_client.xread(
+                {_progress_stream_key(analysis_id): last_id or '0'},
+                count=500,
+                block=int(block_seconds * 1000),
+            )
+            events = []
+            for _, entries in response or []:
+                for entry_id, fields in entries:
+                    events.append(json.loads(fields['data']))
+                    last_id = entry_id
+            return events, last_id
+        except Exception as e:
+            logger.debug(f"📊 [异步进度] Redis事件读取失败: {e}")
+
+    # 文件模式：按字节偏移读取追加日志，没有新内容时短暂等待
+    events_file = _progress_events_file(analysis_id)
+    offset = int(last_id or 0)
+    deadline = time.time() + block_seconds
+    while True:
+        if os.path.exists(events_file) and os.path.getsize(events_file) > offset:
+            events = []
+            with open(events_file, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # 写入中的半行留到下次读取
+                    offset += len(line)
+                    if line.strip():
+                        events.append(json.loads(line.decode('utf-8')))
+            if events:
+                return events, str(offset)
+        if time.time() >= deadline:
+            return [], str(offset)
+        time.sleep(0.2)
+
+
+class ProgressFollower:
+    """
+    跟随某次分析的进度：首次读取快照作为初始状态，之后阻塞读取增量事件并合并到状态中；
+    事件中携带的节点/token 增量累积到 partial_reports，供界面渲染生成中的部分报告
+    """
+
+    def __init__(self, analysis_id: str):
+        from tradingagents.utils.analysis_events import PartialReportBuffer
+
+        self.analysis_id = analysis_id
+        self.progress_data: Optional[Dict[str, Any]] = None
+        self.last_event_id: Optional[str] = None
+        self.partial_reports = PartialReportBuffer()
+
+    def poll(self, block_seconds: float = 2.0) -> Optional[Dict[str, Any]]:
+        """等待新事件（最多 block_seconds 秒）并返回合并后的进度，尚无进度记录时返回 None"""
+        if self.progress_data is None:
+            self.progress_data = get_progress_by_id(self.analysis_id)
+
+        events, self.last_event_id = read_progress_events(self.analysis_id, self.last_event_id, block_seconds)
+        if events:
+            data = dict(self.progress_data or {'analysis_id': self.analysis_id})
+            for event in events:
+                self._apply(data, event)
+                for analysis_event in event.get('analysis_events', ()):
+                    self.partial_reports.apply(analysis_event)
+            self.progress_data = data
+            # 结束事件不携带分析结果，重新读取一次快照
+            if data.get('status') in ('completed', 'failed'):
+                self.progress_data = get_progress_by_id(self.analysis_id) or data
+        return self.progress_data
+
+    @staticmethod
+    def _apply(data: Dict[str, Any], event: Dict[str, Any]):
+        for key, value in event.items():
+            if key not in ('messages', 'analysis_events'):
+                data[key] = value
+        if event.get('messages'):
+            data['last_message'] = event['messages'][-1]
+
+
 def format_time(seconds: float) -> str:
     """格式化时间显示"""
     if seconds < 60:
@@ -638,84 +887,61 @@ def format_time(seconds: float) -> str:
         return f"{hours:.1f}小时"
 
 
-def get_latest_analysis_id() -> Optional[str]:
-    """获取最新的分析ID"""
+def get_recent_analysis_ids(limit: int = 20, user_id: Optional[str] = None) -> List[str]:
+    """
+    获取最近更新的分析ID（最新的在前）
+
+    Args:
+        limit: 最多返回的数量
+        user_id: 只返回该用户的分析，None 表示全部
+    """
     try:
         # 检查REDIS_ENABLED环境变量
         redis_enabled = os.getenv('REDIS_ENABLED', 'false').lower() == 'true'
 
-        # 如果Redis启用，先尝试从Redis获取
+        # 如果Redis启用，直接读取有序集合索引
         if redis_enabled:
             try:
-                import redis
-
-                # 从环境变量获取Redis配置
-                redis_host = os.getenv('REDIS_HOST', 'localhost')
-                redis_port = int(os.getenv('REDIS_PORT', 6379))
-                redis_password = os.getenv('REDIS_PASSWORD', None)
-                redis_db = int(os.getenv('REDIS_DB', 0))
-
-                # 创建Redis连接
-                if redis_password:
-                    redis_client = redis.Redis(
-                        host=redis_host,
-                        port=redis_port,
-                        password=redis_password,
-                        db=redis_db,
-                        decode_responses=True
-                    )
-                else:
-                    redis_client = redis.Redis(
-                        host=redis_host,
-                        port=redis_port,
-                        db=redis_db,
-                        decode_responses=True
-                    )
-
-                # 获取所有progress键
-                keys = redis_client.keys("progress:*")
-                if not keys:
-                    return None
-
-                # 获取每个键的数据，找到最新的
-                latest_time = 0
-                latest_id = None
-
-                for key in keys:
-                    try:
-                        data = redis_client.get(key)
-                        if data:
-                            progress_data = json.loads(data)
-                            last_update = progress_data.get('last_update', 0)
-                            if last_update > latest_time:
-                                latest_time = last_update
-                                # 从键名中提取analysis_id (去掉"progress:"前缀)
-                                latest_id = key.replace('progress:', '')
-                    except Exception:
-                        continue
-
-                if latest_id:
-                    logger.info(f"📊 [恢复分析] 找到最新分析ID: {latest_id}")
-                    return latest_id
-
+                redis_client = _get_redis_client()
+                index_key = _progress_user_index_key(user_id) if user_id else PROGRESS_INDEX_KEY
+                analysis_ids = redis_client.zrevrangebyscore(
+                    index_key, '+inf', time.time() - PROGRESS_TTL, start=0, num=limit
+                )
+                if analysis_ids:
+                    return list(analysis_ids)
             except Exception as e:
-                logger.debug(f"📊 [恢复分析] Redis查找失败: {e}")
+                logger.debug(f"📊 [恢复分析] Redis索引查找失败: {e}")
 
         # 如果Redis失败或未启用，尝试从文件查找
         data_dir = Path("data")
-        if data_dir.exists():
-            progress_files = list(data_dir.glob("progress_*.json"))
-            if progress_files:
-                # 按修改时间排序，获取最新的
-                latest_file = max(progress_files, key=lambda f: f.stat().st_mtime)
-                # 从文件名提取analysis_id
-                filename = latest_file.name
-                if filename.startswith("progress_") and filename.endswith(".json"):
-                    analysis_id = filename[9:-5]  # 去掉前缀和后缀
-                    logger.debug(f"📊 [恢复分析] 从文件找到最新分析ID: {analysis_id}")
-                    return analysis_id
-
-        return None
+        if not data_dir.exists():
+            return []
+
+        # 按修改时间排序，最新的在前
+        progress_files = sorted(data_dir.glob("progress_*.json"), key=lambda f: f.stat().st_mtime, reverse=True)
+        analysis_ids = []
+        for progress_file in progress_files:
+            if user_id:
+                try:
+                    with open(progress_file, 'r', encoding='utf-8') as f:
+                        if json.load(f).get('user_id') != user_id:
+                            continue
+                except Exception:
+                    continue
+            # 从文件名提取analysis_id（去掉前缀和后缀）
+            analysis_ids.append(progress_file.name[9:-5])
+            if len(analysis_ids) >= limit:
+                break
+        return analysis_ids
     except Exception as e:
-        logger.error(f"📊 [恢复分析] 获取最新分析ID失败: {e}")
-        return None
+        logger.error(f"📊 [恢复分析] 获取最近分析ID失败: {e}")
+        return []
+
+
+def get_latest_analysis_id(user_id: Optional[str] = None) -> Optional[str]:
+    """获取最新的分析ID"""
+    analysis_ids = get_recent_analysis_ids(limit=1, user_id=user_id)
+    if analysis_ids:
+        logger.info(f"📊 [恢复分析] 找到最新分析ID: {analysis_ids[0]}")
+        return analysis_ids[0]
+    return None
@@ -0,0 +1,660 @@
+#!/usr/bin/env python3
+"""
+后台分析任务队列
+Web 进程只负责提交任务和读取状态，分析在独立的 worker 进程中执行：
+- Redis 可用时使用 Redis（有序集合队列 + Lua 原子认领），否则使用本地 SQLite 文件队列
+- 支持优先级、按用户的并发上限、取消，以及把结果持久化供界面读取
+- worker 以租约方式持有任务，进程重启后过期任务自动重新入队
+
+启动 worker 池：python -m web.utils.job_queue --workers 2（start_web.py 会随 Web 应用一起启动，JOB_WORKERS 控制进程数）
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+# 导入日志模块
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('web')
+
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+# 每个用户同时运行的任务数上限
+JOB_MAX_PER_USER = int(os.getenv('JOB_MAX_PER_USER', '1'))
+# worker 租约时长（秒），超过该时间未续约的任务视为 worker 已退出
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '60'))
+# 任务被重新入队的最大次数
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '2'))
+# 已结束任务（含结果）的保留时间（秒）
+JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', str(7 * 24 * 3600)))
+# Web 端等待分析任务结果的最长时间（秒）
+JOB_WAIT_TIMEOUT = float(os.getenv('JOB_WAIT_TIMEOUT', '1800'))
+
+
+def _queue_score(priority: int, created_at: float) -> float:
+    """队列排序分数：优先级高的在前，同优先级先提交的在前"""
+    return -priority * 1e13 + created_at * 1000
+
+
+def _new_job(job_type: str, payload: Dict[str, Any], user_id: Optional[str],
+             priority: int, job_id: Optional[str]) -> Dict[str, Any]:
+    now = time.time()
+    return {
+        'job_id': job_id or uuid.uuid4().hex,
+        'job_type': job_type,
+        'payload': payload,
+        'user_id': user_id or '',
+        'priority': priority,
+        'status': QUEUED,
+        'attempts': 0,
+        'created_at': now,
+        'started_at': None,
+        'finished_at': None,
+        'worker': None,
+        'result': None,
+        'error': None,
+    }
+
+
+class RedisJobBackend:
+    """
+    Redis 任务存储
+
+    - jobs:data:<id>          任务记录（JSON）
+    - jobs:queue              待执行任务（有序集合，按优先级/提交时间）
+    - jobs:running            执行中任务（有序集合，分数为租约到期时间）
+    - jobs:owners             任务ID -> 用户
+    - jobs:user_running:<u>   用户正在执行的任务
+    - jobs:user:<u>           用户提交过的任务（按提交时间）
+    - jobs:cancel:<id>        取消请求标记
+    """
+
+    PREFIX = 'jobs:'
+
+    # 从队列头部挑选第一个未超出用户并发上限的任务，原子地移入执行集合
+    CLAIM_SCRIPT = """
+    local candidates = redis.call('ZRANGE', KEYS[1], 0, tonumber(ARGV[3]) - 1)
+    for _, job_id in ipairs(candidates) do
+        local user = redis.call('HGET', KEYS[3], job_id)
+        local allowed = true
+        if user and user ~= '' then
+            allowed = redis.call('SCARD', ARGV[4] .. user) < tonumber(ARGV[1])
+        end
+        if allowed then
+            redis.call('ZREM', KEYS[1], job_id)
+            redis.call('ZADD', KEYS[2], ARGV[2], job_id)
+            if user and user ~= '' then
+                redis.call('SADD', ARGV[4] .. user, job_id)
+            end
+            return job_id
+        end
+    end
+    return false
+    """
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self._claim = redis_client.register_script(self.CLAIM_SCRIPT)
+        self.queue_key = self.PREFIX + 'queue'
+        self.running_key = self.PREFIX + 'running'
+        self.owners_key = self.PREFIX + 'owners'
+
+    def _data_key(self, job_id: str) -> str:
+        return f"{self.PREFIX}data:{job_id}"
+
+    def _user_running_prefix(self) -> str:
+        return self.PREFIX + 'user_running:'
+
+    def _cancel_key(self, job_id: str) -> str:
+        return f"{self.PREFIX}cancel:{job_id}"
+
+    def _save(self, job: Dict[str, Any], pipe=None):
+        client = pipe if pipe is not None else self.redis
+        data = json.dumps(job, ensure_ascii=False, default=str)
+        if job['status'] in FINISHED_STATUSES:
+            client.setex(self._data_key(job['job_id']), JOB_RESULT_TTL, data)
+        else:
+            client.set(self._data_key(job['job_id']), data)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        data = self.redis.get(self._data_key(job_id))
+        return json.loads(data) if data else None
+
+    def submit(self, job: Dict[str, Any]):
+        pipe = self.redis.pipeline()
+        self._save(job, pipe)
+        pipe.hset(self.owners_key, job['job_id'], job['user_id'])
+        if job['user_id']:
+            user_key = f"{self.PREFIX}user:{job['user_id']}"
+            pipe.zadd(user_key, {job['job_id']: job['created_at']})
+            pipe.expire(user_key, JOB_RESULT_TTL)
+        pipe.zadd(self.queue_key, {job['job_id']: _queue_score(job['priority'], job['created_at'])})
+        pipe.execute()
+
+    def claim(self, worker: str, max_per_user: int, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        job_id = self._claim(
+            keys=[self.queue_key, self.running_key, self.owners_key],
+            args=[max_per_user, time.time() + lease_seconds, 100, self._user_running_prefix()],
+        )
+        if not job_id:
+            return None
+        job_id = job_id.decode('utf-8') if isinstance(job_id, bytes) else job_id
+        job = self.get(job_id)
+        if job is None:
+            # 记录已过期，丢弃该任务
+            owner = self.redis.hget(self.owners_key, job_id) or b''
+            self._release(job_id, owner.decode('utf-8') if isinstance(owner, bytes) else owner)
+            return None
+        job.update(status=RUNNING, started_at=time.time(), worker=worker, attempts=job['attempts'] + 1)
+        self._save(job)
+        return job
+
+    def renew_lease(self, job_id: str, lease_seconds: float):
+        self.redis.zadd(self.running_key, {job_id: time.time() + lease_seconds}, xx=True)
+
+    def _release(self, job_id: str, user_id: str, pipe=None):
+        client = pipe if pipe is not None else self.redis
+        client.zrem(self.running_key, job_id)
+        client.hdel(self.owners_key, job_id)
+        client.delete(self._cancel_key(job_id))
+        if user_id:
+            client.srem(self._user_running_prefix() + user_id, job_id)
+
+    def finish(self, job: Dict[str, Any]):
+        pipe = self.redis.pipeline()
+        self._save(job, pipe)
+        self._release(job['job_id'], job['user_id'], pipe)
+        pipe.execute()
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """取消任务，返回取消后的状态（排队中直接取消；执行中由 worker 终止）"""
+        job = self.get(job_id)
+        if job is None or job['status'] in FINISHED_STATUSES:
+            return job['status'] if job else None
+        if self.redis.zrem(self.queue_key, job_id):
+            job.update(status=CANCELLED, finished_at=time.time())
+            self.finish(job)
+            return CANCELLED
+        self.redis.setex(self._cancel_key(job_id), JOB_RESULT_TTL, 1)
+        return RUNNING
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        return bool(self.redis.exists(self._cancel_key(job_id)))
+
+    def requeue_stale(self) -> int:
+        """把租约过期（worker 已退出）的任务重新入队，超过重试次数的标记为失败"""
+        count = 0
+        for job_id in self.redis.zrangebyscore(self.running_key, '-inf', time.time()):
+            job_id = job_id.decode('utf-8') if isinstance(job_id, bytes) else job_id
+            # 只有成功移出执行集合的一方负责处理，避免多个 worker 重复入队
+            if not self.redis.zrem(self.running_key, job_id):
+                continue
+            job = self.get(job_id)
+            if job is None:
+                continue
+            if job['user_id']:
+                self.redis.srem(self._user_running_prefix() + job['user_id'], job_id)
+            if job['attempts'] >= JOB_MAX_ATTEMPTS:
+                job.update(status=FAILED, finished_at=time.time(), error='worker进程退出，任务中断')
+                self.finish(job)
+            else:
+                job.update(status=QUEUED, worker=None)
+                pipe = self.redis.pipeline()
+                self._save(job, pipe)
+                pipe.zadd(self.queue_key, {job_id: _queue_score(job['priority'], job['created_at'])})
+                pipe.execute()
+            count += 1
+        return count
+
+    def list_jobs(self, user_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        if user_id:
+            job_ids = self.redis.zrevrange(f"{self.PREFIX}user:{user_id}", 0, limit - 1)
+        else:
+            job_ids = (self.redis.zrevrange(self.running_key, 0, limit - 1)
+                       + self.redis.zrange(self.queue_key, 0, limit - 1))[:limit]
+        if not job_ids:
+            return []
+        values = self.redis.mget([self._data_key(
+            job_id.decode('utf-8') if isinstance(job_id, bytes) else job_id) for job_id in job_ids])
+        return [json.loads(value) for value in values if value]
+
+
+class SQLiteJobBackend:
+    """本地 SQLite 任务存储（无 Redis 时使用，同一台机器上的多个进程可共享）"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, user_id TEXT, status TEXT, queue_score REAL, "
+                "lease_until REAL, cancel_requested INTEGER DEFAULT 0, created_at REAL, data TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, queue_score)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id, created_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # 每次操作使用独立连接；isolation_level=None 以便显式 BEGIN IMMEDIATE 加写锁
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _save(self, conn: sqlite3.Connection, job: Dict[str, Any], lease_until: float = None):
+        conn.execute(
+            "UPDATE jobs SET status = ?, lease_until = ?, data = ? WHERE job_id = ?",
+            (job['status'], lease_until, json.dumps(job, ensure_ascii=False, default=str), job['job_id']),
+        )
+
+    def _cleanup(self, conn: sqlite3.Connection):
+        conn.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?, ?) AND created_at < ?",
+            FINISHED_STATUSES + (time.time() - JOB_RESULT_TTL,),
+        )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def submit(self, job: Dict[str, Any]):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, user_id, status, queue_score, created_at, data) VALUES (?, ?, ?, ?, ?, ?)",
+                (job['job_id'], job['user_id'], job['status'],
+                 _queue_score(job['priority'], job['created_at']), job['created_at'],
+                 json.dumps(job, ensure_ascii=False, default=str)),
+            )
+
+    def claim(self, worker: str, max_per_user: int, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            running = dict(conn.execute(
+                "SELECT user_id, COUNT(*) FROM jobs WHERE status = ? GROUP BY user_id", (RUNNING,)
+            ).fetchall())
+            rows = conn.execute(
+                "SELECT job_id, user_id, data FROM jobs WHERE status = ? ORDER BY queue_score LIMIT 100", (QUEUED,)
+            ).fetchall()
+            for job_id, user_id, data in rows:
+                if user_id and running.get(user_id, 0) >= max_per_user:
+                    continue
+                job = json.loads(data)
+                job.update(status=RUNNING, started_at=time.time(), worker=worker, attempts=job['attempts'] + 1)
+                self._save(conn, job, lease_until=time.time() + lease_seconds)
+                conn.execute("COMMIT")
+                return job
+            conn.execute("COMMIT")
+            return None
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def renew_lease(self, job_id: str, lease_seconds: float):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET lease_until = ? WHERE job_id = ? AND status = ?",
+                         (time.time() + lease_seconds, job_id, RUNNING))
+
+    def finish(self, job: Dict[str, Any]):
+        with self._connect() as conn:
+            self._save(conn, job)
+            self._cleanup(conn)
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """取消任务，返回取消后的状态（排队中直接取消；执行中由 worker 终止）"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            job = json.loads(row[0])
+            if job['status'] == QUEUED:
+                job.update(status=CANCELLED, finished_at=time.time())
+                self._save(conn, job)
+            elif job['status'] == RUNNING:
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+            conn.execute("COMMIT")
+            return job['status']
+        finally:
+            conn.close()
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def requeue_stale(self) -> int:
+        """把租约过期（worker 已退出）的任务重新入队，超过重试次数的标记为失败"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT data FROM jobs WHERE status = ? AND lease_until < ?", (RUNNING, time.time())
+            ).fetchall()
+            for (data,) in rows:
+                job = json.loads(data)
+                if job['attempts'] >= JOB_MAX_ATTEMPTS:
+                    job.update(status=FAILED, finished_at=time.time(), error='worker进程退出，任务中断')
+                else:
+                    job.update(status=QUEUED, worker=None)
+                self._save(conn, job)
+            conn.execute("COMMIT")
+            return len(rows)
+        finally:
+            conn.close()
+
+    def list_jobs(self, user_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            if user_id:
+                rows = conn.execute(
+                    "SELECT data FROM jobs WHERE user_id = ? ORDER BY created_at DESC LIMIT ?", (user_id, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT data FROM jobs WHERE status IN (?, ?) ORDER BY status DESC, queue_score LIMIT ?",
+                    (RUNNING, QUEUED, limit)
+                ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+
+class JobQueue:
+    """任务队列：Web 进程通过它提交任务、查询状态和取消"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def submit(self, job_type: str, payload: Dict[str, Any], user_id: Optional[str] = None,
+               priority: int = 0, job_id: Optional[str] = None) -> str:
+        """
+        提交任务
+
+        Args:
+            job_type: 任务类型，必须在 JOB_HANDLERS 中注册
+            payload: 任务参数（需可 JSON 序列化）
+            user_id: 提交任务的用户，用于并发限制，None 表示不限制
+            priority: 优先级（0-9，越大越先执行）
+            job_id: 任务ID，不提供时自动生成
+
+        Returns:
+            任务ID
+        """
+        if job_type not in JOB_HANDLERS:
+            raise ValueError(f"未知的任务类型: {job_type}")
+        job = _new_job(job_type, payload, user_id, max(0, min(int(priority), 9)), job_id)
+        self.backend.submit(job)
+        logger.info(f"📥 [任务队列] 已提交任务: {job['job_id']} ({job_type}, 优先级 {job['priority']})")
+        return job['job_id']
+
+    def submit_stock_analysis(self, analysis_id: str, user_id: Optional[str] = None,
+                              priority: int = 0, **analysis_kwargs) -> str:
+        """提交股票分析任务，任务ID即分析ID，界面可直接用 get_progress_by_id 跟踪进度"""
+        return self.submit('stock_analysis', analysis_kwargs, user_id=user_id,
+                           priority=priority, job_id=analysis_id)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.backend.get(job_id)
+        except Exception as e:
+            logger.error(f"❌ [任务队列] 读取任务失败: {job_id}, 错误: {e}")
+            return None
+
+    def wait_for_job(self, job_id: str, timeout: Optional[float] = None,
+                     poll_interval: float = 1.0) -> Optional[Dict[str, Any]]:
+        """
+        等待任务结束
+
+        Returns:
+            已结束的任务记录；超时或任务不存在时返回 None
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            job = self.get_job(job_id)
+            if job is None or job['status'] in FINISHED_STATUSES:
+                return job
+            if deadline is not None and time.time() >= deadline:
+                logger.warning(f"⏰ [任务队列] 等待任务超时: {job_id} ({job['status']})")
+                return None
+            time.sleep(poll_interval)
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        status = self.backend.cancel(job_id)
+        logger.info(f"🛑 [任务队列] 取消任务: {job_id} -> {status}")
+        return status
+
+    def list_jobs(self, user_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """列出用户最近的任务；不指定用户时列出执行中和排队中的任务"""
+        try:
+            return self.backend.list_jobs(user_id, limit)
+        except Exception as e:
+            logger.error(f"❌ [任务队列] 列出任务失败: {e}")
+            return []
+
+
+def _run_stock_analysis_job(job: Dict[str, Any]) -> Any:
+    """执行股票分析任务，进度写入异步进度跟踪器"""
+    from web.utils.analysis_runner import run_stock_analysis
+    from web.utils.async_progress_tracker import AsyncProgressTracker, safe_serialize
+    from tradingagents.utils.analysis_events import get_analysis_event_bus
+
+    payload = job['payload']
+    analysis_id = job['job_id']
+    tracker = AsyncProgressTracker(
+        analysis_id, payload.get('analysts', []), payload.get('research_depth', 1),
+        payload.get('llm_provider', ''), user_id=job['user_id'] or None,
+    )
+
+    def progress_callback(message, step=None, total_steps=None):
+        tracker.update_progress(message)
+
+    # 分析图的节点/token 事件只在本进程的事件通道中发布，转发到进度事件流供 Web 进程读取
+    subscription = get_analysis_event_bus().subscribe(analysis_id)
+    forwarder = threading.Thread(target=_forward_analysis_events, args=(subscription, tracker),
+                                 name=f"analysis-events-{analysis_id}", daemon=True)
+    forwarder.start()
+    try:
+        results = run_stock_analysis(progress_callback=progress_callback, analysis_id=analysis_id, **payload)
+    except Exception as e:
+        tracker.mark_failed(str(e))
+        raise
+    finally:
+        # 分析结束事件之前的事件全部转发后再写入最终状态（分析未进入图执行时不会有结束事件）
+        forwarder.join(timeout=1.0)
+        subscription.close()
+        forwarder.join(timeout=2.0)
+        for event in subscription.drain():
+            tracker.record_analysis_event(event)
+
+    if isinstance(results, dict) and results.get('success') is False:
+        tracker.mark_failed(results.get('error', '分析失败'))
+        raise RuntimeError(results.get('error', '分析失败'))
+    tracker.mark_completed("✅ 分析成功完成！", results)
+    return safe_serialize(results)
+
+
+def _forward_analysis_events(subscription, tracker):
+    for event in subscription:
+        tracker.record_analysis_event(event)
+
+
+def _mark_progress_failed(job: Dict[str, Any], error_message: str):
+    """子进程被终止或异常退出时，把仍处于运行中的进度快照标记为失败"""
+    if job['job_type'] != 'stock_analysis':
+        return
+    try:
+        from web.utils.async_progress_tracker import AsyncProgressTracker
+
+        tracker = AsyncProgressTracker.attach(job['job_id'])
+        if tracker is not None and tracker.progress_data.get('status') == 'running':
+            tracker.mark_failed(error_message)
+    except Exception as e:
+        logger.warning(f"⚠️ [任务队列] 更新任务进度失败: {job['job_id']}, 错误: {e}")
+
+
+# 任务类型 -> 执行函数（在 worker 的子进程中调用，参数为任务记录，返回值作为结果保存）
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    'stock_analysis': _run_stock_analysis_job,
+}
+
+
+def _run_job_in_child(job: Dict[str, Any], conn):
+    """子进程入口：执行任务并通过管道回传结果"""
+    try:
+        conn.send((True, JOB_HANDLERS[job['job_type']](job)))
+    except Exception as e:
+        logger.error(f"❌ [任务队列] 任务执行失败: {job['job_id']}, 错误: {e}", exc_info=True)
+        conn.send((False, str(e)))
+    finally:
+        conn.close()
+
+
+class JobWorker:
+    """
+    任务 worker：循环认领任务，每个任务在独立子进程中执行
+
+    子进程使取消可以直接终止正在运行的分析，也把 pandas 计算和内存占用与 Web 进程隔离。
+    """
+
+    def __init__(self, queue: JobQueue, name: str = None, max_per_user: int = JOB_MAX_PER_USER,
+                 lease_seconds: float = JOB_LEASE_SECONDS, poll_interval: float = 1.0):
+        self.queue = queue
+        self.backend = queue.backend
+        self.name = name or f"worker-{os.getpid()}"
+        self.max_per_user = max_per_user
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._context = multiprocessing.get_context('spawn')
+
+    def run_forever(self, stop_event: threading.Event = None):
+        logger.info(f"👷 [任务队列] {self.name} 已启动")
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                self.backend.requeue_stale()
+                job = self.backend.claim(self.name, self.max_per_user, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"❌ [任务队列] {self.name} 认领任务失败: {e}")
+                job = None
+            if job is None:
+                stop_event.wait(self.poll_interval)
+                continue
+            self.execute(job)
+        logger.info(f"👷 [任务队列] {self.name} 已停止")
+
+    def execute(self, job: Dict[str, Any]):
+        """在子进程中执行任务，期间续约租约并响应取消请求"""
+        logger.info(f"▶️ [任务队列] {self.name} 开始执行任务: {job['job_id']} ({job['job_type']})")
+        receiver, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(target=_run_job_in_child, args=(job, sender), daemon=True)
+        process.start()
+        sender.close()
+
+        outcome = None
+        cancelled = False
+        while outcome is None:
+            if receiver.poll(min(self.lease_seconds / 3, 5.0)):
+                try:
+                    outcome = receiver.recv()
+                except EOFError:
+                    outcome = (False, f"任务进程异常退出 (exitcode={process.exitcode})")
+                break
+            if not process.is_alive():
+                outcome = (False, f"任务进程异常退出 (exitcode={process.exitcode})")
+                break
+            try:
+                self.backend.renew_lease(job['job_id'], self.lease_seconds)
+                if self.backend.is_cancel_requested(job['job_id']):
+                    process.terminate()
+                    cancelled = True
+                    break
+            except Exception as e:
+                logger.warning(f"⚠️ [任务队列] 续约任务失败: {job['job_id']}, 错误: {e}")
+
+        process.join(timeout=10)
+        receiver.close()
+
+        job['finished_at'] = time.time()
+        if cancelled:
+            job['status'] = CANCELLED
+            # 子进程被终止，来不及更新进度，由 worker 将快照标记为结束
+            _mark_progress_failed(job, "任务已取消")
+        elif outcome[0]:
+            job.update(status=COMPLETED, result=outcome[1])
+        else:
+            job.update(status=FAILED, error=outcome[1])
+            _mark_progress_failed(job, outcome[1])
+        self.backend.finish(job)
+        logger.info(f"⏹️ [任务队列] 任务结束: {job['job_id']} -> {job['status']}")
+
+
+# 全局任务队列实例
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """
+    获取全局任务队列
+
+    Redis 可用时使用 Redis，否则使用 JOB_QUEUE_DB 指定的 SQLite 文件（默认 ./data/job_queue.sqlite3）。
+    """
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            backend = None
+            try:
+                from tradingagents.config.database_manager import get_database_manager
+                redis_client = get_database_manager().get_redis_client()
+                if redis_client is not None:
+                    backend = RedisJobBackend(redis_client)
+            except Exception as e:
+                logger.debug(f"Redis不可用，任务队列使用本地文件: {e}")
+            if backend is None:
+                backend = SQLiteJobBackend(os.getenv('JOB_QUEUE_DB', './data/job_queue.sqlite3'))
+            _job_queue = JobQueue(backend)
+            logger.info(f"📋 [任务队列] 使用存储: {type(backend).__name__}")
+        return _job_queue
+
+
+def _worker_process_main(index: int):
+    JobWorker(get_job_queue(), name=f"worker-{index}-{os.getpid()}").run_forever()
+
+
+def run_worker_pool(num_workers: int):
+    """启动 num_workers 个 worker 进程并等待（Ctrl+C 停止）"""
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(target=_worker_process_main, args=(index,), name=f"job-worker-{index}")
+        for index in range(num_workers)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f"🚀 [任务队列] 已启动 {num_workers} 个worker进程")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logger.info("🛑 [任务队列] 正在停止worker进程...")
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(timeout=10)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='启动后台分析任务worker池')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('JOB_WORKERS', '2')), help='worker进程数')
+    run_worker_pool(parser.parse_args().workers)
@@ -132,7 +132,18 @@ def check_analysis_status(analysis_id: str) -> str:
     # 首先检查线程是否存活
     if is_analysis_thread_alive(analysis_id):
         return 'running'
-    
+
+    # 提交到后台任务队列的分析以任务状态为准（worker 在其他进程中执行）
+    try:
+        from .job_queue import get_job_queue, QUEUED, RUNNING, CANCELLED
+        job = get_job_queue().get_job(analysis_id)
+        if job:
+            if job['status'] in (QUEUED, RUNNING):
+                return 'running'
+            return 'failed' if job['status'] == CANCELLED else job['status']
+    except Exception as e:
+        logger.debug(f"📊 [状态检查] 查询任务队列失败: {e}")
+
     # 线程不存在，检查进度数据确定最终状态
     try:
         from .async_progress_tracker import get_progress_by_id